@@ -0,0 +1,117 @@
+"""
+Synthetic phone-camera image corpus for inference benchmarks.
+Images are seeded so every run (and every commit) replays identical bytes.
+"""
+
+import base64
+from dataclasses import dataclass
+from typing import List, Tuple, Optional, Dict
+
+import numpy as np
+import cv2
+
+
+# Typical resolutions produced by budget and mid-range Android phones
+PHONE_RESOLUTIONS: List[Tuple[int, int]] = [
+    (640, 480),
+    (1280, 960),
+    (1600, 1200),
+    (1920, 1080),
+    (3024, 4032),
+    (4000, 3000),
+]
+
+RESOLUTION_WEIGHTS = [0.15, 0.25, 0.2, 0.2, 0.1, 0.1]
+
+IMAGE_FORMATS: Dict[str, Tuple[str, List[int]]] = {
+    "jpeg": (".jpg", [cv2.IMWRITE_JPEG_QUALITY, 90]),
+    "png": (".png", [cv2.IMWRITE_PNG_COMPRESSION, 3]),
+    "webp": (".webp", [cv2.IMWRITE_WEBP_QUALITY, 85]),
+}
+
+FORMAT_WEIGHTS = {"jpeg": 0.8, "png": 0.1, "webp": 0.1}
+
+
+@dataclass
+class CorpusImage:
+    name: str
+    image_format: str
+    width: int
+    height: int
+    data: bytes
+    data_base64: str
+
+
+def synthesize_leaf_image(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    """Render a leaf-like BGR image with low-frequency texture and lesion spots"""
+    coarse = rng.integers(0, 255, size=(max(height // 64, 2), max(width // 64, 2), 3), dtype=np.uint8)
+    texture = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+
+    base = np.empty((height, width, 3), dtype=np.uint8)
+    base[..., 0] = 40
+    base[..., 1] = 140
+    base[..., 2] = 60
+    image = cv2.addWeighted(base, 0.7, texture, 0.3, 0)
+
+    for _ in range(int(rng.integers(3, 12))):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        axes = (int(rng.integers(width // 80 + 1, width // 20 + 2)), int(rng.integers(height // 80 + 1, height // 20 + 2)))
+        color = (int(rng.integers(20, 60)), int(rng.integers(60, 110)), int(rng.integers(110, 170)))
+        cv2.ellipse(image, center, axes, float(rng.integers(0, 180)), 0, 360, color, -1)
+
+    noise = rng.normal(0, 6, size=image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+def encode_image(image: np.ndarray, image_format: str) -> bytes:
+    ext, params = IMAGE_FORMATS[image_format]
+    ok, encoded = cv2.imencode(ext, image, params)
+    if not ok:
+        raise RuntimeError(f"Failed to encode synthetic image as {image_format}")
+    return encoded.tobytes()
+
+
+def generate_corpus(
+    num_images: int = 24,
+    seed: int = 1234,
+    resolutions: Optional[List[Tuple[int, int]]] = None,
+    formats: Optional[List[str]] = None
+) -> List[CorpusImage]:
+    """Generate a deterministic corpus of encoded phone-like images
+
+    Args:
+        num_images: Number of images to generate
+        seed: Random seed; the same seed always yields the same bytes
+        resolutions: Optional fixed list of (width, height) to cycle through
+        formats: Optional fixed list of formats to cycle through
+
+    Returns:
+        List of CorpusImage
+    """
+    rng = np.random.default_rng(seed)
+    format_names = list(FORMAT_WEIGHTS.keys())
+    format_probs = np.array(list(FORMAT_WEIGHTS.values()))
+
+    corpus = []
+    for i in range(num_images):
+        if resolutions:
+            width, height = resolutions[i % len(resolutions)]
+        else:
+            width, height = PHONE_RESOLUTIONS[rng.choice(len(PHONE_RESOLUTIONS), p=RESOLUTION_WEIGHTS)]
+
+        if formats:
+            image_format = formats[i % len(formats)]
+        else:
+            image_format = format_names[rng.choice(len(format_names), p=format_probs)]
+
+        data = encode_image(synthesize_leaf_image(width, height, rng), image_format)
+        corpus.append(CorpusImage(
+            name=f"synthetic_{i:04d}_{width}x{height}.{image_format}",
+            image_format=image_format,
+            width=width,
+            height=height,
+            data=data,
+            data_base64=base64.b64encode(data).decode("ascii")
+        ))
+
+    return corpus
@@ -0,0 +1,475 @@
+"""
+Load-testing and latency benchmark for the inference API.
+
+Replays a seeded synthetic corpus of phone images against /predict,
+/predict/base64 and /batch-predict at a fixed concurrency and reports
+throughput, latency percentiles and server RSS as JSON so runs on
+different commits can be compared.
+
+Examples:
+    python benchmarks/load_test.py --mode inprocess --concurrency 8 --requests 500
+    python benchmarks/load_test.py --mode uvicorn --workers 2 --output bench.json
+    python benchmarks/load_test.py --url http://localhost:8000 --server-pid 1234
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import platform
+import threading
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import requests
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ML_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import generate_corpus, CorpusImage
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+ENDPOINTS = {
+    "predict": "/predict",
+    "predict_base64": "/predict/base64",
+    "batch_predict": "/batch-predict",
+}
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse a 'name=weight,name=weight' mix into normalized weights"""
+    mix = {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight) if weight else 1.0
+
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError(f"Invalid mix specification: {spec}")
+    return {name: weight / total for name, weight in mix.items()}
+
+
+def read_rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of a process and its children"""
+    if PSUTIL_AVAILABLE:
+        try:
+            proc = psutil.Process(pid)
+            rss = proc.memory_info().rss
+            for child in proc.children(recursive=True):
+                rss += child.memory_info().rss
+            return rss
+        except psutil.Error:
+            return None
+
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+class RSSMonitor:
+    """Samples server RSS in the background during a run"""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = read_rss_bytes(self.pid)
+            if rss is not None:
+                self.samples.append(rss)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self.pid is not None:
+            self._thread.start()
+
+    def stop(self) -> Dict[str, Optional[float]]:
+        if self.pid is not None:
+            self._stop.set()
+            self._thread.join()
+        if not self.samples:
+            return {"rss_start_mb": None, "rss_end_mb": None, "rss_peak_mb": None}
+        to_mb = lambda b: round(b / (1024 * 1024), 1)
+        return {
+            "rss_start_mb": to_mb(self.samples[0]),
+            "rss_end_mb": to_mb(self.samples[-1]),
+            "rss_peak_mb": to_mb(max(self.samples)),
+        }
+
+
+def find_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_healthy(base_url: str, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Inference service at {base_url} did not become healthy within {timeout}s")
+
+
+class InProcessServer:
+    """Runs the FastAPI app with uvicorn in a background thread of this process"""
+
+    def __init__(self, models_dir: Optional[str] = None):
+        import uvicorn
+
+        if models_dir:
+            os.environ["MODELS_DIR"] = models_dir
+        os.chdir(ML_DIR)
+
+        from inference_service import app
+
+        self.port = find_free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.pid = os.getpid()
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        wait_until_healthy(self.base_url)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+        return False
+
+
+class UvicornSubprocessServer:
+    """Runs the inference service in a separate uvicorn process"""
+
+    def __init__(self, workers: int = 1, models_dir: Optional[str] = None):
+        self.port = find_free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.workers = workers
+        self.env = dict(os.environ)
+        if models_dir:
+            self.env["MODELS_DIR"] = models_dir
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "inference_service:app",
+                "--host", "127.0.0.1", "--port", str(self.port),
+                "--workers", str(self.workers), "--log-level", "warning"
+            ],
+            cwd=ML_DIR,
+            env=self.env
+        )
+        wait_until_healthy(self.base_url)
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        return False
+
+
+class ExternalServer:
+    def __init__(self, url: str, pid: Optional[int] = None):
+        self.base_url = url.rstrip("/")
+        self.pid = pid
+
+    def __enter__(self):
+        wait_until_healthy(self.base_url)
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def build_schedule(
+    num_requests: int,
+    corpus: List[CorpusImage],
+    crop_mix: Dict[str, float],
+    endpoint_mix: Dict[str, float],
+    seed: int
+) -> List[Tuple[str, str, int]]:
+    """Pre-compute (endpoint, crop_type, image_index) for every request so runs replay identically"""
+    rng = np.random.default_rng(seed)
+    crops = list(crop_mix.keys())
+    endpoints = list(endpoint_mix.keys())
+
+    crop_choices = rng.choice(len(crops), size=num_requests, p=list(crop_mix.values()))
+    endpoint_choices = rng.choice(len(endpoints), size=num_requests, p=list(endpoint_mix.values()))
+    image_choices = rng.integers(0, len(corpus), size=num_requests)
+
+    return [
+        (endpoints[e], crops[c], int(i))
+        for e, c, i in zip(endpoint_choices, crop_choices, image_choices)
+    ]
+
+
+class LoadRunner:
+    def __init__(
+        self,
+        base_url: str,
+        corpus: List[CorpusImage],
+        batch_size: int = 4,
+        use_tta: bool = False,
+        timeout: float = 60.0
+    ):
+        self.base_url = base_url
+        self.corpus = corpus
+        self.batch_size = batch_size
+        self.use_tta = use_tta
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def send(self, endpoint: str, crop_type: str, image_index: int) -> Tuple[float, bool, int, str]:
+        """Send one request, returning (latency_seconds, success, num_images, status)"""
+        session = self._session()
+        image = self.corpus[image_index]
+        url = self.base_url + ENDPOINTS[endpoint]
+        form = {"crop_type": crop_type, "use_tta": str(self.use_tta).lower()}
+        num_images = 1
+
+        start = time.perf_counter()
+        try:
+            if endpoint == "predict":
+                response = session.post(
+                    url,
+                    files={"file": (image.name, image.data, f"image/{image.image_format}")},
+                    data=form,
+                    timeout=self.timeout
+                )
+            elif endpoint == "predict_base64":
+                response = session.post(url, data={**form, "image_base64": image.data_base64}, timeout=self.timeout)
+            else:
+                items = [
+                    {
+                        "crop_type": crop_type,
+                        "image_base64": self.corpus[(image_index + k) % len(self.corpus)].data_base64
+                    }
+                    for k in range(self.batch_size)
+                ]
+                num_images = len(items)
+                response = session.post(url, json={"predictions": items}, timeout=self.timeout)
+            success = response.status_code == 200 and response.json().get("success", False)
+            status = str(response.status_code)
+        except requests.RequestException as e:
+            success = False
+            status = type(e).__name__
+        return time.perf_counter() - start, success, num_images, status
+
+    def run(self, schedule: List[Tuple[str, str, int]], concurrency: int) -> Dict[str, Any]:
+        results: List[Tuple[str, float, bool, int, str]] = []
+        lock = threading.Lock()
+
+        def worker(item):
+            endpoint, crop_type, image_index = item
+            latency, success, num_images, status = self.send(endpoint, crop_type, image_index)
+            with lock:
+                results.append((endpoint, latency, success, num_images, status))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(worker, schedule))
+        wall_time = time.perf_counter() - start
+
+        return summarize(results, wall_time)
+
+
+def latency_stats(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    arr = np.array(latencies) * 1000
+    stats = {f"p{p}_ms": round(float(np.percentile(arr, p)), 2) for p in PERCENTILES}
+    stats["mean_ms"] = round(float(arr.mean()), 2)
+    stats["min_ms"] = round(float(arr.min()), 2)
+    stats["max_ms"] = round(float(arr.max()), 2)
+    return stats
+
+
+def summarize(results: List[Tuple[str, float, bool, int, str]], wall_time: float) -> Dict[str, Any]:
+    ok = [r for r in results if r[2]]
+    summary = {
+        "total_requests": len(results),
+        "successful_requests": len(ok),
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_rps": round(len(ok) / wall_time, 2) if wall_time > 0 else 0.0,
+        "images_per_second": round(sum(r[3] for r in ok) / wall_time, 2) if wall_time > 0 else 0.0,
+        "latency": latency_stats([r[1] for r in ok]),
+        "per_endpoint": {}
+    }
+
+    for endpoint in sorted({r[0] for r in results}):
+        endpoint_results = [r for r in results if r[0] == endpoint]
+        endpoint_ok = [r for r in endpoint_results if r[2]]
+        summary["per_endpoint"][endpoint] = {
+            "requests": len(endpoint_results),
+            "successful": len(endpoint_ok),
+            "failures_by_status": dict(Counter(r[4] for r in endpoint_results if not r[2])),
+            "latency": latency_stats([r[1] for r in endpoint_ok])
+        }
+
+    return summary
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=ML_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    """Generate the corpus, start the server and replay the schedule"""
+    logger.info(f"Generating corpus of {args.corpus_size} images (seed={args.seed})")
+    corpus = generate_corpus(args.corpus_size, seed=args.seed)
+
+    crop_mix = parse_mix(args.crop_mix)
+    endpoint_mix = parse_mix(args.endpoints)
+    unknown = set(endpoint_mix) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f"Unknown endpoints: {sorted(unknown)}. Supported: {list(ENDPOINTS)}")
+
+    schedule = build_schedule(args.requests, corpus, crop_mix, endpoint_mix, args.seed)
+    warmup_schedule = build_schedule(args.warmup, corpus, crop_mix, endpoint_mix, args.seed + 1)
+
+    if args.url:
+        server = ExternalServer(args.url, pid=args.server_pid)
+    elif args.mode == "uvicorn":
+        server = UvicornSubprocessServer(workers=args.workers, models_dir=args.models_dir)
+    else:
+        server = InProcessServer(models_dir=args.models_dir)
+
+    with server:
+        runner = LoadRunner(server.base_url, corpus, batch_size=args.batch_size, use_tta=args.use_tta)
+
+        if warmup_schedule:
+            logger.info(f"Warming up with {len(warmup_schedule)} requests")
+            runner.run(warmup_schedule, args.concurrency)
+
+        monitor = RSSMonitor(server.pid)
+        monitor.start()
+        logger.info(f"Running {len(schedule)} requests at concurrency {args.concurrency} against {server.base_url}")
+        summary = runner.run(schedule, args.concurrency)
+        summary["memory"] = monitor.stop()
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "platform": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count()
+        },
+        "config": {
+            "mode": "external" if args.url else args.mode,
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "corpus_size": args.corpus_size,
+            "seed": args.seed,
+            "crop_mix": crop_mix,
+            "endpoint_mix": endpoint_mix,
+            "batch_size": args.batch_size,
+            "use_tta": args.use_tta
+        },
+        "corpus": {
+            "total_bytes": sum(len(img.data) for img in corpus),
+            "formats": {fmt: sum(1 for img in corpus if img.image_format == fmt) for fmt in {img.image_format for img in corpus}}
+        },
+        "results": summary
+    }
+
+
+def parse_args():
+    """Parse command line arguments"""
+    p = argparse.ArgumentParser(description='Load test the ML inference API')
+    p.add_argument('--mode', choices=['inprocess', 'uvicorn'], default='inprocess',
+                   help='Run the app in this process or in a uvicorn subprocess')
+    p.add_argument('--url', default=None, help='Benchmark an already running server instead')
+    p.add_argument('--server-pid', type=int, default=None, help='PID of the external server for RSS sampling')
+    p.add_argument('--workers', type=int, default=1, help='uvicorn workers in subprocess mode')
+    p.add_argument('--models-dir', default=None, help='MODELS_DIR for the spawned server')
+    p.add_argument('--concurrency', type=int, default=4)
+    p.add_argument('--requests', type=int, default=200)
+    p.add_argument('--warmup', type=int, default=20)
+    p.add_argument('--corpus-size', type=int, default=24)
+    p.add_argument('--seed', type=int, default=1234)
+    p.add_argument('--crop-mix', default='rice=0.4,wheat=0.2,tomato=0.2,potato=0.1,cotton=0.1')
+    p.add_argument('--endpoints', default='predict=0.6,predict_base64=0.3,batch_predict=0.1')
+    p.add_argument('--batch-size', type=int, default=4, help='Images per /batch-predict request')
+    p.add_argument('--use-tta', action='store_true')
+    p.add_argument('--output', default=None, help='Write JSON report to this path')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = run_benchmark(args)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        logger.info(f"Benchmark report saved to {args.output}")
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,338 @@
+"""
+Micro-benchmarks for the inference hot paths in preprocessing.py and model_manager.py.
+
+Each case is timed with timeit-style auto-ranging and repeats. Results can be
+saved as a baseline and later compared against it; any case slower than the
+baseline by more than the threshold fails the run with exit code 1.
+
+Examples:
+    python benchmarks/micro_benchmarks.py
+    python benchmarks/micro_benchmarks.py --filter decode --repeat 7
+    python benchmarks/micro_benchmarks.py --save-baseline
+    python benchmarks/micro_benchmarks.py --compare --threshold 0.15
+"""
+
+import os
+import sys
+import json
+import time
+import timeit
+import logging
+import argparse
+import platform
+import subprocess
+from typing import Dict, List, Any, Callable, Optional
+
+import numpy as np
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ML_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from corpus import generate_corpus
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_BASELINE_PATH = os.path.join(BENCH_DIR, "baselines", "micro_baseline.json")
+DEFAULT_THRESHOLD = 0.20
+
+DECODE_RESOLUTIONS = {
+    "small": (640, 480),
+    "medium": (1920, 1080),
+    "large": (4000, 3000),
+}
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+
+def benchmark(name: str):
+    """Register a setup function that returns the callable to time"""
+    def decorator(setup: Callable[[], Callable[[], Any]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+_corpus_cache: Dict[str, bytes] = {}
+
+
+def sample_image(size: str = "medium", image_format: str = "jpeg") -> bytes:
+    key = f"{size}_{image_format}"
+    if key not in _corpus_cache:
+        image = generate_corpus(1, seed=42, resolutions=[DECODE_RESOLUTIONS[size]], formats=[image_format])[0]
+        _corpus_cache[key] = image.data
+    return _corpus_cache[key]
+
+
+def _register_decode_cases():
+    from preprocessing import decode_image_bytes
+
+    for image_format in ("jpeg", "png", "webp"):
+        for size in DECODE_RESOLUTIONS:
+            def setup(size=size, image_format=image_format):
+                data = sample_image(size, image_format)
+                return lambda: decode_image_bytes(data)
+            benchmark(f"decode_image_bytes[{image_format}-{size}]")(setup)
+
+
+_register_decode_cases()
+
+
+@benchmark("preprocess_image[jpeg-medium]")
+def bench_preprocess_image():
+    from preprocessing import preprocess_image
+    data = sample_image("medium")
+    return lambda: preprocess_image(data)
+
+
+@benchmark("preprocess_batch_for_tta[jpeg-medium-5]")
+def bench_preprocess_batch_for_tta():
+    from preprocessing import preprocess_batch_for_tta
+    data = sample_image("medium")
+    return lambda: preprocess_batch_for_tta(data, num_augmentations=5)
+
+
+@benchmark("preprocess_with_center_crop[jpeg-medium]")
+def bench_preprocess_with_center_crop():
+    from preprocessing import preprocess_with_center_crop
+    data = sample_image("medium")
+    return lambda: preprocess_with_center_crop(data)
+
+
+@benchmark("softmax[1x7]")
+def bench_softmax_single():
+    from postprocessing import softmax
+    logits = np.random.default_rng(0).normal(size=(1, 7))
+    return lambda: softmax(logits)
+
+
+@benchmark("softmax[32x7]")
+def bench_softmax_batch():
+    from postprocessing import softmax
+    logits = np.random.default_rng(0).normal(size=(32, 7))
+    return lambda: softmax(logits)
+
+
+@benchmark("postprocess_batch[32x7]")
+def bench_postprocess_batch():
+    from postprocessing import postprocess_batch
+    logits = np.random.default_rng(0).normal(size=(32, 7))
+    return lambda: postprocess_batch(logits, temperature=1.5)
+
+
+@benchmark("top_k[32x38]")
+def bench_top_k():
+    from postprocessing import top_k
+    probs = np.random.default_rng(0).random(size=(32, 38))
+    return lambda: top_k(probs, 3)
+
+
+@benchmark("CropModel.predict[mock]")
+def bench_crop_model_predict():
+    from model_manager import CropModel
+    model = CropModel("rice")
+    data = sample_image("medium")
+    return lambda: model.predict(data)
+
+
+@benchmark("CropModel.predict_batch[mock-8]")
+def bench_crop_model_predict_batch():
+    from model_manager import CropModel
+    model = CropModel("rice")
+    images = [sample_image("small")] * 8
+    return lambda: model.predict_batch(images)
+
+
+@benchmark("CropModel.predict[mock-tta]")
+def bench_crop_model_predict_tta():
+    from model_manager import CropModel
+    model = CropModel("rice")
+    data = sample_image("medium")
+    return lambda: model.predict(data, use_tta=True)
+
+
+@benchmark("CropModel.predict[mock-tta-early-exit]")
+def bench_crop_model_predict_tta_early_exit():
+    from model_manager import CropModel
+    model = CropModel("rice")
+    data = sample_image("medium")
+    return lambda: model.predict(data, use_tta=True, early_exit=True)
+
+
+def time_case(func: Callable[[], Any], repeat: int = 5, min_time: float = 0.1) -> Dict[str, float]:
+    """Time a callable, returning per-call statistics in microseconds"""
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+
+    per_call = np.array(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+    return {
+        "min_us": round(float(per_call.min()), 3),
+        "median_us": round(float(np.median(per_call)), 3),
+        "mean_us": round(float(per_call.mean()), 3),
+        "stddev_us": round(float(per_call.std()), 3),
+        "loops": number,
+        "repeat": repeat,
+    }
+
+
+def run_benchmarks(name_filter: Optional[str] = None, repeat: int = 5, min_time: float = 0.1) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if name_filter and name_filter not in name:
+            continue
+        func = setup()
+        func()
+        results[name] = time_case(func, repeat=repeat, min_time=min_time)
+        logger.info(f"{name:<45} median {results[name]['median_us']:>12.1f} us  min {results[name]['min_us']:>12.1f} us")
+    return results
+
+
+def compare_to_baseline(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float = DEFAULT_THRESHOLD,
+    metric: str = "min_us"
+) -> List[Dict[str, Any]]:
+    """Return one comparison row per benchmark present in both runs"""
+    rows = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name][metric]
+        current = stats[metric]
+        change = (current - base) / base if base > 0 else 0.0
+        rows.append({
+            "name": name,
+            "baseline": base,
+            "current": current,
+            "change": round(change, 4),
+            "regression": change > threshold
+        })
+    return rows
+
+
+def cpu_model() -> str:
+    # platform.processor() is empty on most Linux builds
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def machine_info() -> Dict[str, Any]:
+    import cv2
+    try:
+        import onnxruntime
+        onnxruntime_version = onnxruntime.__version__
+    except ImportError:
+        onnxruntime_version = None
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "onnxruntime": onnxruntime_version,
+        "system": f"{platform.system()} {platform.release()}",
+        "machine": platform.machine(),
+        "processor": cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "affinity_cpus": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=ML_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    """Parse command line arguments"""
+    p = argparse.ArgumentParser(description='Micro-benchmarks for preprocessing and model_manager hot paths')
+    p.add_argument('--filter', default=None, help='Only run benchmarks whose name contains this string')
+    p.add_argument('--repeat', type=int, default=5)
+    p.add_argument('--min-time', type=float, default=0.1, help='Minimum seconds per repeat')
+    p.add_argument('--baseline', default=DEFAULT_BASELINE_PATH)
+    p.add_argument('--save-baseline', action='store_true', help='Overwrite the baseline with this run')
+    p.add_argument('--compare', action='store_true', help='Fail if any benchmark regresses past --threshold')
+    p.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Allowed slowdown ratio, e.g. 0.2 = 20%%')
+    p.add_argument('--metric', choices=['min_us', 'median_us', 'mean_us'], default='min_us')
+    p.add_argument('--output', default=None, help='Write JSON results to this path')
+    p.add_argument('--list', action='store_true', help='List benchmark names and exit')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.list:
+        for name in BENCHMARKS:
+            print(name)
+        return 0
+
+    results = run_benchmarks(args.filter, repeat=args.repeat, min_time=args.min_time)
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "machine": machine_info(),
+        "benchmarks": results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Benchmark results saved to {args.output}")
+
+    exit_code = 0
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            logger.error(f"Baseline not found at {args.baseline}; run with --save-baseline first")
+            return 1
+
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        if baseline.get("machine") != report["machine"]:
+            logger.warning(f"Baseline was recorded on a different machine ({baseline.get('machine')}, "
+                           f"commit {baseline.get('git_commit')}); comparisons may be noisy")
+
+        rows = compare_to_baseline(results, baseline["benchmarks"], args.threshold, args.metric)
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else "ok"
+            logger.info(f"{row['name']:<45} {row['baseline']:>12.1f} -> {row['current']:>12.1f} us ({row['change']:+.1%}) {flag}")
+
+        regressions = [row for row in rows if row["regression"]]
+        if regressions:
+            logger.error(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            exit_code = 1
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Baseline saved to {args.baseline}")
+
+    return exit_code
+
+
+if __name__ == '__main__':
+    exit(main())
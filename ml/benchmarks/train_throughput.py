@@ -0,0 +1,184 @@
+"""
+Training throughput benchmark for the fast CPU training modes in train.py.
+
+Runs a fixed number of optimizer steps per mode (precision, channels_last,
+torch.compile) on the same manifest, batches and initial weights, and
+reports training images/sec as JSON so modes and machines can be compared.
+Batches are decoded once up front so the numbers measure the model, not
+JPEG decoding.
+
+Examples:
+    python benchmarks/train_throughput.py --manifest data/manifest.csv
+    python benchmarks/train_throughput.py --manifest data/manifest.csv \\
+        --modes fp32 bf16+channels_last bf16+channels_last+compile --steps 30
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import logging
+import argparse
+import platform
+from typing import Dict, List, Any
+
+import torch
+from torch import nn
+from torch.utils.data import DataLoader
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ML_DIR)
+
+from dataset import ManifestImageDataset
+from train import build_model, get_transforms, prepare_training_model, train_step, bf16_supported
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MODES = ["fp32", "fp32+channels_last", "bf16", "bf16+channels_last", "bf16+channels_last+compile"]
+
+
+def parse_mode(mode: str) -> Dict[str, Any]:
+    """Turn e.g. ``bf16+channels_last+compile`` into prepare_training_model kwargs"""
+    parts = mode.split("+")
+    unknown = set(parts[1:]) - {"channels_last", "compile"}
+    if parts[0] not in ("fp32", "bf16") or unknown:
+        raise ValueError(f"Unknown training mode: {mode}")
+    return {
+        "precision": parts[0],
+        "channels_last": "channels_last" in parts,
+        "compile_model": "compile" in parts,
+    }
+
+
+def load_batches(manifest: str, img_size: int, batch_size: int, num_batches: int) -> List[Any]:
+    dataset = ManifestImageDataset(manifest, transform=get_transforms(img_size, train=True))
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True, drop_last=True,
+                        generator=torch.Generator().manual_seed(0))
+    # drop_last leaves no batches at all when the manifest is smaller than one
+    if len(loader) == 0:
+        raise ValueError(f"{manifest} has {len(dataset)} usable images, fewer than one batch of {batch_size}")
+    batches = []
+    while len(batches) < num_batches:
+        for batch in loader:
+            batches.append(batch)
+            if len(batches) == num_batches:
+                break
+    return batches
+
+
+def run_mode(base_model: nn.Module, batches: List[Any], mode: str, warmup: int, lr: float) -> Dict[str, Any]:
+    model = copy.deepcopy(base_model)
+    model.train()
+    train_model, autocast, settings = prepare_training_model(model, 'cpu', **parse_mode(mode))
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr)
+    criterion = nn.CrossEntropyLoss()
+
+    def step(batch):
+        xb, yb = batch
+        loss, _ = train_step(train_model, xb, yb, criterion, optimizer, autocast,
+                             channels_last=settings["channels_last"])
+        return loss
+
+    # Warmup covers torch.compile tracing and oneDNN kernel selection
+    t0 = time.perf_counter()
+    for batch in batches[:warmup]:
+        step(batch)
+    warmup_time = time.perf_counter() - t0
+
+    timed = batches[warmup:]
+    t0 = time.perf_counter()
+    for batch in timed:
+        loss = step(batch)
+    elapsed = time.perf_counter() - t0
+    images = sum(len(yb) for _, yb in timed)
+
+    return {
+        "mode": mode,
+        "applied": settings,
+        "images_per_sec": round(images / elapsed, 2),
+        "step_ms": round(1000 * elapsed / len(timed), 1),
+        "warmup_s": round(warmup_time, 2),
+        "final_loss": round(float(loss), 4)
+    }
+
+
+def machine_info() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "bf16_supported": bf16_supported('cpu')
+    }
+
+
+def parse_args():
+    """Parse command line arguments"""
+    p = argparse.ArgumentParser(description='Training images/sec per fast CPU training mode')
+    p.add_argument('--manifest', required=True, help='CSV manifest with image_path,label')
+    p.add_argument('--modes', nargs='+', default=DEFAULT_MODES,
+                   help='Modes as precision[+channels_last][+compile]')
+    p.add_argument('--model', default='tf_efficientnet_b0')
+    p.add_argument('--num-classes', type=int, default=2)
+    p.add_argument('--img-size', type=int, default=224)
+    p.add_argument('--batch-size', type=int, default=32)
+    p.add_argument('--steps', type=int, default=20, help='Timed optimizer steps per mode')
+    p.add_argument('--warmup', type=int, default=3, help='Untimed steps per mode')
+    p.add_argument('--lr', type=float, default=1e-4)
+    p.add_argument('--output', default=None, help='Write JSON results to this path')
+    args = p.parse_args()
+    if args.steps < 1:
+        p.error('--steps must be at least 1')
+    if args.warmup < 0:
+        p.error('--warmup must not be negative')
+    return args
+
+
+def main():
+    args = parse_args()
+    torch.manual_seed(0)
+
+    batches = load_batches(args.manifest, args.img_size, args.batch_size, args.warmup + args.steps)
+    base_model = build_model(args.model, num_classes=args.num_classes, pretrained=False)
+
+    results = []
+    for mode in args.modes:
+        result = run_mode(base_model, batches, mode, args.warmup, args.lr)
+        results.append(result)
+        logger.info(f"{mode:<30} {result['images_per_sec']:>8.1f} img/s  {result['step_ms']:>8.1f} ms/step")
+
+    baseline = results[0]["images_per_sec"]
+    for result in results:
+        result["speedup"] = round(result["images_per_sec"] / baseline, 3)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": machine_info(),
+        "config": {
+            "model": args.model, "img_size": args.img_size, "batch_size": args.batch_size,
+            "steps": args.steps, "manifest": os.path.abspath(args.manifest)
+        },
+        "results": results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Benchmark results saved to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
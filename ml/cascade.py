@@ -0,0 +1,123 @@
+import os
+import logging
+import threading
+from typing import Dict, List, Optional, Any, Tuple
+
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+
+CASCADE_STAGES = ("tta", "large", "llava")
+
+
+class CascadeConfig:
+    def __init__(
+        self,
+        enabled: bool = False,
+        confidence_threshold: float = 0.6,
+        margin_threshold: float = 0.15,
+        stages: Tuple[str, ...] = ("tta",),
+        llava_url: Optional[str] = None,
+        llava_timeout: float = 30.0
+    ):
+        unknown = [stage for stage in stages if stage not in CASCADE_STAGES]
+        if unknown:
+            raise ValueError(f"Unknown cascade stages: {unknown}. Supported: {list(CASCADE_STAGES)}")
+
+        self.enabled = enabled
+        self.confidence_threshold = confidence_threshold
+        self.margin_threshold = margin_threshold
+        self.stages = tuple(stages)
+        self.llava_url = llava_url
+        self.llava_timeout = llava_timeout
+
+    @classmethod
+    def from_env(cls) -> "CascadeConfig":
+        stages = os.environ.get("ML_CASCADE_STAGES", "tta")
+        return cls(
+            enabled=os.environ.get("ML_CASCADE_ENABLED", "false").lower() in ("1", "true", "yes"),
+            confidence_threshold=float(os.environ.get("ML_CASCADE_CONFIDENCE_THRESHOLD", 0.6)),
+            margin_threshold=float(os.environ.get("ML_CASCADE_MARGIN_THRESHOLD", 0.15)),
+            stages=tuple(s.strip() for s in stages.split(",") if s.strip()),
+            llava_url=os.environ.get("LLAVA_SERVICE_URL"),
+            llava_timeout=float(os.environ.get("LLAVA_SERVICE_TIMEOUT", 30.0))
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "confidence_threshold": self.confidence_threshold,
+            "margin_threshold": self.margin_threshold,
+            "stages": list(self.stages),
+            "llava_configured": self.llava_url is not None
+        }
+
+
+def top2_margin(result: Dict[str, Any]) -> float:
+    top = result.get("top_predictions", [])
+    if len(top) < 2:
+        return 1.0
+    return top[0]["confidence"] - top[1]["confidence"]
+
+
+def is_uncertain(result: Dict[str, Any], config: CascadeConfig) -> bool:
+    return (
+        result.get("confidence", 0.0) < config.confidence_threshold
+        or top2_margin(result) < config.margin_threshold
+    )
+
+
+def query_llava(url: str, image_bytes: bytes, timeout: float = 30.0) -> Dict[str, Any]:
+    try:
+        response = requests.post(
+            url,
+            files={"image": ("image.jpg", image_bytes, "image/jpeg")},
+            timeout=timeout
+        )
+        if response.status_code != 200:
+            return {"success": False, "error": f"LLaVA service error: {response.status_code}"}
+        return response.json()
+    except Exception as e:
+        logger.warning(f"LLaVA escalation failed: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
+class CascadeMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.total = 0
+            self.escalated = 0
+            self.stage_runs: Dict[str, int] = {}
+            self.stage_time_ms: Dict[str, float] = {}
+            self.resolved_by: Dict[str, int] = {}
+
+    def record(self, stages: List[Tuple[str, float]], resolved_by: str):
+        with self._lock:
+            self.total += 1
+            if len(stages) > 1:
+                self.escalated += 1
+            for stage, elapsed_ms in stages:
+                self.stage_runs[stage] = self.stage_runs.get(stage, 0) + 1
+                self.stage_time_ms[stage] = self.stage_time_ms.get(stage, 0.0) + elapsed_ms
+            self.resolved_by[resolved_by] = self.resolved_by.get(resolved_by, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "total_requests": self.total,
+                "escalated_requests": self.escalated,
+                "escalation_rate": round(self.escalated / self.total, 4) if self.total else 0.0,
+                "stage_rates": {
+                    stage: round(runs / self.total, 4) for stage, runs in self.stage_runs.items()
+                } if self.total else {},
+                "average_stage_time_ms": {
+                    stage: round(self.stage_time_ms[stage] / runs, 2) for stage, runs in self.stage_runs.items()
+                },
+                "resolved_by": dict(self.resolved_by)
+            }
@@ -0,0 +1,87 @@
+import os
+import logging
+from typing import Dict, List, Any
+
+from disease_database import SUPPORTED_CROPS
+
+
+logger = logging.getLogger(__name__)
+
+
+# crop_type value (and the /predict default) that asks the service to
+# identify the crop before disease classification
+AUTO_CROP = "auto"
+
+# Model directory for the crop-identification model, next to the crop
+# directories; same layout (flat, versioned or model.bundle). Its class
+# mapping maps class index to crop type.
+ROUTER_DIR = "crop_router"
+
+# Routing decisions below this confidence are returned as errors instead of
+# running a disease model that is probably the wrong one
+ROUTER_MIN_CONFIDENCE = float(os.environ.get("ML_CROP_ROUTER_MIN_CONFIDENCE", 0.0))
+
+
+# error_code of predictions that asked for crop identification while only
+# the mock router is available next to real disease models
+CROP_TYPE_REQUIRED = "crop_type_required"
+
+
+def default_router_labels() -> Dict[str, str]:
+    return {str(i): crop_type for i, crop_type in enumerate(SUPPORTED_CROPS)}
+
+
+class CropRouter:
+    # Wraps a CropModel whose classes are crop types. route() classifies a
+    # whole batch in one inference call so auto-routed items of a batch
+    # request can then be grouped per disease model.
+
+    def __init__(self, model, min_confidence: float = ROUTER_MIN_CONFIDENCE):
+        self.model = model
+        self.min_confidence = min_confidence
+
+        unknown = sorted(set(model.label_list) - set(SUPPORTED_CROPS))
+        if unknown:
+            logger.warning(f"Crop router predicts unsupported crop types {unknown}; those images will be rejected")
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model.is_loaded
+
+    def route(self, images: List[bytes]) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = [
+            {"success": False, "error": "Failed to preprocess image"}
+            for _ in images
+        ]
+
+        self.model.begin_request()
+        try:
+            batch, valid = self.model.classify_batch(images, temperature=self.model.temperature)
+        finally:
+            self.model.end_request()
+
+        for row, i in enumerate(valid):
+            crop_type = self.model.label_list[int(batch["class_ids"][row])]
+            confidence = float(batch["confidences"][row])
+            routing = {
+                "success": True,
+                "crop_type": crop_type,
+                "confidence": confidence,
+                "candidates": [
+                    {"crop_type": self.model.label_list[idx], "confidence": prob}
+                    for idx, prob in zip(batch["top_indices"][row].tolist(), batch["top_probabilities"][row].tolist())
+                ],
+                "mock_prediction": self.model.mock_mode,
+                "model_version": self.model.version
+            }
+
+            if crop_type not in SUPPORTED_CROPS:
+                routing.update(success=False, error=f"Crop router predicted unsupported crop type: {crop_type}")
+            elif confidence < self.min_confidence:
+                routing.update(
+                    success=False,
+                    error=f"Could not identify crop type (confidence {confidence:.2f} < {self.min_confidence:.2f})"
+                )
+            results[i] = routing
+
+        return results
@@ -7,11 +7,12 @@ from typing import Dict, List, Any, Tuple
 
 import pandas as pd
 import numpy as np
-import cv2
-from PIL import Image
 import great_expectations as ge
 from great_expectations.dataset import PandasDataset
 
+from image_checks import ImageCheckRun, summarize_checks
+from dedup import NEAR_DUPLICATE_DISTANCE, find_duplicate_groups, summarize_duplicates
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -106,63 +107,41 @@ class DataValidator:
         logger.info(f"Class distribution: {num_classes} classes, min {min_count} samples per class")
         return True
     
-    def validate_image_files(self, max_samples: int = None) -> Tuple[bool, Dict]:
+    def _default_checkpoint_dir(self) -> str:
+        return f"{os.path.splitext(self.manifest_path)[0]}.image_checks"
+    
+    def validate_image_files(self, max_samples: int = None, num_workers: int = None,
+                             checkpoint_dir: str = None) -> Tuple[bool, Dict]:
         """Validate image files
         
+        Each image is read and decoded once on a process pool. Per-file results
+        (dimensions, format, SHA-256, failure reason) are written as a columnar
+        report under checkpoint_dir; completed chunks are checkpointed there, so
+        rerunning with the same directory resumes an interrupted validation.
+        
         Args:
             max_samples: Maximum number of samples to validate (None for all)
+            num_workers: Worker processes (default: CPU count)
+            checkpoint_dir: Directory for progress and per-file results
+                (default: ``<manifest>.image_checks`` next to the manifest)
         """
-        df_sample = self.df if max_samples is None else self.df.sample(min(max_samples, len(self.df)))
-        
-        results = {
-            'total': len(df_sample),
-            'valid': 0,
-            'invalid': 0,
-            'missing': 0,
-            'corrupt': 0,
-            'invalid_files': []
-        }
-        
-        for idx, row in df_sample.iterrows():
-            img_path = row['image_path']
-            
-            # Handle relative paths
-            if not os.path.isabs(img_path):
-                img_path = os.path.join(self.base_dir, img_path)
-            
-            if not os.path.exists(img_path):
-                results['missing'] += 1
-                results['invalid_files'].append({'path': img_path, 'reason': 'missing'})
-                continue
-            
-            try:
-                # Try to open with OpenCV
-                img = cv2.imread(img_path)
-                if img is None:
-                    raise ValueError("OpenCV could not read image")
-                
-                # Check dimensions
-                h, w, c = img.shape
-                if h < 10 or w < 10 or c != 3:
-                    results['corrupt'] += 1
-                    results['invalid_files'].append({
-                        'path': img_path, 
-                        'reason': f'invalid dimensions: {h}x{w}x{c}'
-                    })
-                    continue
-                
-                # Try to open with PIL as well
-                with Image.open(img_path) as pil_img:
-                    pil_img.verify()  # Verify image integrity
-                
-                results['valid'] += 1
-                
-            except Exception as e:
-                results['corrupt'] += 1
-                results['invalid_files'].append({'path': img_path, 'reason': str(e)})
-        
-        results['invalid'] = results['missing'] + results['corrupt']
-        results['success'] = results['invalid'] == 0
+        checkpoint_dir = checkpoint_dir or self._default_checkpoint_dir()
+        manifest_path = self.manifest_path
+        
+        if max_samples is not None and max_samples < len(self.df):
+            # Fixed seed and a name tied to the manifest version, so a resumed
+            # sampled run checks the same images
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            mtime_ns = os.stat(self.manifest_path).st_mtime_ns
+            manifest_path = os.path.join(checkpoint_dir, f"sample_{max_samples}_{mtime_ns}.csv")
+            if not os.path.exists(manifest_path):
+                sample = self.df.sample(max_samples, random_state=42)
+                sample.rename_axis('row').to_csv(manifest_path)
+        
+        run = ImageCheckRun(manifest_path, checkpoint_dir, base_dir=self.base_dir, num_workers=num_workers)
+        checks = run.run()
+        results = summarize_checks(checks)
+        results['report_path'] = run.write_report(checks)
         
         self.validation_results['image_files'] = results
         
@@ -173,6 +152,45 @@ class DataValidator:
         logger.info(f"Image validation passed: {results['valid']} valid files")
         return True, results
     
+    def validate_duplicates(self, max_distance: int = NEAR_DUPLICATE_DISTANCE, num_workers: int = None,
+                            checkpoint_dir: str = None, output_path: str = None) -> Tuple[bool, Dict]:
+        """Find exact and near-duplicate images across the whole manifest
+        
+        Reuses the per-file SHA-256 and dHash from the image checks (resuming
+        from checkpoint_dir, so after a full validate_image_files run no image
+        is read again). Duplicates are harmless for training but leak between
+        splits unless the groups are passed to ``train.py --dedup-groups``.
+        Fails only when a duplicate group carries more than one label.
+        
+        Args:
+            max_distance: Maximum dHash Hamming distance for near duplicates
+                (negative for exact duplicates only)
+            num_workers: Worker processes for image checks
+            checkpoint_dir: Directory for image check progress and results
+            output_path: CSV to write the per-row duplicate groups to
+        """
+        checkpoint_dir = checkpoint_dir or self._default_checkpoint_dir()
+        run = ImageCheckRun(self.manifest_path, checkpoint_dir, base_dir=self.base_dir, num_workers=num_workers)
+        groups = find_duplicate_groups(run.run(), max_distance=max_distance)
+        results = summarize_duplicates(groups)
+        
+        if output_path:
+            columns = ['row', 'image_path', 'label', 'sha256', 'dhash', 'dup_group', 'dup_group_size', 'dup_kind']
+            groups[columns].to_csv(output_path, index=False)
+            results['groups_path'] = output_path
+        
+        self.validation_results['duplicates'] = results
+        
+        if not results['success']:
+            logger.error(f"Duplicate validation failed: {results['label_conflict_groups']} duplicate groups have conflicting labels")
+            return False, results
+        
+        logger.info(
+            f"Duplicate validation passed: {results['duplicate_rows']} rows in "
+            f"{results['duplicate_groups']} duplicate groups"
+        )
+        return True, results
+    
     def validate_label_consistency(self) -> bool:
         """Validate label consistency"""
         # Check if labels are consistent (all strings or all integers)
@@ -212,11 +230,18 @@ class DataValidator:
         logger.info(f"Label consistency validation passed: {result['result']['label_type']} labels")
         return True
     
-    def run_all_validations(self, max_image_samples: int = 100) -> bool:
+    def run_all_validations(self, max_image_samples: int = None, num_workers: int = None,
+                            checkpoint_dir: str = None, dedup_output: str = None,
+                            dedup_distance: int = NEAR_DUPLICATE_DISTANCE) -> bool:
         """Run all validations
         
         Args:
-            max_image_samples: Maximum number of images to validate
+            max_image_samples: Maximum number of images to validate (None for all)
+            num_workers: Worker processes for image checks
+            checkpoint_dir: Directory for image check progress and results
+            dedup_output: CSV path for duplicate groups; duplicate detection
+                only runs when this is set
+            dedup_distance: Maximum dHash Hamming distance for near duplicates
         """
         structure_valid = self.validate_manifest_structure()
         if not structure_valid:
@@ -226,9 +251,17 @@ class DataValidator:
         validations = [
             self.validate_class_distribution(),
             self.validate_label_consistency(),
-            self.validate_image_files(max_samples=max_image_samples)[0]
+            self.validate_image_files(
+                max_samples=max_image_samples, num_workers=num_workers, checkpoint_dir=checkpoint_dir
+            )[0]
         ]
         
+        if dedup_output:
+            validations.append(self.validate_duplicates(
+                max_distance=dedup_distance, num_workers=num_workers,
+                checkpoint_dir=checkpoint_dir, output_path=dedup_output
+            )[0])
+        
         all_valid = all(validations)
         
         if all_valid:
@@ -281,8 +314,16 @@ def parse_args():
                         help='Base directory for relative paths in manifest')
     parser.add_argument('--output', type=str, default='validation_report.json',
                         help='Path to save validation report')
-    parser.add_argument('--max-image-samples', type=int, default=100,
-                        help='Maximum number of images to validate')
+    parser.add_argument('--max-image-samples', type=int, default=None,
+                        help='Maximum number of images to validate (default: all)')
+    parser.add_argument('--num-workers', type=int, default=None,
+                        help='Worker processes for image checks (default: CPU count)')
+    parser.add_argument('--checkpoint-dir', type=str, default=None,
+                        help='Directory for resumable image check progress and per-file results')
+    parser.add_argument('--dedup-output', type=str, default=None,
+                        help='Find duplicate images and write their groups to this CSV (for train.py --dedup-groups)')
+    parser.add_argument('--dedup-distance', type=int, default=NEAR_DUPLICATE_DISTANCE,
+                        help='Maximum perceptual hash distance for near duplicates (-1 for exact only)')
     return parser.parse_args()
 
 
@@ -295,7 +336,13 @@ def main():
         base_dir=args.base_dir
     )
     
-    valid = validator.run_all_validations(max_image_samples=args.max_image_samples)
+    valid = validator.run_all_validations(
+        max_image_samples=args.max_image_samples,
+        num_workers=args.num_workers,
+        checkpoint_dir=args.checkpoint_dir,
+        dedup_output=args.dedup_output,
+        dedup_distance=args.dedup_distance
+    )
     validator.save_validation_report(args.output)
     
     return 0 if valid else 1
@@ -1,5 +1,8 @@
 import os
+import copy
+import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple, Optional, Union
 from pathlib import Path
 
@@ -11,6 +14,64 @@ from torch.utils.data import Dataset, random_split, Subset
 from sklearn.model_selection import train_test_split
 
 
+def to_tensor(img) -> torch.Tensor:
+    """Convert a transformed sample to a CHW float tensor
+
+    Transforms ending in ``ToTensorV2`` already return a normalized CHW
+    tensor; raw uint8 HWC images are scaled to [0, 1].
+    """
+    if isinstance(img, torch.Tensor):
+        return img.float()
+    
+    # astype copies, so read-only memmap slices become writable tensors
+    tensor = torch.from_numpy(img.astype(np.float32).transpose(2, 0, 1))
+    if img.dtype == np.uint8:
+        tensor = tensor / 255.0
+    return tensor
+
+
+FILE_CHECK_SUFFIX = ".filecheck.json"
+
+
+def resolve_manifest_paths(image_paths: pd.Series, root: str) -> np.ndarray:
+    """Resolve manifest image paths against the manifest directory in one pass"""
+    paths = image_paths.astype(str)
+    is_absolute = paths.str.startswith(os.sep)
+    if os.altsep:
+        is_absolute |= paths.str.match(r'^([A-Za-z]:)?[\\/]')
+    return np.where(is_absolute, paths, root + os.sep + paths).astype(object)
+
+
+def find_missing_files(paths, num_workers: int = 32) -> List[str]:
+    """Stat every path on a thread pool and return those that do not exist
+
+    Existence checks are dominated by filesystem latency (especially on
+    network storage) and release the GIL, so threads overlap them.
+    """
+    def missing(chunk) -> List[str]:
+        found = []
+        for path in chunk:
+            try:
+                os.stat(path)
+            except OSError:
+                found.append(path)
+        return found
+    
+    # Chunked so per-future overhead stays small next to a local stat
+    paths = list(paths)
+    chunks = [paths[i:i + 512] for i in range(0, len(paths), 512)]
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        return [path for found in pool.map(missing, chunks) for path in found]
+
+
+def class_weights_from_counts(class_counts: Dict[int, int]) -> torch.Tensor:
+    """Inverse-frequency class weights normalized to sum to the number of classes"""
+    counts = np.array(list(class_counts.values()))
+    weights = 1.0 / counts
+    weights = weights / weights.sum() * len(class_counts)
+    return torch.tensor(weights, dtype=torch.float32)
+
+
 class ManifestImageDataset(Dataset):
     """Enhanced manifest-based dataset for production use.
 
@@ -18,7 +79,8 @@ class ManifestImageDataset(Dataset):
     image_path can be absolute or relative to the manifest file directory.
     """
 
-    def __init__(self, manifest_csv: str, transform=None, class_mapping: Dict[int, str] = None):
+    def __init__(self, manifest_csv: str, transform=None, class_mapping: Dict[int, str] = None,
+                 check_workers: int = 32, use_check_cache: bool = True):
         self.manifest_csv = manifest_csv
         self.df = pd.read_csv(manifest_csv)
         self.root = os.path.dirname(os.path.abspath(manifest_csv))
@@ -26,20 +88,59 @@ class ManifestImageDataset(Dataset):
         self.class_mapping = class_mapping
         self.class_counts = self._count_classes()
         
+        # Resolved once so __getitem__ avoids per-sample pandas row access
+        self.paths = resolve_manifest_paths(self.df['image_path'], self.root)
+        self.labels = self.df['label'].to_numpy(dtype=np.int64)
+        self.source_rows = np.arange(len(self.df))
+        
         # Validate data integrity
-        self._validate_dataset()
-        
-    def _validate_dataset(self):
-        """Validate dataset integrity"""
-        # Check for missing files
-        missing_files = []
-        for idx, row in self.df.iterrows():
-            path = row['image_path']
-            if not os.path.isabs(path):
-                path = os.path.join(self.root, path)
-            if not os.path.exists(path):
-                missing_files.append(path)
+        self.missing_files: List[str] = []
+        self._validate_dataset(check_workers, use_check_cache)
+        
+    def _check_cache_key(self) -> Dict[str, int]:
+        stat = os.stat(self.manifest_csv)
+        return {"manifest_mtime_ns": stat.st_mtime_ns, "manifest_size": stat.st_size}
+    
+    def _load_check_cache(self) -> Optional[List[str]]:
+        cache_path = self.manifest_csv + FILE_CHECK_SUFFIX
+        try:
+            with open(cache_path, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
         
+        if any(cache.get(key) != value for key, value in self._check_cache_key().items()):
+            return None
+        return cache.get("missing_files")
+    
+    def _save_check_cache(self):
+        cache_path = self.manifest_csv + FILE_CHECK_SUFFIX
+        cache = {**self._check_cache_key(), "num_rows": len(self.df), "missing_files": self.missing_files}
+        try:
+            tmp_path = f"{cache_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logging.warning(f"Could not write file check cache {cache_path}: {str(e)}")
+    
+    def _validate_dataset(self, check_workers: int = 32, use_cache: bool = True):
+        """Validate dataset integrity
+
+        The missing-file list is cached next to the manifest, keyed on its
+        mtime and size, so later runs on an unchanged manifest skip the
+        filesystem scan. Delete the ``.filecheck.json`` file to force one.
+        """
+        cached = self._load_check_cache() if use_cache else None
+        if cached is not None:
+            self.missing_files = cached
+            logging.info(f"Using cached file check for {self.manifest_csv}")
+        else:
+            self.missing_files = find_missing_files(self.paths, check_workers)
+            if use_cache:
+                self._save_check_cache()
+        
+        missing_files = self.missing_files
         if missing_files:
             logging.warning(f"Found {len(missing_files)} missing files in dataset")
             if len(missing_files) > 5:
@@ -55,10 +156,7 @@ class ManifestImageDataset(Dataset):
         return len(self.df)
 
     def __getitem__(self, idx):
-        row = self.df.iloc[idx]
-        path = row['image_path']
-        if not os.path.isabs(path):
-            path = os.path.join(self.root, path)
+        path = self.paths[idx]
         
         try:
             img = cv2.imread(path)
@@ -70,7 +168,7 @@ class ManifestImageDataset(Dataset):
             # Return a placeholder image in production to avoid crashing
             img = np.zeros((224, 224, 3), dtype=np.uint8)
             
-        label = int(row['label'])
+        label = int(self.labels[idx])
         
         if self.transform:
             try:
@@ -79,22 +177,125 @@ class ManifestImageDataset(Dataset):
             except Exception as e:
                 logging.error(f"Error in transform for {path}: {str(e)}")
                 # Return unaugmented image if transform fails
-                img = torch.from_numpy(img).permute(2, 0, 1).float() / 255.0
-                return img, label
                 
-        img = torch.from_numpy(img).permute(2, 0, 1).float() / 255.0
-        return img, label
+        return to_tensor(img), label
+    
+    def with_transform(self, transform) -> "ManifestImageDataset":
+        """Shallow copy sharing the manifest but applying a different transform"""
+        dataset = copy.copy(self)
+        dataset.transform = transform
+        return dataset
+        
+    def get_class_weights(self) -> torch.Tensor:
+        """Calculate class weights for imbalanced datasets"""
+        return class_weights_from_counts(self.class_counts)
+
+
+SHARD_INDEX_FILE = "index.json"
+SHARD_LABELS_FILE = "labels.npy"
+SHARD_ROWS_FILE = "rows.npy"
+
+
+class ShardedImageDataset(Dataset):
+    """Dataset over pre-decoded image shards written by ``pack_shards.py``.
+
+    Each shard is a ``.npy`` uint8 array of shape (N, size, size, 3) that is
+    opened with ``np.memmap`` on first access in each DataLoader worker, so a
+    sample is a zero-copy slice of the page cache rather than a JPEG decode.
+    """
+
+    def __init__(self, shard_dir: str, transform=None):
+        self.shard_dir = shard_dir
+        self.transform = transform
+        
+        with open(os.path.join(shard_dir, SHARD_INDEX_FILE), 'r') as f:
+            self.index = json.load(f)
         
+        self.image_size = self.index["image_size"]
+        self.shard_files = [shard["file"] for shard in self.index["shards"]]
+        self.shard_starts = np.cumsum([0] + [shard["count"] for shard in self.index["shards"]])
+        self.labels = np.load(os.path.join(shard_dir, SHARD_LABELS_FILE))
+        # Manifest row of each packed image (unreadable images were skipped)
+        rows_path = os.path.join(shard_dir, SHARD_ROWS_FILE)
+        self.source_rows = np.load(rows_path) if os.path.exists(rows_path) else None
+        self.class_counts = {
+            int(label): int(count) for label, count in zip(*np.unique(self.labels, return_counts=True))
+        }
+        self._shards: Dict[int, np.ndarray] = {}
+        
+        if len(self.labels) != self.shard_starts[-1]:
+            raise ValueError(
+                f"Shard index lists {self.shard_starts[-1]} images but {SHARD_LABELS_FILE} has {len(self.labels)} labels"
+            )
+    
+    def __getstate__(self):
+        # Memory maps are reopened in each DataLoader worker instead of being
+        # pickled (which would copy the shard contents)
+        state = self.__dict__.copy()
+        state["_shards"] = {}
+        return state
+    
+    def _shard(self, shard_id: int) -> np.ndarray:
+        shard = self._shards.get(shard_id)
+        if shard is None:
+            shard = np.load(os.path.join(self.shard_dir, self.shard_files[shard_id]), mmap_mode='r')
+            self._shards[shard_id] = shard
+        return shard
+    
+    def __len__(self):
+        return len(self.labels)
+    
+    def image(self, idx: int) -> np.ndarray:
+        """Stored uint8 image without the transform (a memmap view)"""
+        if idx < 0:
+            idx += len(self)
+        shard_id = int(np.searchsorted(self.shard_starts, idx, side='right')) - 1
+        return self._shard(shard_id)[idx - self.shard_starts[shard_id]]
+    
+    def __getitem__(self, idx):
+        img = self.image(idx)
+        label = int(self.labels[idx])
+        
+        if self.transform:
+            try:
+                img = self.transform(image=img)['image']
+            except Exception as e:
+                logging.error(f"Error in transform for sample {idx}: {str(e)}")
+        
+        return to_tensor(img), label
+    
+    def with_transform(self, transform) -> "ShardedImageDataset":
+        """Shallow copy sharing the shard maps but applying a different transform"""
+        dataset = copy.copy(self)
+        dataset.transform = transform
+        return dataset
+    
     def get_class_weights(self) -> torch.Tensor:
         """Calculate class weights for imbalanced datasets"""
-        counts = np.array(list(self.class_counts.values()))
-        weights = 1.0 / counts
-        weights = weights / weights.sum() * len(self.class_counts)
-        return torch.tensor(weights, dtype=torch.float32)
+        return class_weights_from_counts(self.class_counts)
+
+
+def _group_holdout_split(indices: List[int], groups: np.ndarray, holdout_size: int,
+                         random_seed: int) -> Tuple[List[int], List[int]]:
+    """Split indices so that all members of a group land on the same side
+
+    Groups are shuffled with the seed and moved to the holdout side until it
+    holds at least ``holdout_size`` samples.
+    """
+    indices = np.asarray(indices)
+    unique_groups, inverse, sizes = np.unique(groups[indices], return_inverse=True, return_counts=True)
+    order = np.random.RandomState(random_seed).permutation(len(unique_groups))
+    filled_before = np.cumsum(sizes[order]) - sizes[order]
+    
+    is_holdout = np.zeros(len(unique_groups), dtype=bool)
+    is_holdout[order[filled_before < holdout_size]] = True
+    holdout_mask = is_holdout[inverse]
+    return indices[~holdout_mask].tolist(), indices[holdout_mask].tolist()
 
 
 def create_data_splits(dataset: Dataset, val_size: float = 0.2, test_size: float = 0.1, 
-                      random_seed: int = 42) -> Tuple[Subset, Subset, Optional[Subset]]:
+                      random_seed: int = 42, groups: Optional[np.ndarray] = None
+                      ) -> Tuple[Subset, Subset, Optional[Subset]]:
     """Split dataset into train, validation and test sets
     
     Args:
@@ -102,6 +303,9 @@ def create_data_splits(dataset: Dataset, val_size: float = 0.2, test_size: float
         val_size: Proportion of data to use for validation
         test_size: Proportion of data to use for testing (0 for no test set)
         random_seed: Random seed for reproducibility
+        groups: Optional group id per sample (e.g. duplicate clusters from
+            ``dedup.find_duplicate_groups``); samples sharing a group are
+            kept in the same split, so split sizes are approximate
         
     Returns:
         Tuple of (train_dataset, val_dataset, test_dataset)
@@ -110,18 +314,25 @@ def create_data_splits(dataset: Dataset, val_size: float = 0.2, test_size: float
     dataset_size = len(dataset)
     indices = list(range(dataset_size))
     
+    if groups is not None:
+        groups = np.asarray(groups)
+        if len(groups) != dataset_size:
+            raise ValueError(f"Got {len(groups)} groups for a dataset of {dataset_size} samples")
+        
+        def split(split_indices, holdout_size):
+            return _group_holdout_split(split_indices, groups, holdout_size, random_seed)
+    else:
+        def split(split_indices, holdout_size):
+            return train_test_split(split_indices, test_size=holdout_size, random_state=random_seed, stratify=None)
+    
     if test_size > 0:
         # First split off the test set
         test_split = int(np.floor(test_size * dataset_size))
-        train_val_indices, test_indices = train_test_split(
-            indices, test_size=test_split, random_state=random_seed, stratify=None
-        )
+        train_val_indices, test_indices = split(indices, test_split)
         
         # Then split the remaining data into train and val
         val_split = int(np.floor(val_size * len(train_val_indices)))
-        train_indices, val_indices = train_test_split(
-            train_val_indices, test_size=val_split, random_state=random_seed, stratify=None
-        )
+        train_indices, val_indices = split(train_val_indices, val_split)
         
         train_dataset = Subset(dataset, train_indices)
         val_dataset = Subset(dataset, val_indices)
@@ -131,9 +342,7 @@ def create_data_splits(dataset: Dataset, val_size: float = 0.2, test_size: float
     else:
         # Just split into train and val
         val_split = int(np.floor(val_size * dataset_size))
-        train_indices, val_indices = train_test_split(
-            indices, test_size=val_split, random_state=random_seed, stratify=None
-        )
+        train_indices, val_indices = split(indices, val_split)
         
         train_dataset = Subset(dataset, train_indices)
         val_dataset = Subset(dataset, val_indices)
@@ -0,0 +1,140 @@
+import logging
+from typing import Dict, Any, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+logger = logging.getLogger(__name__)
+
+
+# Maximum Hamming distance between 64-bit dHashes for two images to count as
+# near duplicates (re-encoded, resized or lightly edited copies)
+NEAR_DUPLICATE_DISTANCE = 4
+
+# Buckets larger than this (e.g. thousands of blank frames) are compared in
+# tiles of this many hashes per side, so one comparison never needs more than
+# this squared in memory
+MAX_BUCKET_COMPARE = 2048
+
+
+def parse_hashes(hex_hashes: pd.Series) -> np.ndarray:
+    return np.array([int(h, 16) for h in hex_hashes], dtype=np.uint64)
+
+
+def near_duplicate_pairs(hashes: np.ndarray, max_distance: int = NEAR_DUPLICATE_DISTANCE) -> Tuple[np.ndarray, np.ndarray]:
+    """Index pairs of hashes within max_distance bits of each other
+
+    Multi-index hashing: the 64 bits are cut into max_distance + 1 bands.
+    Two hashes that differ in at most max_distance bits agree exactly on at
+    least one band (pigeonhole), so only hashes sharing a band value are
+    compared. With well-spread hashes that is close to linear in n instead
+    of all n^2 / 2 pairs.
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    num_bands = min(max_distance + 1, 64)
+    edges = np.linspace(0, 64, num_bands + 1).astype(int)
+    found_i, found_j = [], []
+
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        mask = np.uint64((1 << (hi - lo)) - 1)
+        keys = (hashes >> np.uint64(lo)) & mask
+        order = np.argsort(keys, kind='stable')
+        boundaries = np.flatnonzero(np.diff(keys[order])) + 1
+
+        for bucket in np.split(order, boundaries):
+            if len(bucket) < 2:
+                continue
+            # Upper triangle of the bucket's pair matrix, one tile at a time
+            for left_start in range(0, len(bucket), MAX_BUCKET_COMPARE):
+                left = bucket[left_start:left_start + MAX_BUCKET_COMPARE]
+                for right_start in range(left_start, len(bucket), MAX_BUCKET_COMPARE):
+                    right = bucket[right_start:right_start + MAX_BUCKET_COMPARE]
+                    distances = np.bitwise_count(hashes[left][:, None] ^ hashes[right][None, :])
+                    a, b = np.nonzero(distances <= max_distance)
+                    keep = right_start + b > left_start + a
+                    found_i.append(left[a[keep]])
+                    found_j.append(right[b[keep]])
+
+    if not found_i:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    pairs = np.unique(np.stack([np.concatenate(found_i), np.concatenate(found_j)], axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def find_duplicate_groups(checks: pd.DataFrame, max_distance: int = NEAR_DUPLICATE_DISTANCE) -> pd.DataFrame:
+    """Cluster exact (same SHA-256) and near (close dHash) duplicate images
+
+    Args:
+        checks: Per-file results from ``image_checks.ImageCheckRun`` with
+            row, sha256 and dhash columns
+        max_distance: Hamming distance threshold for near duplicates;
+            negative disables near-duplicate matching
+
+    Returns:
+        ``checks`` with dup_group (connected component over both kinds of
+        match; unique images get their own group), dup_group_size and
+        dup_kind ("", "exact" or "near")
+    """
+    checks = checks.reset_index(drop=True)
+    n = len(checks)
+    edges_i, edges_j = [], []
+
+    # Rows sharing a hash are chained to the first row with that hash
+    def chain(keys: pd.Series):
+        valid = keys[keys != ""]
+        rows = valid.index.to_numpy()
+        first = pd.Series(rows).groupby(valid.to_numpy()).transform('first').to_numpy()
+        linked = rows != first
+        edges_i.append(rows[linked])
+        edges_j.append(first[linked].astype(np.int64))
+
+    chain(checks['sha256'])
+    exact = np.zeros(n, dtype=bool)
+    exact[np.concatenate(edges_i)] = True
+    exact[np.concatenate(edges_j)] = True
+
+    if max_distance >= 0:
+        hashed = checks[checks['dhash'] != ""]
+        unique_hashes, first_rows = np.unique(hashed['dhash'].to_numpy(), return_index=True)
+        representatives = hashed.index.to_numpy()[first_rows]
+        chain(checks['dhash'])
+        i, j = near_duplicate_pairs(parse_hashes(pd.Series(unique_hashes)), max_distance)
+        edges_i.append(representatives[i])
+        edges_j.append(representatives[j])
+
+    rows = np.concatenate(edges_i).astype(np.int64)
+    cols = np.concatenate(edges_j).astype(np.int64)
+    graph = coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+
+    result = checks.copy()
+    result['dup_group'] = labels
+    result['dup_group_size'] = result.groupby('dup_group')['dup_group'].transform('size')
+    result['dup_kind'] = np.where(result['dup_group_size'] == 1, "", np.where(exact, "exact", "near"))
+    return result
+
+
+def summarize_duplicates(groups: pd.DataFrame) -> Dict[str, Any]:
+    """Duplicate counts and label conflicts for a DataValidator report"""
+    duplicated = groups[groups['dup_group_size'] > 1]
+    labels_per_group = duplicated.groupby('dup_group')['label'].nunique()
+    conflicts = labels_per_group[labels_per_group > 1].index
+
+    return {
+        'total': len(groups),
+        'duplicate_groups': int(duplicated['dup_group'].nunique()),
+        'duplicate_rows': len(duplicated),
+        'exact_duplicate_rows': int((duplicated['dup_kind'] == "exact").sum()),
+        'near_duplicate_rows': int((duplicated['dup_kind'] == "near").sum()),
+        'redundant_rows': len(duplicated) - int(duplicated['dup_group'].nunique()),
+        'label_conflict_groups': len(conflicts),
+        'label_conflicts': [
+            {'dup_group': int(group), 'image_paths': paths.tolist()}
+            for group, paths in duplicated[duplicated['dup_group'].isin(conflicts[:100])]
+            .groupby('dup_group')['image_path']
+        ],
+        'success': len(conflicts) == 0
+    }
@@ -0,0 +1,161 @@
+import os
+import contextlib
+import logging
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Dict, List, Any, Sequence
+
+import numpy as np
+import torch
+import torch.distributed as dist
+
+from utils import weighted_scores
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DistributedContext:
+    """Rank layout of the current process (a single process when not launched by torchrun)"""
+    rank: int = 0
+    local_rank: int = 0
+    world_size: int = 1
+
+    @property
+    def is_distributed(self) -> bool:
+        return self.world_size > 1
+
+    @property
+    def is_main(self) -> bool:
+        return self.rank == 0
+
+
+def launched_distributed() -> bool:
+    """Whether torchrun (or another launcher) started several ranks"""
+    return int(os.environ.get("WORLD_SIZE", 1)) > 1
+
+
+def init_distributed(backend: str = "gloo") -> DistributedContext:
+    """Join the process group described by the torchrun environment variables
+
+    Args:
+        backend: torch.distributed backend; gloo works on CPU-only nodes
+
+    Returns:
+        This process's rank layout
+    """
+    if not launched_distributed():
+        return DistributedContext()
+
+    dist.init_process_group(backend=backend)
+    ctx = DistributedContext(
+        rank=dist.get_rank(),
+        local_rank=int(os.environ.get("LOCAL_RANK", 0)),
+        world_size=dist.get_world_size()
+    )
+    logger.info(f"Joined {backend} process group as rank {ctx.rank}/{ctx.world_size}")
+    return ctx
+
+
+def cleanup_distributed(ctx: DistributedContext):
+    if ctx.is_distributed and dist.is_initialized():
+        dist.destroy_process_group()
+
+
+def barrier(ctx: DistributedContext):
+    if ctx.is_distributed:
+        dist.barrier()
+
+
+def broadcast_buffers(model: torch.nn.Module, ctx: DistributedContext):
+    """Copy rank 0's buffers (BatchNorm running stats) to every rank
+
+    DDP syncs buffers at the start of each forward pass, so after the last
+    training step every replica holds statistics from its own batches.
+    Evaluating those mixed replicas would not score the weights rank 0
+    checkpoints.
+    """
+    if ctx.is_distributed:
+        for buffer in model.buffers():
+            dist.broadcast(buffer, src=0)
+
+
+def shard_indices(indices: Sequence[int], ctx: DistributedContext) -> List[int]:
+    """Strided share of indices for this rank
+
+    Unlike DistributedSampler nothing is padded, so every evaluation sample
+    is counted exactly once when the shards are gathered.
+    """
+    return list(indices)[ctx.rank::ctx.world_size]
+
+
+def all_reduce_sum(tensor: torch.Tensor, ctx: DistributedContext) -> torch.Tensor:
+    if ctx.is_distributed:
+        dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return tensor
+
+
+def gather_evaluation(metrics: Dict[str, Any], ctx: DistributedContext,
+                      gather_outputs: bool = False) -> Dict[str, Any]:
+    """Combine per-rank ``utils.evaluate`` results into whole-dataset metrics
+
+    Confusion matrices are summed with ``all_reduce``, so every rank gets the
+    metrics it would have computed on the full dataset for O(classes^2)
+    traffic. The per-sample arrays are only gathered (concatenated in rank
+    order) with ``gather_outputs``, e.g. for temperature fitting; otherwise
+    they are dropped rather than left holding this rank's share.
+    """
+    if not ctx.is_distributed:
+        return metrics
+
+    # Ranks without samples report a (0, 0) confusion matrix
+    local_cm = metrics['confusion_matrix']
+    num_classes = torch.tensor([local_cm.shape[0]], dtype=torch.int64)
+    dist.all_reduce(num_classes, op=dist.ReduceOp.MAX)
+    n = int(num_classes.item())
+    if n == 0:
+        return metrics
+
+    cm = torch.zeros((n, n), dtype=torch.int64)
+    cm[:local_cm.shape[0], :local_cm.shape[1]] = torch.from_numpy(local_cm)
+    dist.all_reduce(cm, op=dist.ReduceOp.SUM)
+    cm = cm.numpy()
+
+    gathered = {key: None for key in ('predictions', 'labels', 'probabilities', 'logits')}
+    if gather_outputs:
+        parts: List[Dict[str, Any]] = [None] * ctx.world_size
+        dist.all_gather_object(parts, {key: metrics[key] for key in gathered})
+        parts = [part for part in parts if len(part['labels'])]
+        for key in gathered:
+            if all(part[key] is not None for part in parts):
+                gathered[key] = np.concatenate([part[key] for part in parts])
+
+    return {
+        **weighted_scores(cm),
+        'confusion_matrix': cm,
+        **gathered
+    }
+
+
+class NullTracker:
+    """Stands in for ``mlflow`` on non-zero ranks so only rank 0 logs"""
+
+    def __init__(self):
+        self.pytorch = SimpleNamespace(log_model=lambda *args, **kwargs: None)
+
+    def set_experiment(self, *args, **kwargs):
+        pass
+
+    @contextlib.contextmanager
+    def start_run(self, *args, **kwargs):
+        yield SimpleNamespace(info=SimpleNamespace(run_id=None))
+
+    def log_params(self, *args, **kwargs):
+        pass
+
+    def log_metrics(self, *args, **kwargs):
+        pass
+
+    def log_artifact(self, *args, **kwargs):
+        pass
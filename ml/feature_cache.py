@@ -0,0 +1,300 @@
+import os
+import json
+import fcntl
+import hashlib
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+import torch
+from torch import nn
+from torch.utils.data import DataLoader, Dataset, Subset
+
+
+logger = logging.getLogger(__name__)
+
+
+FEATURES_FILE = "features.f32"
+INDEX_FILE = "index.json"
+LOCK_FILE = ".lock"
+
+
+def backbone_version(model: nn.Module, model_name: str, img_size: int) -> str:
+    """Content hash of everything except the classification head
+
+    Features depend on the backbone weights and the input size, so a cache
+    keyed on this hash stays valid across head retraining and is bypassed
+    as soon as the backbone is fine-tuned or swapped.
+    """
+    classifier = model.pretrained_cfg.get("classifier", "") if hasattr(model, "pretrained_cfg") else ""
+    digest = hashlib.sha256(f"{model_name}:{img_size}".encode())
+    for name, tensor in sorted(model.state_dict().items()):
+        if classifier and name.startswith(f"{classifier}."):
+            continue
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sample_keys(dataset: Dataset, num_workers: int = 16) -> List[str]:
+    """Content hash per sample, so renamed or re-listed images hit the cache
+
+    Manifest datasets hash the image files; shard datasets hash the stored
+    pixels.
+    """
+    if hasattr(dataset, "paths"):
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            return list(pool.map(_hash_file, dataset.paths))
+    return [hashlib.sha256(np.ascontiguousarray(dataset.image(i)).tobytes()).hexdigest() for i in range(len(dataset))]
+
+
+class FeatureCache:
+    """Append-only store of pooled backbone features for one backbone version.
+
+    Features are float32 rows in ``features.f32`` under
+    ``<cache_root>/<version>/``, read back with ``np.memmap``. ``index.json``
+    maps sample keys to rows. Appended rows are buffered in memory and
+    committed by ``flush`` while holding an exclusive ``flock`` on the
+    directory's lock file, so several processes (e.g. parallel train_all
+    jobs on the same backbone) can share a cache. A commit re-reads the
+    index first, drops rows no index lists (from an interrupted writer),
+    writes the new rows and then replaces the index.
+    """
+
+    def __init__(self, cache_root: str, version: str, feature_dim: int):
+        self.dir = os.path.join(cache_root, version)
+        self.feature_dim = feature_dim
+        self.features_path = os.path.join(self.dir, FEATURES_FILE)
+        self.index_path = os.path.join(self.dir, INDEX_FILE)
+        self.lock_path = os.path.join(self.dir, LOCK_FILE)
+        os.makedirs(self.dir, exist_ok=True)
+
+        self.keys: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self._pending_keys: List[str] = []
+        self._pending_features: List[np.ndarray] = []
+        with self._locked():
+            self._reload()
+
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _reload(self):
+        """Read the committed index and drop rows it does not list (caller holds the lock)"""
+        keys: List[str] = []
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            if index.get("feature_dim") == self.feature_dim:
+                keys = index["keys"]
+        except (OSError, ValueError):
+            pass
+
+        self.keys = keys
+        self.rows = {key: row for row, key in enumerate(keys)}
+
+        row_bytes = self.feature_dim * 4
+        if not os.path.exists(self.features_path) or os.path.getsize(self.features_path) != len(keys) * row_bytes:
+            with open(self.features_path, 'ab') as f:
+                f.truncate(len(keys) * row_bytes)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, keys: List[str]) -> np.ndarray:
+        """Cache row per key, -1 where the key is not cached (or not flushed yet)"""
+        return np.array([self.rows.get(key, -1) for key in keys], dtype=np.int64)
+
+    def append(self, keys: List[str], features: np.ndarray):
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        if features.shape != (len(keys), self.feature_dim):
+            raise ValueError(f"Expected features of shape {(len(keys), self.feature_dim)}, got {features.shape}")
+
+        self._pending_keys.extend(keys)
+        self._pending_features.append(features)
+
+    def flush(self):
+        if not self._pending_keys:
+            return
+
+        features = np.concatenate(self._pending_features)
+        with self._locked():
+            # Other writers may have committed since our last look; their
+            # rows keep their positions and keys they already cached are skipped
+            self._reload()
+            new: Dict[str, int] = {}
+            for i, key in enumerate(self._pending_keys):
+                if key not in self.rows:
+                    new.setdefault(key, i)
+
+            if new:
+                with open(self.features_path, 'ab') as f:
+                    f.write(features[list(new.values())].tobytes())
+                for key in new:
+                    self.rows[key] = len(self.keys)
+                    self.keys.append(key)
+
+                tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump({"feature_dim": self.feature_dim, "keys": self.keys}, f)
+                os.replace(tmp_path, self.index_path)
+
+        self._pending_keys = []
+        self._pending_features = []
+
+    def features(self) -> np.ndarray:
+        if not self.keys:
+            return np.empty((0, self.feature_dim), dtype=np.float32)
+        return np.memmap(self.features_path, dtype=np.float32, mode='r', shape=(len(self.keys), self.feature_dim))
+
+
+def pooled_features(model: nn.Module, x: torch.Tensor) -> torch.Tensor:
+    """Backbone output right before the classifier (timm pre-logits)"""
+    return model.forward_head(model.forward_features(x), pre_logits=True)
+
+
+def extract_features(
+    model: nn.Module,
+    dataset: Dataset,
+    keys: List[str],
+    cache: FeatureCache,
+    batch_size: int = 64,
+    num_workers: int = 4,
+    device: str = 'cpu',
+    flush_every: int = 50
+) -> np.ndarray:
+    """Run the frozen backbone over samples missing from the cache
+
+    Args:
+        model: timm model whose backbone produces the features
+        dataset: Dataset with a deterministic (validation) transform
+        keys: Content key per dataset sample, from sample_keys
+        cache: Cache for this backbone version
+        batch_size: Inference batch size
+        num_workers: DataLoader workers
+        device: Device to run the backbone on
+        flush_every: Batches buffered between cache commits, bounding lost
+            work when extraction is interrupted
+
+    Returns:
+        Cache row per dataset sample
+    """
+    rows = cache.lookup(keys)
+    missing: Dict[str, int] = {}
+    for idx in np.flatnonzero(rows < 0).tolist():
+        # Duplicate images are extracted once
+        missing.setdefault(keys[idx], idx)
+
+    if missing:
+        logger.info(f"Extracting features for {len(missing)} images ({len(keys) - int((rows < 0).sum())} cached)")
+        loader = DataLoader(Subset(dataset, list(missing.values())), batch_size=batch_size,
+                            shuffle=False, num_workers=num_workers)
+        missing_keys = list(missing)
+        start = 0
+        model.eval()
+        with torch.no_grad():
+            for batch_id, (xb, _) in enumerate(loader, 1):
+                features = pooled_features(model, xb.to(device)).float().cpu().numpy()
+                cache.append(missing_keys[start:start + len(features)], features)
+                start += len(features)
+                if batch_id % flush_every == 0:
+                    cache.flush()
+        cache.flush()
+        rows = cache.lookup(keys)
+    else:
+        logger.info(f"All {len(keys)} image features found in cache")
+
+    return rows
+
+
+def train_head(
+    head: nn.Linear,
+    features: np.ndarray,
+    train_rows: np.ndarray,
+    train_labels: np.ndarray,
+    val_rows: np.ndarray,
+    val_labels: np.ndarray,
+    epochs: int = 30,
+    lr: float = 1e-3,
+    weight_decay: float = 1e-4,
+    batch_size: int = 256,
+    class_weights: Optional[torch.Tensor] = None,
+    seed: int = 42
+) -> Dict[str, Any]:
+    """Fit a linear classification head on cached features
+
+    The head keeps the weights of the epoch with the best validation
+    accuracy.
+
+    Args:
+        head: Classifier to train in place (the model's own head)
+        features: Cached feature matrix (may be a memmap)
+        train_rows: Feature rows of the training samples
+        train_labels: Labels of the training samples
+        val_rows: Feature rows of the validation samples
+        val_labels: Labels of the validation samples
+        epochs: Passes over the training features
+        lr: AdamW learning rate
+        weight_decay: AdamW weight decay
+        batch_size: Mini-batch size
+        class_weights: Optional loss weights per class
+        seed: Seed for the mini-batch order
+
+    Returns:
+        Dictionary with best_val_accuracy, best_epoch and per-epoch history
+    """
+    n_train = len(train_rows)
+    x_train = torch.from_numpy(np.asarray(features[train_rows], dtype=np.float32))
+    x_val = torch.from_numpy(np.asarray(features[val_rows], dtype=np.float32))
+    y_train = torch.as_tensor(np.asarray(train_labels), dtype=torch.long)
+    y_val = torch.as_tensor(np.asarray(val_labels), dtype=torch.long)
+
+    device = head.weight.device
+    x_train, y_train, x_val, y_val = x_train.to(device), y_train.to(device), x_val.to(device), y_val.to(device)
+
+    criterion = nn.CrossEntropyLoss(weight=class_weights.to(device) if class_weights is not None else None)
+    optimizer = torch.optim.AdamW(head.parameters(), lr=lr, weight_decay=weight_decay)
+    generator = torch.Generator().manual_seed(seed)
+
+    best = {"best_val_accuracy": -1.0, "best_epoch": 0, "history": []}
+    best_state = None
+    for epoch in range(1, epochs + 1):
+        head.train()
+        order = torch.randperm(n_train, generator=generator)
+        epoch_loss = 0.0
+        for start in range(0, n_train, batch_size):
+            idx = order[start:start + batch_size]
+            optimizer.zero_grad()
+            loss = criterion(head(x_train[idx]), y_train[idx])
+            loss.backward()
+            optimizer.step()
+            epoch_loss += loss.item() * len(idx)
+
+        head.eval()
+        with torch.no_grad():
+            val_acc = (head(x_val).argmax(dim=1) == y_val).float().mean().item() if len(y_val) else 0.0
+        best["history"].append({"epoch": epoch, "train_loss": epoch_loss / max(n_train, 1), "val_accuracy": val_acc})
+
+        if val_acc > best["best_val_accuracy"]:
+            best.update(best_val_accuracy=val_acc, best_epoch=epoch)
+            best_state = {k: v.detach().clone() for k, v in head.state_dict().items()}
+
+    if best_state is not None:
+        head.load_state_dict(best_state)
+    return best
@@ -0,0 +1,243 @@
+import io
+import os
+import json
+import glob
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import cv2
+from PIL import Image
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+CHECK_COLUMNS = [
+    "row", "image_path", "label", "status", "reason",
+    "width", "height", "channels", "format", "size_bytes", "sha256", "dhash"
+]
+PROGRESS_FILE = "progress.json"
+MIN_IMAGE_SIDE = 10
+
+
+def _image_format(data: bytes) -> str:
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    return "other"
+
+
+def difference_hash(img: np.ndarray) -> int:
+    """64-bit perceptual difference hash (dHash) of a decoded image
+
+    Each bit says whether a pixel of the grayscale thumbnail is brighter than
+    its right neighbour, so re-encoding, resizing and mild colour shifts
+    change few bits.
+    """
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY if img.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+    thumb = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (thumb[:, 1:] > thumb[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def _fully_decodes(data: bytes) -> bool:
+    """Whether Pillow can decode the whole image
+
+    Unlike OpenCV, which pads truncated image data with gray, Pillow fails
+    when the compressed data ends early.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+        return True
+    except Exception:
+        return False
+
+
+def check_image(path: str, min_side: int = MIN_IMAGE_SIDE) -> Dict[str, Any]:
+    """Read, hash and decode one image file
+
+    The file is read once; the same bytes are hashed and decoded with
+    ``cv2.imdecode``. OpenCV fills truncated JPEGs with gray instead of
+    failing, so files whose end marker (JPEG EOI, PNG IEND) is not near the
+    end get a full Pillow decode; camera and editing tools may append data
+    after the marker.
+    """
+    result = {
+        "status": "valid", "reason": "", "width": 0, "height": 0, "channels": 0,
+        "format": "", "size_bytes": 0, "sha256": "", "dhash": ""
+    }
+
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return {**result, "status": "missing", "reason": "missing"}
+    except OSError as e:
+        return {**result, "status": "corrupt", "reason": f"unreadable: {e.strerror}"}
+
+    result["size_bytes"] = len(data)
+    result["sha256"] = hashlib.sha256(data).hexdigest()
+    result["format"] = _image_format(data)
+
+    if result["format"] == "jpeg" and b"\xff\xd9" not in data[-1024:] and not _fully_decodes(data):
+        return {**result, "status": "corrupt", "reason": "truncated jpeg (no end-of-image marker)"}
+    if result["format"] == "png" and b"IEND" not in data[-16:] and not _fully_decodes(data):
+        return {**result, "status": "corrupt", "reason": "truncated png (no IEND chunk)"}
+
+    # Decoded the way the training dataset reads images (cv2.imread's 3-channel BGR)
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return {**result, "status": "corrupt", "reason": "OpenCV could not decode image"}
+
+    h, w = img.shape[:2]
+    c = 1 if img.ndim == 2 else img.shape[2]
+    result.update(width=w, height=h, channels=c)
+
+    if h < min_side or w < min_side or c != 3:
+        return {**result, "status": "corrupt", "reason": f"invalid dimensions: {h}x{w}x{c}"}
+
+    result["dhash"] = f"{difference_hash(img):016x}"
+    return result
+
+
+def _check_batch(batch: List[Tuple[int, str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {"row": row, "image_path": path, "label": label, **check_image(path)}
+        for row, path, label in batch
+    ]
+
+
+class ImageCheckRun:
+    """Checks every image of a manifest on a process pool, resumably.
+
+    The manifest is streamed in chunks; each finished chunk is written to
+    ``part-<n>.csv`` under ``output_dir`` and recorded in ``progress.json``,
+    so an interrupted run resumes after the last completed chunk. Progress is
+    discarded when the manifest's mtime or size changes.
+    """
+
+    def __init__(
+        self,
+        manifest_path: str,
+        output_dir: str,
+        base_dir: Optional[str] = None,
+        chunk_size: int = 5000,
+        num_workers: Optional[int] = None,
+        batch_size: int = 64
+    ):
+        self.manifest_path = manifest_path
+        self.output_dir = output_dir
+        self.base_dir = base_dir or os.path.dirname(os.path.abspath(manifest_path))
+        self.chunk_size = chunk_size
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+
+    def _progress_key(self) -> Dict[str, Any]:
+        stat = os.stat(self.manifest_path)
+        return {
+            "manifest_path": os.path.abspath(self.manifest_path),
+            "manifest_mtime_ns": stat.st_mtime_ns,
+            "manifest_size": stat.st_size,
+            "chunk_size": self.chunk_size,
+            "columns": CHECK_COLUMNS
+        }
+
+    def _load_progress(self) -> List[int]:
+        path = os.path.join(self.output_dir, PROGRESS_FILE)
+        try:
+            with open(path, 'r') as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            progress = {}
+
+        if all(progress.get(key) == value for key, value in self._progress_key().items()):
+            return progress.get("completed_chunks", [])
+
+        for part in glob.glob(os.path.join(self.output_dir, "part-*.csv")):
+            os.remove(part)
+        return []
+
+    def _save_progress(self, completed: List[int]):
+        path = os.path.join(self.output_dir, PROGRESS_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({**self._progress_key(), "completed_chunks": completed}, f)
+        os.replace(tmp_path, path)
+
+    def _part_path(self, chunk_id: int) -> str:
+        return os.path.join(self.output_dir, f"part-{chunk_id:05d}.csv")
+
+    def run(self) -> pd.DataFrame:
+        os.makedirs(self.output_dir, exist_ok=True)
+        completed = self._load_progress()
+        if completed:
+            logger.info(f"Resuming image checks after {len(completed)} completed chunks")
+
+        reader = pd.read_csv(self.manifest_path, chunksize=self.chunk_size)
+        with ProcessPoolExecutor(max_workers=self.num_workers) as pool:
+            for chunk_id, chunk in enumerate(reader):
+                if chunk_id in completed:
+                    continue
+
+                paths = chunk['image_path'].astype(str)
+                is_absolute = paths.map(os.path.isabs)
+                paths = paths.where(is_absolute, self.base_dir + os.sep + paths)
+                # Sampled manifests carry the original row numbers in a row column
+                row_ids = chunk['row'] if 'row' in chunk.columns else chunk.index
+                rows = list(zip(row_ids.tolist(), paths.tolist(), chunk['label'].tolist()))
+                batches = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+
+                results = [result for batch in pool.map(_check_batch, batches) for result in batch]
+                pd.DataFrame(results, columns=CHECK_COLUMNS).to_csv(self._part_path(chunk_id), index=False)
+
+                completed.append(chunk_id)
+                self._save_progress(completed)
+                logger.info(f"Checked chunk {chunk_id} ({len(rows)} images)")
+
+        parts = [pd.read_csv(self._part_path(chunk_id), keep_default_na=False) for chunk_id in sorted(completed)]
+        if not parts:
+            return pd.DataFrame(columns=CHECK_COLUMNS)
+        return pd.concat(parts, ignore_index=True)
+
+    def write_report(self, checks: pd.DataFrame) -> str:
+        """Write per-file results as Parquet (CSV when pyarrow is unavailable)"""
+        if PARQUET_AVAILABLE:
+            path = os.path.join(self.output_dir, "image_checks.parquet")
+            checks.to_parquet(path, index=False)
+        else:
+            path = os.path.join(self.output_dir, "image_checks.csv")
+            checks.to_csv(path, index=False)
+        return path
+
+
+def summarize_checks(checks: pd.DataFrame, max_listed: int = 1000) -> Dict[str, Any]:
+    """Aggregate per-file results into the DataValidator ``image_files`` format"""
+    counts = checks['status'].value_counts()
+    invalid = checks[checks['status'] != "valid"]
+
+    results = {
+        'total': len(checks),
+        'valid': int(counts.get("valid", 0)),
+        'missing': int(counts.get("missing", 0)),
+        'corrupt': int(counts.get("corrupt", 0)),
+        'invalid_files': [
+            {'path': path, 'reason': reason}
+            for path, reason in zip(invalid['image_path'].head(max_listed), invalid['reason'].head(max_listed))
+        ],
+        'duplicate_files': int(checks.loc[checks['sha256'] != "", 'sha256'].duplicated().sum())
+    }
+    results['invalid'] = results['missing'] + results['corrupt']
+    results['success'] = results['invalid'] == 0
+    return results
@@ -1,22 +1,38 @@
 import os
 import io
+import hmac
 import json
 import logging
 import time
 import base64
+import asyncio
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
 import numpy as np
 import cv2
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Form, Header, Depends, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 
 from model_manager import ModelManager, get_model_manager
+from worker_pool import InferenceWorkerPool, INFERENCE_WORKERS
+from crop_router import AUTO_CROP, CROP_TYPE_REQUIRED
 from preprocessing import validate_image_bytes, get_image_info
+from tracing import (
+    SUPPORTED_EXPORTERS,
+    DEFAULT_TRACE_FILE,
+    span,
+    configure_tracing,
+    trace_file_path,
+    get_collector,
+    get_tracing_status,
+    is_tracing_enabled,
+    run_sampling_profiler,
+    format_collapsed_stacks
+)
 from disease_database import (
     CROP_DISEASES,
     SUPPORTED_CROPS,
@@ -55,6 +71,7 @@ prediction_logs: List[Dict[str, Any]] = []
 MAX_LOG_SIZE = 1000
 
 model_manager: Optional[ModelManager] = None
+worker_pool: Optional[InferenceWorkerPool] = None
 
 
 class PredictionResponse(BaseModel):
@@ -72,6 +89,11 @@ class PredictionResponse(BaseModel):
     treatments: List[Dict[str, Any]] = []
     prevention: List[str] = []
     top_predictions: List[Dict[str, Any]] = []
+    all_predictions: Optional[Dict[str, float]] = None
+    cascade: Optional[Dict[str, Any]] = None
+    llava_diagnosis: Optional[Dict[str, Any]] = None
+    tta_augmentations_used: Optional[int] = None
+    crop_routing: Optional[Dict[str, Any]] = None
     similar_diseases: List[Dict[str, Any]] = []
     mock_prediction: bool = False
     inference_time_ms: float = 0.0
@@ -79,7 +101,7 @@ class PredictionResponse(BaseModel):
 
 
 class BatchPredictionItem(BaseModel):
-    crop_type: str
+    crop_type: str = AUTO_CROP
     image_base64: str
 
 
@@ -109,6 +131,8 @@ class HealthResponse(BaseModel):
     models_loaded: int
     mock_mode_count: int
     supported_crops: int
+    ready: bool = False
+    warmup_duration_ms: Optional[float] = None
     uptime_seconds: float
     version: str
 
@@ -116,6 +140,27 @@ class HealthResponse(BaseModel):
 START_TIME = time.time()
 
 
+def verify_admin_token(x_admin_token: Optional[str] = Header(default=None)):
+    # Fail closed: without a configured token the admin endpoints are off
+    expected = os.environ.get("ML_ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled; set ML_ADMIN_TOKEN to enable them")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def require_in_process_models():
+    # These endpoints act on the ModelManager serving predictions. With
+    # inference workers this process holds only metadata, so they would
+    # silently change nothing.
+    if worker_pool is not None:
+        raise HTTPException(
+            status_code=409,
+            detail="Not available with inference workers (ML_INFERENCE_WORKERS > 0); activate model versions "
+                   "in the registry and POST /admin/workers/restart"
+        )
+
+
 def log_prediction(
     crop_type: str,
     disease_id: str,
@@ -142,16 +187,73 @@ def log_prediction(
         prediction_logs = prediction_logs[-MAX_LOG_SIZE:]
 
 
+@app.middleware("http")
+async def tracing_middleware(request: Request, call_next):
+    if not is_tracing_enabled():
+        return await call_next(request)
+    
+    with span(f"{request.method} {request.url.path}", **{"http.method": request.method, "http.target": request.url.path}) as request_span:
+        response = await call_next(request)
+        request_span.set_attribute("http.status_code", response.status_code)
+        return response
+
+
 @app.on_event("startup")
 def startup_event():
-    global model_manager
+    global model_manager, worker_pool
     
     models_dir = os.environ.get("MODELS_DIR", "./models")
+    
+    # Workers start before this process reads any model, so the forkserver
+    # they come from never holds ONNX Runtime sessions or threads. The
+    # workers load and warm the models; this process keeps only the registry
+    # and labels for the metadata endpoints.
+    if INFERENCE_WORKERS > 0:
+        worker_pool = InferenceWorkerPool(models_dir, INFERENCE_WORKERS)
+        worker_pool.start()
+        model_manager = ModelManager(models_dir, load_sessions=False)
+        logger.info(f"ML Inference Service started with {INFERENCE_WORKERS} inference workers")
+        return
+    
     model_manager = get_model_manager(models_dir)
     
+    # Warm up in the background so /health answers immediately while /ready
+    # keeps the instance out of rotation until the first requests will be fast
+    if os.environ.get("ML_WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes"):
+        model_manager.start_warmup()
+    else:
+        model_manager.warmup_models(batch_sizes=(), crops=())
+    
     logger.info(f"ML Inference Service started with {len(model_manager.supported_crops)} supported crops")
 
 
+@app.on_event("shutdown")
+def shutdown_event():
+    if worker_pool is not None:
+        worker_pool.shutdown()
+    model_manager.shadow_runner.shutdown(wait=False)
+
+
+async def run_in_workers(method: str, include_all_predictions: bool, **kwargs) -> Any:
+    future = worker_pool.submit(method, include_all_predictions=include_all_predictions, **kwargs)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), worker_pool.request_timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Inference worker timed out")
+
+
+async def run_prediction(include_all_predictions: bool = False, **kwargs) -> Dict[str, Any]:
+    if worker_pool is not None:
+        return await run_in_workers("predict", include_all_predictions, **kwargs)
+    
+    # Inference and a cascade's LLaVA call block; a worker thread keeps the
+    # event loop serving other requests meanwhile
+    result = await asyncio.to_thread(model_manager.predict, **kwargs)
+    if not include_all_predictions:
+        result.pop("all_predictions", None)
+    return result
+
+
 @app.get("/", tags=["General"])
 def root():
     return {
@@ -166,6 +268,8 @@ def root():
 @app.get("/health", response_model=HealthResponse, tags=["General"])
 def health_check():
     health_status = model_manager.get_health_status() if model_manager else {}
+    if worker_pool is not None:
+        health_status["ready"] = worker_pool.is_ready
     
     return {
         "status": "healthy",
@@ -173,43 +277,68 @@ def health_check():
         "models_loaded": health_status.get("models_loaded", 0),
         "mock_mode_count": health_status.get("mock_mode_count", 0),
         "supported_crops": health_status.get("supported_crops", 0),
+        "ready": health_status.get("ready", False),
+        "warmup_duration_ms": health_status.get("warmup_duration_ms"),
         "uptime_seconds": round(time.time() - START_TIME, 2),
         "version": "2.0.0"
     }
 
 
+@app.get("/ready", tags=["General"])
+def readiness_check():
+    if worker_pool is not None:
+        # Workers report ready once their models are loaded and warmed up
+        workers = worker_pool.status()
+        readiness = {"ready": workers["ready"], "workers": workers}
+    else:
+        readiness = model_manager.get_readiness() if model_manager else {"ready": False}
+    
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content=readiness)
+    return readiness
+
+
 @app.post("/predict", response_model=PredictionResponse, tags=["Prediction"])
 async def predict(
     file: UploadFile = File(...),
-    crop_type: str = Form(default="rice"),
+    crop_type: str = Form(default=AUTO_CROP),
     use_tta: bool = Form(default=False),
-    calibrate: bool = Form(default=True)
+    calibrate: bool = Form(default=True),
+    include_all_predictions: bool = Form(default=False),
+    cascade: Optional[bool] = Form(default=None),
+    tta_early_exit: Optional[bool] = Form(default=None)
 ):
     start_time = time.time()
     
     try:
         contents = await file.read()
         
-        is_valid, validation_msg = validate_image_bytes(contents)
+        with span("inference_service.validate_image", size_bytes=len(contents)):
+            is_valid, validation_msg = validate_image_bytes(contents)
         if not is_valid:
             raise HTTPException(status_code=400, detail=validation_msg)
         
         crop_type = crop_type.lower()
-        if crop_type not in SUPPORTED_CROPS:
+        if crop_type != AUTO_CROP and crop_type not in SUPPORTED_CROPS:
             raise HTTPException(
                 status_code=400,
-                detail=f"Unsupported crop type: {crop_type}. Supported crops: {list(SUPPORTED_CROPS.keys())}"
+                detail=f"Unsupported crop type: {crop_type}. Supported crops: {list(SUPPORTED_CROPS.keys())} or {AUTO_CROP}"
             )
         
-        result = model_manager.predict(
+        result = await run_prediction(
+            include_all_predictions=include_all_predictions,
             crop_type=crop_type,
             image_bytes=contents,
             use_tta=use_tta,
-            calibrate=calibrate
+            calibrate=calibrate,
+            cascade=cascade,
+            tta_early_exit=tta_early_exit
         )
+        if result.get("error_code") == CROP_TYPE_REQUIRED:
+            raise HTTPException(status_code=400, detail=result["error"])
         
         log_prediction(
-            crop_type=crop_type,
+            crop_type=result.get("crop_type") or crop_type,
             disease_id=result.get("disease_id", "unknown"),
             confidence=result.get("confidence", 0.0),
             mock_mode=result.get("mock_prediction", False),
@@ -229,9 +358,12 @@ async def predict(
 @app.post("/predict/base64", response_model=PredictionResponse, tags=["Prediction"])
 async def predict_base64(
     image_base64: str = Form(...),
-    crop_type: str = Form(default="rice"),
+    crop_type: str = Form(default=AUTO_CROP),
     use_tta: bool = Form(default=False),
-    calibrate: bool = Form(default=True)
+    calibrate: bool = Form(default=True),
+    include_all_predictions: bool = Form(default=False),
+    cascade: Optional[bool] = Form(default=None),
+    tta_early_exit: Optional[bool] = Form(default=None)
 ):
     try:
         image_data = image_base64
@@ -239,30 +371,37 @@ async def predict_base64(
             image_data = image_base64.split(",")[1]
         
         try:
-            contents = base64.b64decode(image_data)
+            with span("inference_service.decode_base64"):
+                contents = base64.b64decode(image_data)
         except Exception:
             raise HTTPException(status_code=400, detail="Invalid base64 image data")
         
-        is_valid, validation_msg = validate_image_bytes(contents)
+        with span("inference_service.validate_image", size_bytes=len(contents)):
+            is_valid, validation_msg = validate_image_bytes(contents)
         if not is_valid:
             raise HTTPException(status_code=400, detail=validation_msg)
         
         crop_type = crop_type.lower()
-        if crop_type not in SUPPORTED_CROPS:
+        if crop_type != AUTO_CROP and crop_type not in SUPPORTED_CROPS:
             raise HTTPException(
                 status_code=400,
                 detail=f"Unsupported crop type: {crop_type}"
             )
         
-        result = model_manager.predict(
+        result = await run_prediction(
+            include_all_predictions=include_all_predictions,
             crop_type=crop_type,
             image_bytes=contents,
             use_tta=use_tta,
-            calibrate=calibrate
+            calibrate=calibrate,
+            cascade=cascade,
+            tta_early_exit=tta_early_exit
         )
+        if result.get("error_code") == CROP_TYPE_REQUIRED:
+            raise HTTPException(status_code=400, detail=result["error"])
         
         log_prediction(
-            crop_type=crop_type,
+            crop_type=result.get("crop_type") or crop_type,
             disease_id=result.get("disease_id", "unknown"),
             confidence=result.get("confidence", 0.0),
             mock_mode=result.get("mock_prediction", False),
@@ -280,31 +419,55 @@ async def predict_base64(
 
 
 @app.post("/batch-predict", tags=["Prediction"])
-async def batch_predict(request: BatchPredictionRequest):
-    results = []
+async def batch_predict(
+    request: BatchPredictionRequest,
+    include_all_predictions: bool = Query(default=False)
+):
+    results: List[Optional[Dict[str, Any]]] = [None] * len(request.predictions)
+    batch_request = []
+    batch_indices = []
     
-    for item in request.predictions:
+    for i, item in enumerate(request.predictions):
         try:
             image_data = item.image_base64
             if "," in image_data:
                 image_data = image_data.split(",")[1]
             
-            contents = base64.b64decode(image_data)
-            
-            result = model_manager.predict(
-                crop_type=item.crop_type.lower(),
-                image_bytes=contents,
-                use_tta=False,
-                calibrate=True
-            )
-            results.append(result)
+            batch_request.append((item.crop_type.lower(), base64.b64decode(image_data)))
+            batch_indices.append(i)
             
         except Exception as e:
-            results.append({
+            results[i] = {
                 "success": False,
                 "error": str(e),
                 "crop_type": item.crop_type
-            })
+            }
+    
+    try:
+        if worker_pool is not None:
+            batch_results = await run_in_workers(
+                "batch_predict",
+                include_all_predictions,
+                predictions_request=batch_request,
+                calibrate=True
+            )
+        else:
+            batch_results = await asyncio.to_thread(model_manager.batch_predict, batch_request, calibrate=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        batch_results = [
+            {"success": False, "error": str(e), "crop_type": crop_type}
+            for crop_type, _ in batch_request
+        ]
+    
+    for i, result in zip(batch_indices, batch_results):
+        if include_all_predictions and "all_predictions" in result:
+            result["all_predictions"] = dict(result["all_predictions"])
+        else:
+            result.pop("all_predictions", None)
+        results[i] = result
     
     return {
         "success": True,
@@ -481,6 +644,14 @@ def get_prediction_analytics(
     }
 
 
+@app.get("/analytics/cascade", tags=["Analytics"], dependencies=[Depends(require_in_process_models)])
+def get_cascade_analytics():
+    return {
+        "config": model_manager.cascade_config.to_dict(),
+        "metrics": model_manager.cascade_metrics.snapshot()
+    }
+
+
 @app.post("/image/validate", tags=["Utilities"])
 async def validate_image(file: UploadFile = File(...)):
     contents = await file.read()
@@ -538,6 +709,162 @@ def search_diseases(
     }
 
 
+@app.get("/admin/tracing", tags=["Admin"], dependencies=[Depends(verify_admin_token), Depends(require_in_process_models)])
+def get_tracing():
+    return get_tracing_status()
+
+
+@app.post("/admin/tracing", tags=["Admin"], dependencies=[Depends(verify_admin_token), Depends(require_in_process_models)])
+def update_tracing(
+    enabled: bool = Query(...),
+    exporter: str = Query(default="memory"),
+    file_name: Optional[str] = Query(None, description=f"Trace file inside ML_TRACE_DIR (default: {DEFAULT_TRACE_FILE})")
+):
+    if exporter not in SUPPORTED_EXPORTERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported exporter: {exporter}. Supported exporters: {list(SUPPORTED_EXPORTERS)}"
+        )
+    
+    try:
+        file_path = trace_file_path(file_name or DEFAULT_TRACE_FILE) if exporter == "file" else None
+        return configure_tracing(enabled, exporter=exporter, file_path=file_path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/admin/traces", tags=["Admin"], dependencies=[Depends(verify_admin_token)])
+def get_traces(
+    limit: int = Query(default=500, ge=1, le=10000),
+    trace_id: Optional[str] = Query(None)
+):
+    spans = get_collector().get_spans(limit=limit, trace_id=trace_id)
+    return {
+        "total_spans": len(spans),
+        "spans": spans
+    }
+
+
+@app.delete("/admin/traces", tags=["Admin"], dependencies=[Depends(verify_admin_token)])
+def clear_traces():
+    get_collector().clear()
+    return {"success": True}
+
+
+@app.post("/admin/profile", tags=["Admin"], dependencies=[Depends(verify_admin_token)])
+def profile(
+    duration_seconds: float = Query(default=5.0, gt=0, le=60),
+    interval_ms: float = Query(default=5.0, ge=1, le=1000),
+    output_format: str = Query(default="collapsed", pattern="^(collapsed|json)$")
+):
+    stacks = run_sampling_profiler(duration_seconds, interval=interval_ms / 1000)
+    if stacks is None:
+        raise HTTPException(status_code=409, detail="A profiling session is already running")
+    
+    if output_format == "json":
+        return {
+            "duration_seconds": duration_seconds,
+            "interval_ms": interval_ms,
+            "total_samples": sum(stacks.values()),
+            "stacks": stacks
+        }
+    
+    return PlainTextResponse(format_collapsed_stacks(stacks))
+
+
+@app.get("/admin/models/{crop_type}", tags=["Admin"], dependencies=[Depends(verify_admin_token)])
+def get_model_versions(crop_type: str):
+    if crop_type.lower() not in SUPPORTED_CROPS:
+        raise HTTPException(status_code=404, detail=f"Crop type not found: {crop_type}")
+    
+    return model_manager.get_deployment_status(crop_type)
+
+
+@app.post("/admin/models/{crop_type}/stage", tags=["Admin"], dependencies=[Depends(verify_admin_token), Depends(require_in_process_models)])
+def stage_model_version(
+    crop_type: str,
+    version: str = Query(...),
+    wait: bool = Query(default=False)
+):
+    try:
+        model_manager.stage_model_version(crop_type, version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if wait:
+        model_manager.wait_for_deployment(crop_type)
+    
+    return model_manager.get_deployment_status(crop_type)
+
+
+@app.post("/admin/models/{crop_type}/rollback", tags=["Admin"], dependencies=[Depends(verify_admin_token), Depends(require_in_process_models)])
+def rollback_model_version(crop_type: str, wait: bool = Query(default=False)):
+    try:
+        model_manager.rollback_model(crop_type)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if wait:
+        model_manager.wait_for_deployment(crop_type)
+    
+    return model_manager.get_deployment_status(crop_type)
+
+
+@app.post("/admin/models/{crop_type}/experiment", tags=["Admin"], dependencies=[Depends(verify_admin_token), Depends(require_in_process_models)])
+def start_model_experiment(
+    crop_type: str,
+    version: str = Query(...),
+    mode: str = Query(default="shadow", pattern="^(shadow|canary)$"),
+    percent: float = Query(default=10.0, gt=0, le=100)
+):
+    try:
+        return model_manager.start_experiment(crop_type, version, mode, percent)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/admin/models/{crop_type}/experiment", tags=["Admin"], dependencies=[Depends(verify_admin_token), Depends(require_in_process_models)])
+def get_model_experiment(crop_type: str):
+    report = model_manager.get_experiment_report(crop_type)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"No experiment running for {crop_type}")
+    return report
+
+
+@app.delete("/admin/models/{crop_type}/experiment", tags=["Admin"], dependencies=[Depends(verify_admin_token), Depends(require_in_process_models)])
+def stop_model_experiment(crop_type: str):
+    report = model_manager.stop_experiment(crop_type)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"No experiment running for {crop_type}")
+    return report
+
+
+@app.get("/admin/workers", tags=["Admin"], dependencies=[Depends(verify_admin_token)])
+def get_workers():
+    if worker_pool is None:
+        return {"num_workers": 0, "mode": "in-process"}
+    return worker_pool.status()
+
+
+@app.post("/admin/workers/restart", tags=["Admin"], dependencies=[Depends(verify_admin_token)])
+def restart_workers():
+    global model_manager
+    
+    if worker_pool is None:
+        raise HTTPException(status_code=400, detail="Inference workers are not enabled (ML_INFERENCE_WORKERS=0)")
+    
+    restarted = worker_pool.rolling_restart()
+    # Workers picked up the registry's active versions; refresh the metadata
+    model_manager = ModelManager(worker_pool.models_dir, load_sessions=False)
+    return {"restarted": restarted, **worker_pool.status()}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("inference_service:app", host="0.0.0.0", port=8000, reload=True)
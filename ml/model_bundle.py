@@ -0,0 +1,245 @@
+import os
+import json
+import mmap
+import time
+import struct
+import hashlib
+import logging
+from typing import Dict, Optional, Any
+
+try:
+    import onnx
+    from onnx import TensorProto, numpy_helper
+    ONNX_PROTO_AVAILABLE = True
+except ImportError:
+    ONNX_PROTO_AVAILABLE = False
+
+from onnx_weights import WEIGHT_ALIGNMENT, EXTERNAL_SIZE_THRESHOLD
+
+
+logger = logging.getLogger(__name__)
+
+
+# Layout of a .bundle file (all integers little-endian):
+#
+#   preamble   MAGIC (8) | FORMAT_VERSION u32 | reserved u32
+#   weights    ONNX initializers, each at a WEIGHT_ALIGNMENT-aligned offset
+#   graph      ONNX ModelProto whose large initializers are external data
+#              pointing back into this file
+#   header     JSON: metadata, class mapping, section offsets and sha256
+#   trailer    header offset u64 | header length u32 | MAGIC (8)
+#
+# The header sits at the end so weight offsets are known before the graph is
+# serialized; readers find it from the fixed-size trailer.
+MAGIC = b"KSBUNDLE"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<8sII")
+TRAILER = struct.Struct("<QI8s")
+
+BUNDLE_FILENAME = "model.bundle"
+VERIFY_MODES = ("none", "fast", "full")
+
+
+class BundleError(ValueError):
+    pass
+
+
+def _sha256(data) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_bundle(
+    bundle_path: str,
+    onnx_path: str,
+    metadata: Dict[str, Any],
+    class_mapping: Optional[Dict[str, str]] = None,
+    size_threshold: int = EXTERNAL_SIZE_THRESHOLD,
+    alignment: int = WEIGHT_ALIGNMENT
+) -> Dict[str, Any]:
+    if not ONNX_PROTO_AVAILABLE:
+        raise ImportError("onnx is required to write model bundles")
+
+    model = onnx.load(onnx_path, load_external_data=True)
+    location = os.path.basename(bundle_path)
+    tmp_path = f"{bundle_path}.tmp"
+
+    weights_hash = hashlib.sha256()
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0))
+        weights_start = PREAMBLE.size + (-PREAMBLE.size % alignment)
+        f.write(b"\0" * (weights_start - PREAMBLE.size))
+        offset = weights_start
+
+        for tensor in model.graph.initializer:
+            if not tensor.HasField("raw_data"):
+                tensor.CopyFrom(numpy_helper.from_array(numpy_helper.to_array(tensor), tensor.name))
+            raw = tensor.raw_data
+            if len(raw) < size_threshold:
+                continue
+
+            padding = -offset % alignment
+            f.write(b"\0" * padding)
+            weights_hash.update(b"\0" * padding)
+            offset += padding
+            f.write(raw)
+            weights_hash.update(raw)
+
+            tensor.ClearField("raw_data")
+            del tensor.external_data[:]
+            tensor.data_location = TensorProto.EXTERNAL
+            for key, value in (("location", location), ("offset", str(offset)), ("length", str(len(raw)))):
+                entry = tensor.external_data.add()
+                entry.key = key
+                entry.value = value
+            offset += len(raw)
+
+        weights_length = offset - weights_start
+        graph = model.SerializeToString()
+        f.write(graph)
+        graph_offset = offset
+        offset += len(graph)
+
+        header = {
+            "format_version": FORMAT_VERSION,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "metadata": metadata,
+            "class_mapping": class_mapping or {},
+            "alignment": alignment,
+            "sections": {
+                "weights": {"offset": weights_start, "length": weights_length, "sha256": weights_hash.hexdigest()},
+                "graph": {"offset": graph_offset, "length": len(graph), "sha256": _sha256(graph)}
+            }
+        }
+        header_bytes = json.dumps(header, sort_keys=True).encode("utf-8")
+        f.write(header_bytes)
+        f.write(TRAILER.pack(offset, len(header_bytes), MAGIC))
+        file_size = offset + len(header_bytes) + TRAILER.size
+
+    os.replace(tmp_path, bundle_path)
+    logger.info(f"Wrote model bundle {bundle_path} ({file_size / 1e6:.1f} MB, {weights_length / 1e6:.1f} MB weights)")
+    return {"bundle_path": bundle_path, "file_size": file_size, **header["sections"]}
+
+
+class ModelBundle:
+    def __init__(self, path: str, verify: str = "fast"):
+        if verify not in VERIFY_MODES:
+            raise ValueError(f"Unknown bundle verify mode: {verify}. Supported: {list(VERIFY_MODES)}")
+
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self.header = self._read_header()
+            if verify != "none":
+                self.verify(full=verify == "full")
+        except Exception:
+            self.close()
+            raise
+
+        self.metadata: Dict[str, Any] = self.header["metadata"]
+        self.class_mapping: Dict[str, str] = self.header["class_mapping"]
+
+    def _read_header(self) -> Dict[str, Any]:
+        size = len(self._mapped)
+        if size < PREAMBLE.size + TRAILER.size:
+            raise BundleError(f"{self.path} is too small to be a model bundle")
+
+        magic, version, _ = PREAMBLE.unpack_from(self._mapped, 0)
+        header_offset, header_length, trailer_magic = TRAILER.unpack_from(self._mapped, size - TRAILER.size)
+        if magic != MAGIC or trailer_magic != MAGIC:
+            raise BundleError(f"{self.path} is not a model bundle or is truncated")
+        if version > FORMAT_VERSION:
+            raise BundleError(f"{self.path} uses bundle format {version}; this service reads up to {FORMAT_VERSION}")
+        if header_offset + header_length + TRAILER.size != size:
+            raise BundleError(f"{self.path} has an inconsistent header offset")
+
+        return json.loads(bytes(self._mapped[header_offset:header_offset + header_length]))
+
+    def section(self, name: str) -> memoryview:
+        info = self.header["sections"][name]
+        return memoryview(self._mapped)[info["offset"]:info["offset"] + info["length"]]
+
+    def verify(self, full: bool = False):
+        # The graph section is small; hashing the weights faults in every page,
+        # so that only happens on request (e.g. when staging a new version).
+        for name in ("graph", "weights") if full else ("graph",):
+            info = self.header["sections"][name]
+            if info["offset"] + info["length"] > len(self._mapped):
+                raise BundleError(f"{self.path}: {name} section extends past end of file")
+            section = self.section(name)
+            try:
+                digest = _sha256(section)
+            finally:
+                section.release()
+            if digest != info["sha256"]:
+                raise BundleError(f"{self.path}: {name} section hash mismatch")
+
+    def graph_bytes(self) -> bytes:
+        graph = bytes(self.section("graph"))
+        location = os.path.basename(self.path)
+
+        # External data locations name the file the bundle was written as;
+        # point them at the current file name in case it was renamed.
+        if ONNX_PROTO_AVAILABLE:
+            model = onnx.load_model_from_string(graph)
+            renamed = False
+            for tensor in model.graph.initializer:
+                for entry in tensor.external_data:
+                    if entry.key == "location" and entry.value != location:
+                        entry.value = location
+                        renamed = True
+            if renamed:
+                graph = model.SerializeToString()
+
+        return graph
+
+    def inline_graph_bytes(self) -> bytes:
+        # Fallback for ONNX Runtime builds that cannot resolve external data
+        # for a model loaded from memory: copy the weights into the graph.
+        if not ONNX_PROTO_AVAILABLE:
+            raise ImportError("onnx is required to inline bundle weights")
+
+        model = onnx.load_model_from_string(bytes(self.section("graph")))
+        for tensor in model.graph.initializer:
+            if tensor.data_location != TensorProto.EXTERNAL:
+                continue
+            fields = {entry.key: entry.value for entry in tensor.external_data}
+            start = int(fields["offset"])
+            tensor.raw_data = bytes(self._mapped[start:start + int(fields["length"])])
+            del tensor.external_data[:]
+            tensor.data_location = TensorProto.DEFAULT
+        return model.SerializeToString()
+
+    def create_session(self, sess_options=None):
+        import onnxruntime as ort
+
+        sess_options = sess_options or ort.SessionOptions()
+        sess_options.add_session_config_entry(
+            "session.model_external_initializers_file_folder_path",
+            os.path.dirname(os.path.abspath(self.path))
+        )
+        try:
+            return ort.InferenceSession(self.graph_bytes(), sess_options=sess_options), True
+        except Exception as e:
+            logger.warning(f"Could not map weights from {self.path} ({str(e)}); loading them into memory")
+            return ort.InferenceSession(self.inline_graph_bytes(), sess_options=sess_options), False
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "format_version": self.header["format_version"],
+            "created_at": self.header.get("created_at"),
+            "file_size": len(self._mapped),
+            "sections": self.header["sections"]
+        }
+
+    def close(self):
+        if not self._mapped.closed:
+            self._mapped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
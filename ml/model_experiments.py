@@ -0,0 +1,191 @@
+import os
+import time
+import zlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Any
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+EXPERIMENT_MODES = ("shadow", "canary")
+
+# Shadow inference runs on a small private pool; requests that arrive while
+# SHADOW_MAX_PENDING comparisons are queued are skipped rather than queued,
+# so a slow candidate can never build a backlog behind live traffic.
+SHADOW_WORKERS = int(os.environ.get("ML_SHADOW_WORKERS", 2))
+SHADOW_MAX_PENDING = int(os.environ.get("ML_SHADOW_MAX_PENDING", 8))
+
+LATENCY_WINDOW = 2000
+
+
+def latency_summary(samples) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+
+    values = np.fromiter(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 2),
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2)
+    }
+
+
+class ExperimentMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compared = 0
+        self.agreed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.confidence_shift_sum = 0.0
+        self.latency_delta_sum = 0.0
+        self.arm_requests: Dict[str, int] = {"primary": 0, "candidate": 0}
+        self.arm_confidence_sum: Dict[str, float] = {"primary": 0.0, "candidate": 0.0}
+        self.latencies: Dict[str, deque] = {
+            "primary": deque(maxlen=LATENCY_WINDOW),
+            "candidate": deque(maxlen=LATENCY_WINDOW)
+        }
+
+    def record_arm(self, arm: str, confidence: float, latency_ms: float):
+        with self._lock:
+            self.arm_requests[arm] += 1
+            self.arm_confidence_sum[arm] += confidence
+            self.latencies[arm].append(latency_ms)
+
+    def record_comparison(self, primary: Dict[str, Any], candidate: Dict[str, Any]):
+        if not candidate.get("success", False):
+            with self._lock:
+                self.failed += 1
+            return
+
+        self.record_arm("primary", primary["confidence"], primary["inference_time_ms"])
+        self.record_arm("candidate", candidate["confidence"], candidate["inference_time_ms"])
+
+        with self._lock:
+            self.compared += 1
+            self.agreed += int(primary["disease_id"] == candidate["disease_id"])
+            self.confidence_shift_sum += candidate["confidence"] - primary["confidence"]
+            self.latency_delta_sum += candidate["inference_time_ms"] - primary["inference_time_ms"]
+
+    def record_dropped(self):
+        with self._lock:
+            self.dropped += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            arms = {
+                arm: {
+                    "requests": count,
+                    "mean_confidence": round(self.arm_confidence_sum[arm] / count, 4) if count else None,
+                    "latency_ms": latency_summary(self.latencies[arm])
+                }
+                for arm, count in self.arm_requests.items()
+            }
+            return {
+                "compared": self.compared,
+                "agreement_rate": round(self.agreed / self.compared, 4) if self.compared else None,
+                "mean_confidence_shift": round(self.confidence_shift_sum / self.compared, 4) if self.compared else None,
+                "mean_latency_delta_ms": round(self.latency_delta_sum / self.compared, 2) if self.compared else None,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "arms": arms
+            }
+
+
+class ModelExperiment:
+    def __init__(self, crop_type: str, version: str, mode: str, percent: float, model: Any):
+        if mode not in EXPERIMENT_MODES:
+            raise ValueError(f"Unknown experiment mode: {mode}. Supported: {list(EXPERIMENT_MODES)}")
+        if not 0 < percent <= 100:
+            raise ValueError(f"Experiment percent must be in (0, 100], got {percent}")
+
+        self.crop_type = crop_type
+        self.version = version
+        self.mode = mode
+        self.percent = percent
+        self.model = model
+        self.started_at = time.time()
+        self.metrics = ExperimentMetrics()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    def selects(self, image_bytes: bytes) -> bool:
+        # Hash-based so the same image always lands in the same arm
+        return zlib.crc32(image_bytes) % 10000 < self.percent * 100
+
+    def try_reserve(self) -> bool:
+        with self._pending_lock:
+            if self._pending >= SHADOW_MAX_PENDING:
+                return False
+            self._pending += 1
+            return True
+
+    def release(self):
+        with self._pending_lock:
+            self._pending -= 1
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "crop_type": self.crop_type,
+            "version": self.version,
+            "mode": self.mode,
+            "percent": self.percent,
+            "started_at": self.started_at,
+            "running_seconds": round(time.time() - self.started_at, 1),
+            "metrics": self.metrics.snapshot()
+        }
+
+
+class ShadowRunner:
+    def __init__(self, max_workers: int = SHADOW_WORKERS):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, experiment: ModelExperiment, image_bytes: bytes, primary: Dict[str, Any], **predict_kwargs) -> bool:
+        # The caller has already called experiment.model.begin_request(); the
+        # matching end_request runs once the shadow prediction finishes.
+        if not experiment.try_reserve():
+            experiment.model.end_request()
+            experiment.metrics.record_dropped()
+            return False
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="shadow")
+
+        # Only the fields the comparison needs; the response dict is mutated
+        # by the caller after this returns.
+        summary = {
+            "disease_id": primary.get("disease_id"),
+            "confidence": primary.get("confidence", 0.0),
+            "inference_time_ms": primary.get("inference_time_ms", 0.0)
+        }
+        self._executor.submit(self._run, experiment, image_bytes, summary, predict_kwargs)
+        return True
+
+    def _run(self, experiment: ModelExperiment, image_bytes: bytes, primary: Dict[str, Any], predict_kwargs: Dict[str, Any]):
+        try:
+            candidate = experiment.model.predict(image_bytes, **predict_kwargs)
+            experiment.metrics.record_comparison(primary, candidate)
+        except Exception as e:
+            logger.warning(f"Shadow inference failed for {experiment.crop_type} {experiment.version}: {str(e)}")
+            experiment.metrics.record_comparison(primary, {"success": False})
+        finally:
+            experiment.model.end_request()
+            experiment.release()
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
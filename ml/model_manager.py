@@ -2,9 +2,11 @@ import os
 import json
 import logging
 import time
-from typing import Dict, List, Optional, Any, Tuple
+import zlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Tuple, Union
 from pathlib import Path
-import random
 
 import numpy as np
 
@@ -20,7 +22,21 @@ try:
 except ImportError:
     TORCH_AVAILABLE = False
 
-from preprocessing import preprocess_image, preprocess_batch_for_tta
+from preprocessing import preprocess_image, preprocess_batch_for_tta, decode_for_tta, tta_chunks
+from postprocessing import (
+    temperature_softmax,
+    top_k,
+    postprocess_batch,
+    postprocess_probabilities,
+    LazyClassProbabilities
+)
+from tracing import span, traced
+from cascade import CascadeConfig, CascadeMetrics, is_uncertain, query_llava
+from model_registry import ModelRegistry
+from model_experiments import ModelExperiment, ShadowRunner
+from onnx_weights import uses_external_data
+from model_bundle import ModelBundle, BundleError, BUNDLE_FILENAME
+from crop_router import CropRouter, AUTO_CROP, CROP_TYPE_REQUIRED, ROUTER_DIR, default_router_labels
 from disease_database import (
     CROP_DISEASES,
     SUPPORTED_CROPS,
@@ -37,16 +53,81 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def softmax(x: np.ndarray) -> np.ndarray:
-    e_x = np.exp(x - np.max(x, axis=-1, keepdims=True))
-    return e_x / e_x.sum(axis=-1, keepdims=True)
+def image_seed(image_bytes: bytes) -> int:
+    return zlib.crc32(image_bytes)
+
+
+class MockLatencyModel:
+    def __init__(self, base_ms: float = 0.0, per_item_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.base_ms = base_ms
+        self.per_item_ms = per_item_ms
+        self.jitter_ms = jitter_ms
+    
+    @classmethod
+    def from_spec(cls, spec: str) -> "MockLatencyModel":
+        # Format: "base=8,per_item=12,jitter=2" (milliseconds)
+        values = {}
+        for part in spec.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            key, _, value = part.partition("=")
+            if key.strip() not in ("base", "per_item", "jitter"):
+                raise ValueError(f"Unknown mock latency parameter: {key}")
+            values[f"{key.strip()}_ms"] = float(value)
+        return cls(**values)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.base_ms > 0 or self.per_item_ms > 0
+    
+    def delay_seconds(self, batch_size: int, rng: np.random.Generator) -> float:
+        delay_ms = self.base_ms + self.per_item_ms * batch_size
+        if self.jitter_ms > 0:
+            delay_ms += abs(rng.normal(0, self.jitter_ms))
+        return delay_ms / 1000
+
+
+# Used when a model's metadata has no fitted temperature
+DEFAULT_TEMPERATURE = 1.5
 
+DEFAULT_MOCK_LATENCY = MockLatencyModel.from_spec(os.environ.get("ML_MOCK_LATENCY_MS", ""))
 
-def calibrate_confidence(raw_confidence: float, temperature: float = 1.5) -> float:
-    logit = np.log(raw_confidence / (1 - raw_confidence + 1e-10))
-    calibrated_logit = logit / temperature
-    calibrated_prob = 1 / (1 + np.exp(-calibrated_logit))
-    return float(np.clip(calibrated_prob, 0.0, 0.99))
+# Progressive TTA: augmentations run TTA_CHUNK_SIZE at a time and stop once the
+# averaged top class is unchanged by a chunk and leads by TTA_STABILITY_MARGIN.
+TTA_EARLY_EXIT = os.environ.get("ML_TTA_EARLY_EXIT", "false").lower() in ("1", "true", "yes")
+TTA_CHUNK_SIZE = int(os.environ.get("ML_TTA_CHUNK_SIZE", 1))
+TTA_STABILITY_MARGIN = float(os.environ.get("ML_TTA_STABILITY_MARGIN", 0.2))
+
+# How long a hot swap waits for in-flight requests on the old model before
+# releasing its session
+SWAP_DRAIN_TIMEOUT = float(os.environ.get("ML_SWAP_DRAIN_TIMEOUT", 30.0))
+
+# Keep ONNX initializers stored as external data on their memory-mapped file
+# pages (shared by every process that loads the model) instead of letting
+# prepacking and layout optimizations copy them onto the heap. It costs
+# per-request latency, since the NCHWc conv layout transforms of
+# ORT_ENABLE_ALL are the main CPU speedup for EfficientNet. "auto" maps the
+# weights in inference worker processes, where each worker would otherwise
+# hold a private copy of every model, and keeps full optimization when a
+# single serving process holds the only copy; "true" / "false" force it.
+_ONNX_MMAP_SETTING = os.environ.get("ML_ONNX_MMAP_WEIGHTS", "auto").lower()
+ONNX_MMAP_WEIGHTS = None if _ONNX_MMAP_SETTING == "auto" else _ONNX_MMAP_SETTING in ("1", "true", "yes")
+
+# Integrity check when opening a model bundle: "fast" hashes the graph
+# section only, "full" also hashes the weights (always used when staging)
+BUNDLE_VERIFY = os.environ.get("ML_BUNDLE_VERIFY", "fast").lower()
+
+# Startup warmup: dummy batches of each size run through every loaded model
+# (plus any crops listed in ML_WARMUP_CROPS, e.g. mock models) before /ready
+# reports the instance as routable.
+WARMUP_BATCH_SIZES = tuple(
+    int(size) for size in os.environ.get("ML_WARMUP_BATCH_SIZES", "1").split(",") if size.strip()
+)
+WARMUP_ITERATIONS = int(os.environ.get("ML_WARMUP_ITERATIONS", 2))
+WARMUP_CROPS = tuple(
+    crop.strip().lower() for crop in os.environ.get("ML_WARMUP_CROPS", "").split(",") if crop.strip()
+)
 
 
 class CropModel:
@@ -56,7 +137,13 @@ class CropModel:
         model_path: Optional[str] = None,
         class_labels: Optional[Dict[str, str]] = None,
         model_type: str = "onnx",
-        img_size: int = 224
+        img_size: int = 224,
+        mock_latency: Optional[MockLatencyModel] = None,
+        temperature: Optional[float] = None,
+        version: Optional[str] = None,
+        bundle_verify: Optional[str] = None,
+        load_session: bool = True,
+        mmap_weights: bool = False
     ):
         self.crop_type = crop_type.lower()
         self.model_path = model_path
@@ -66,6 +153,17 @@ class CropModel:
         self.onnx_session = None
         self.is_loaded = False
         self.mock_mode = True
+        self.mock_latency = mock_latency or DEFAULT_MOCK_LATENCY
+        self.temperature = temperature or DEFAULT_TEMPERATURE
+        self._mock_seed = zlib.crc32(self.crop_type.encode("utf-8"))
+        self.version = version
+        self.weights_mmapped = False
+        # mmap_weights is the caller's default for ML_ONNX_MMAP_WEIGHTS=auto
+        self.mmap_weights = mmap_weights if ONNX_MMAP_WEIGHTS is None else ONNX_MMAP_WEIGHTS
+        self.bundle_verify = bundle_verify or BUNDLE_VERIFY
+        self.bundle_info: Optional[Dict[str, Any]] = None
+        self._in_flight = 0
+        self._idle = threading.Condition()
         
         if class_labels:
             self.class_labels = class_labels
@@ -73,17 +171,47 @@ class CropModel:
             self.class_labels = get_disease_class_labels(self.crop_type)
         
         self.num_classes = len(self.class_labels)
+        self.label_list = [self.class_labels.get(str(i), f"class_{i}") for i in range(self.num_classes)]
         
         if model_path and os.path.exists(model_path):
-            self._load_model()
+            if load_session:
+                self._load_model()
+            else:
+                # Metadata only: inference workers load and serve this file
+                self.mock_mode = False
+    
+    @property
+    def has_model(self) -> bool:
+        # A trained model backs this crop, loaded here or (metadata-only
+        # managers) deployed for the inference workers
+        return not self.mock_mode
     
     def _load_model(self) -> bool:
         try:
             if self.model_type == "onnx" and ONNX_AVAILABLE:
-                self.onnx_session = ort.InferenceSession(self.model_path)
+                load_start = time.time()
+                self.onnx_session = ort.InferenceSession(self.model_path, sess_options=self._onnx_session_options())
+                self.is_loaded = True
+                self.mock_mode = False
+                logger.info(
+                    f"Loaded ONNX model for {self.crop_type} from {self.model_path} in "
+                    f"{(time.time() - load_start) * 1000:.0f} ms (weights mmapped: {self.weights_mmapped})"
+                )
+                return True
+            
+            elif self.model_type == "bundle" and ONNX_AVAILABLE:
+                load_start = time.time()
+                with ModelBundle(self.model_path, verify=self.bundle_verify) as bundle:
+                    self.onnx_session, external_weights = bundle.create_session(self._bundle_session_options())
+                    self.weights_mmapped = external_weights and self.mmap_weights
+                    self.bundle_info = bundle.info()
                 self.is_loaded = True
                 self.mock_mode = False
-                logger.info(f"Loaded ONNX model for {self.crop_type} from {self.model_path}")
+                logger.info(
+                    f"Loaded model bundle for {self.crop_type} from {self.model_path} in "
+                    f"{(time.time() - load_start) * 1000:.0f} ms (verify: {self.bundle_verify}, "
+                    f"weights mmapped: {self.weights_mmapped})"
+                )
                 return True
             
             elif self.model_type == "torchscript" and TORCH_AVAILABLE:
@@ -102,7 +230,66 @@ class CropModel:
             logger.error(f"Failed to load model for {self.crop_type}: {str(e)}")
             return False
     
-    def _run_inference(self, preprocessed_image: np.ndarray) -> np.ndarray:
+    def _onnx_session_options(self) -> "ort.SessionOptions":
+        options = ort.SessionOptions()
+        
+        if self.mmap_weights and uses_external_data(self.model_path):
+            # ONNX Runtime maps page-aligned external data instead of reading
+            # it; prepacked GEMM/conv weights and NCHWc-reordered copies would
+            # be private heap allocations, so both are turned off.
+            options.add_session_config_entry("session.disable_prepacking", "1")
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+            self.weights_mmapped = True
+        
+        return options
+    
+    def _bundle_session_options(self) -> "ort.SessionOptions":
+        options = ort.SessionOptions()
+        
+        # Bundle weights are always external data inside the bundle file
+        if self.mmap_weights:
+            options.add_session_config_entry("session.disable_prepacking", "1")
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+        
+        return options
+    
+    def begin_request(self):
+        with self._idle:
+            self._in_flight += 1
+    
+    def end_request(self):
+        with self._idle:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.notify_all()
+    
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        with self._idle:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout)
+    
+    def unload(self):
+        self.onnx_session = None
+        self.model = None
+        self.is_loaded = False
+        logger.info(f"Released model for {self.crop_type} (version {self.version})")
+    
+    def warmup(self, batch_sizes: Tuple[int, ...] = (1,), iterations: int = 1) -> float:
+        start_time = time.time()
+        rng = np.random.default_rng(0)
+        
+        for batch_size in batch_sizes:
+            dummy = rng.standard_normal((batch_size, 3, self.img_size, self.img_size)).astype(np.float32)
+            for _ in range(iterations):
+                self._run_inference(dummy, seed=0)
+        
+        return (time.time() - start_time) * 1000
+    
+    def _run_inference(
+        self,
+        preprocessed_image: np.ndarray,
+        seed: Optional[Union[int, List[int]]] = None,
+        row_offset: int = 0
+    ) -> np.ndarray:
         if self.onnx_session is not None:
             input_name = self.onnx_session.get_inputs()[0].name
             outputs = self.onnx_session.run(None, {input_name: preprocessed_image})
@@ -114,52 +301,84 @@ class CropModel:
                 outputs = self.model(input_tensor)
                 return outputs.cpu().numpy()
         
-        return self._mock_inference(preprocessed_image)
+        return self._mock_inference(preprocessed_image, seed, row_offset)
     
-    def _mock_inference(self, preprocessed_image: np.ndarray) -> np.ndarray:
+    def _mock_logits(self, batch_size: int, rng: np.random.Generator) -> np.ndarray:
+        rows = np.arange(batch_size)
+        
+        # All rows generated together come from the same image (single or TTA
+        # batch), so they share a primary class and differ only by noise.
+        primary_class = int(rng.integers(0, self.num_classes))
+        logits = rng.normal(0, 0.5, size=(batch_size, self.num_classes))
+        logits[:, primary_class] += rng.uniform(1.5, 3.0, size=batch_size)
+        
+        secondary_class = rng.integers(0, self.num_classes, size=batch_size)
+        secondary_boost = rng.uniform(0.5, 1.0, size=batch_size)
+        secondary_boost[(rng.random(batch_size) >= 0.3) | (secondary_class == primary_class)] = 0.0
+        logits[rows, secondary_class] += secondary_boost
+        
+        return logits
+    
+    def _mock_inference(
+        self,
+        preprocessed_image: np.ndarray,
+        seed: Optional[Union[int, List[int]]] = None,
+        row_offset: int = 0
+    ) -> np.ndarray:
         batch_size = preprocessed_image.shape[0]
         
-        random.seed(int(time.time() * 1000) % 2**32)
+        if seed is None:
+            seed = image_seed(preprocessed_image.tobytes())
         
-        logits = np.zeros((batch_size, self.num_classes))
+        if isinstance(seed, (list, tuple)):
+            # One seed per image: each image gets its own stream so results do
+            # not depend on which batch the image arrived in.
+            rows_per_image = batch_size // len(seed)
+            logits = np.concatenate([
+                self._mock_logits(rows_per_image, np.random.default_rng([self._mock_seed, s]))
+                for s in seed
+            ])
+            rng = np.random.default_rng([self._mock_seed, *seed])
+        else:
+            # row_offset lets progressive TTA request rows [offset, offset + batch)
+            # of the same stream a full TTA batch would draw.
+            rng = np.random.default_rng([self._mock_seed, seed])
+            logits = self._mock_logits(row_offset + batch_size, rng)[row_offset:]
         
-        for i in range(batch_size):
-            primary_class = random.randint(0, self.num_classes - 1)
-            
-            base_logits = np.random.normal(0, 0.5, self.num_classes)
-            
-            base_logits[primary_class] += random.uniform(1.5, 3.0)
-            
-            if random.random() < 0.3:
-                secondary_class = random.randint(0, self.num_classes - 1)
-                if secondary_class != primary_class:
-                    base_logits[secondary_class] += random.uniform(0.5, 1.0)
-            
-            logits[i] = base_logits
+        if self.mock_latency.enabled:
+            time.sleep(self.mock_latency.delay_seconds(batch_size, rng))
         
         return logits
     
+    def _preprocess(self, image_bytes: bytes, use_tta: bool, num_tta: int) -> Optional[np.ndarray]:
+        if use_tta:
+            return preprocess_batch_for_tta(
+                image_bytes,
+                target_size=(self.img_size, self.img_size),
+                num_augmentations=num_tta
+            )
+        return preprocess_image(
+            image_bytes,
+            target_size=(self.img_size, self.img_size)
+        )
+    
     def predict(
         self,
         image_bytes: bytes,
         use_tta: bool = False,
         num_tta: int = 5,
         calibrate: bool = True,
-        temperature: float = 1.5
+        temperature: Optional[float] = None,
+        early_exit: bool = False
     ) -> Dict[str, Any]:
         start_time = time.time()
+        temperature = (temperature or self.temperature) if calibrate else 1.0
         
-        if use_tta:
-            preprocessed = preprocess_batch_for_tta(
-                image_bytes,
-                target_size=(self.img_size, self.img_size),
-                num_augmentations=num_tta
-            )
-        else:
-            preprocessed = preprocess_image(
-                image_bytes,
-                target_size=(self.img_size, self.img_size)
-            )
+        if use_tta and early_exit:
+            return self._predict_progressive_tta(image_bytes, num_tta, temperature, start_time)
+        
+        with span("crop_model.preprocess", crop_type=self.crop_type, use_tta=use_tta):
+            preprocessed = self._preprocess(image_bytes, use_tta, num_tta)
         
         if preprocessed is None:
             return {
@@ -167,36 +386,126 @@ class CropModel:
                 "error": "Failed to preprocess image"
             }
         
-        logits = self._run_inference(preprocessed)
+        seed = image_seed(image_bytes) if self.mock_mode else None
+        
+        with span("crop_model.inference", crop_type=self.crop_type, batch_size=int(preprocessed.shape[0])):
+            logits = self._run_inference(preprocessed, seed)
+        
+        with span("crop_model.postprocess", crop_type=self.crop_type):
+            batch = postprocess_batch(
+                logits,
+                temperature=temperature,
+                group_size=preprocessed.shape[0] if use_tta else 1
+            )
+            result = self._build_result(batch, 0, start_time)
         
         if use_tta:
-            probabilities = softmax(logits)
-            probabilities = np.mean(probabilities, axis=0)
-        else:
-            probabilities = softmax(logits[0])
+            result["tta_augmentations_used"] = int(preprocessed.shape[0])
+        return result
+    
+    def _predict_progressive_tta(
+        self,
+        image_bytes: bytes,
+        num_tta: int,
+        temperature: float,
+        start_time: float,
+        chunk_size: int = TTA_CHUNK_SIZE,
+        stability_margin: float = TTA_STABILITY_MARGIN
+    ) -> Dict[str, Any]:
+        with span("crop_model.preprocess", crop_type=self.crop_type, use_tta=True):
+            image = decode_for_tta(image_bytes, target_size=(self.img_size, self.img_size))
+        
+        if image is None:
+            return {
+                "success": False,
+                "error": "Failed to preprocess image"
+            }
+        
+        seed = image_seed(image_bytes) if self.mock_mode else None
+        probability_sum = np.zeros(self.num_classes, dtype=np.float64)
+        previous_class = None
+        used = 0
+        
+        # Augmentations are produced lazily, so an early exit also skips the
+        # normalization of the chunks that never run.
+        for chunk in tta_chunks(image, num_tta, chunk_size=max(chunk_size, 1)):
+            with span("crop_model.inference", crop_type=self.crop_type, batch_size=int(chunk.shape[0])):
+                logits = self._run_inference(chunk, seed, row_offset=used)
+            
+            probability_sum += temperature_softmax(np.asarray(logits, dtype=np.float32), temperature).sum(axis=0)
+            used += chunk.shape[0]
+            
+            top_indices, top_values = top_k(probability_sum / used, 2)
+            top_class = int(top_indices[0, 0])
+            margin = float(top_values[0, 0] - top_values[0, 1]) if top_values.shape[1] > 1 else 1.0
+            
+            if top_class == previous_class and margin >= stability_margin:
+                break
+            previous_class = top_class
+        
+        with span("crop_model.postprocess", crop_type=self.crop_type):
+            batch = postprocess_probabilities((probability_sum / used).astype(np.float32))
+            result = self._build_result(batch, 0, start_time)
+        
+        result["tta_augmentations_used"] = used
+        return result
+    
+    def predict_batch(
+        self,
+        images: List[bytes],
+        calibrate: bool = True,
+        temperature: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        start_time = time.time()
+        results: List[Dict[str, Any]] = [
+            {"success": False, "error": "Failed to preprocess image"}
+            for _ in images
+        ]
+        
+        batch, valid = self.classify_batch(images, (temperature or self.temperature) if calibrate else 1.0)
         
-        class_id = int(np.argmax(probabilities))
-        confidence = float(probabilities[class_id])
+        for row, i in enumerate(valid):
+            results[i] = self._build_result(batch, row, start_time)
         
-        if calibrate:
-            confidence = calibrate_confidence(confidence, temperature)
+        return results
+    
+    def classify_batch(
+        self,
+        images: List[bytes],
+        temperature: float = 1.0,
+        k: int = 3
+    ) -> Tuple[Optional[Dict[str, np.ndarray]], List[int]]:
+        with span("crop_model.preprocess", crop_type=self.crop_type, batch_size=len(images)):
+            preprocessed = [self._preprocess(image_bytes, False, 0) for image_bytes in images]
+        
+        valid = [i for i, p in enumerate(preprocessed) if p is not None]
+        if not valid:
+            return None, valid
+        
+        batch_input = np.concatenate([preprocessed[i] for i in valid], axis=0)
+        seeds = [image_seed(images[i]) for i in valid] if self.mock_mode else None
+        
+        with span("crop_model.inference", crop_type=self.crop_type, batch_size=len(valid)):
+            logits = self._run_inference(batch_input, seeds)
+        
+        with span("crop_model.postprocess", crop_type=self.crop_type, batch_size=len(valid)):
+            batch = postprocess_batch(logits, k=k, temperature=temperature)
+        
+        return batch, valid
+    
+    def _build_result(self, batch: Dict[str, np.ndarray], row: int, start_time: float) -> Dict[str, Any]:
+        class_id = int(batch["class_ids"][row])
+        confidence = float(batch["confidences"][row])
         
         disease_id = self.class_labels.get(str(class_id), f"unknown_{class_id}")
         disease_info = get_disease_info(self.crop_type, disease_id)
         
-        all_predictions = {
-            self.class_labels.get(str(i), f"class_{i}"): float(prob)
-            for i, prob in enumerate(probabilities)
-        }
-        
-        top_k = min(3, len(probabilities))
-        top_indices = np.argsort(probabilities)[-top_k:][::-1]
         top_predictions = [
             {
-                "disease_id": self.class_labels.get(str(idx), f"class_{idx}"),
-                "confidence": float(probabilities[idx])
+                "disease_id": self.label_list[idx],
+                "confidence": prob
             }
-            for idx in top_indices
+            for idx, prob in zip(batch["top_indices"][row].tolist(), batch["top_probabilities"][row].tolist())
         ]
         
         inference_time = (time.time() - start_time) * 1000
@@ -216,7 +525,7 @@ class CropModel:
             "treatments": disease_info.get("treatments", []),
             "prevention": disease_info.get("prevention", []),
             "top_predictions": top_predictions,
-            "all_predictions": all_predictions,
+            "all_predictions": LazyClassProbabilities(batch["probabilities"][row], self.label_list),
             "similar_diseases": get_similar_diseases(self.crop_type, disease_id, limit=3),
             "mock_prediction": self.mock_mode,
             "inference_time_ms": round(inference_time, 2),
@@ -224,17 +533,36 @@ class CropModel:
                 "crop_type": self.crop_type,
                 "model_loaded": self.is_loaded,
                 "model_type": self.model_type,
+                "model_version": self.version,
                 "num_classes": self.num_classes
             }
         }
 
 
 class ModelManager:
-    def __init__(self, models_dir: str = "./models"):
+    # With load_sessions=False the manager only reads the registry, metadata
+    # and class mappings; the serving process uses this when inference
+    # workers hold the models. Inference workers pass mmap_weights=True so
+    # they share external-data weights (see ONNX_MMAP_WEIGHTS).
+    def __init__(self, models_dir: str = "./models", load_sessions: bool = True, mmap_weights: bool = False):
         self.models_dir = Path(models_dir)
+        self.load_sessions = load_sessions
+        self.mmap_weights = mmap_weights
         self.models: Dict[str, CropModel] = {}
+        self.large_models: Dict[str, CropModel] = {}
         self.default_model: Optional[CropModel] = None
+        self.crop_router: Optional[CropRouter] = None
         self.supported_crops = list(SUPPORTED_CROPS.keys())
+        self.cascade_config = CascadeConfig.from_env()
+        self.cascade_metrics = CascadeMetrics()
+        self.registry = ModelRegistry(models_dir)
+        self.deployments: Dict[str, Dict[str, Any]] = {}
+        self._deploy_threads: Dict[str, threading.Thread] = {}
+        self._swap_lock = threading.Lock()
+        self.experiments: Dict[str, ModelExperiment] = {}
+        self.shadow_runner = ShadowRunner()
+        self.warmup_status: Dict[str, Any] = {"state": "pending", "models": {}}
+        self._ready = threading.Event()
         
         self._initialize_models()
     
@@ -244,7 +572,18 @@ class ModelManager:
         if self.models_dir.exists():
             for crop_dir in self.models_dir.iterdir():
                 if crop_dir.is_dir() and crop_dir.name in self.supported_crops:
-                    self._load_crop_model(crop_dir.name, crop_dir)
+                    version = self.registry.active_version(crop_dir.name)
+                    if version and self.registry.has_version(crop_dir.name, version):
+                        self._load_crop_model(crop_dir.name, crop_dir / version, version)
+                    else:
+                        self._load_crop_model(crop_dir.name, crop_dir)
+                    
+                    large_dir = crop_dir / "large"
+                    if large_dir.is_dir():
+                        self.large_models[crop_dir.name] = self._build_crop_model(crop_dir.name, large_dir)
+                        logger.info(f"Loaded large cascade model for {crop_dir.name}")
+        
+        self._load_crop_router()
         
         for crop_type in self.supported_crops:
             if crop_type not in self.models:
@@ -258,7 +597,75 @@ class ModelManager:
         
         logger.info(f"ModelManager initialized with {len(self.models)} crop models")
     
-    def _load_crop_model(self, crop_type: str, model_dir: Path):
+    def _load_crop_model(self, crop_type: str, model_dir: Path, version: Optional[str] = None):
+        self.models[crop_type] = self._build_crop_model(crop_type, model_dir, version)
+        
+        if self.models[crop_type].model_path:
+            logger.info(f"Loaded model for {crop_type} from {self.models[crop_type].model_path}")
+        else:
+            logger.info(f"Using mock model for {crop_type} (no model file found)")
+    
+    def _load_crop_router(self):
+        router_dir = self.models_dir / ROUTER_DIR
+        version = self.registry.active_version(ROUTER_DIR)
+        if version and self.registry.has_version(ROUTER_DIR, version):
+            router_dir = router_dir / version
+        
+        # Without a trained router the mock model still gives deterministic
+        # per-image routing over the supported crops
+        model = self._build_crop_model(ROUTER_DIR, router_dir, version, default_labels=default_router_labels())
+        self.crop_router = CropRouter(model)
+        logger.info(f"Initialized crop router ({'loaded' if model.is_loaded else 'mock'}, {model.num_classes} crops)")
+    
+    @property
+    def auto_routing_available(self) -> bool:
+        # The mock router sends each image to a pseudo-random crop, which is
+        # only acceptable while every disease model is a mock as well
+        if self.crop_router is None:
+            return False
+        return self.crop_router.is_loaded or not any(model.is_loaded for model in self.models.values())
+    
+    def _crop_type_required(self) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": "crop_type is required: no crop identification model is deployed",
+            "error_code": CROP_TYPE_REQUIRED
+        }
+    
+    def _build_crop_model(
+        self,
+        crop_type: str,
+        model_dir: Path,
+        version: Optional[str] = None,
+        bundle_verify: Optional[str] = None,
+        default_labels: Optional[Dict[str, str]] = None
+    ) -> CropModel:
+        bundle_path = model_dir / BUNDLE_FILENAME
+        bundle_header = None
+        if bundle_path.exists():
+            # The bundle header carries metadata and class mapping; reading it
+            # touches only the trailer and header pages
+            try:
+                with ModelBundle(str(bundle_path), verify="none") as bundle:
+                    bundle_header = (bundle.metadata, bundle.class_mapping)
+            except (BundleError, OSError) as e:
+                logger.error(f"Ignoring unreadable model bundle {bundle_path}: {str(e)}")
+        
+        if bundle_header is not None:
+            metadata, class_mapping = bundle_header
+            return CropModel(
+                crop_type=crop_type,
+                model_path=str(bundle_path),
+                class_labels=class_mapping or default_labels,
+                model_type="bundle",
+                img_size=metadata.get("img_size", 224),
+                temperature=metadata.get("temperature"),
+                version=version,
+                bundle_verify=bundle_verify,
+                load_session=self.load_sessions,
+                mmap_weights=self.mmap_weights
+            )
+        
         metadata_path = model_dir / "model_metadata.json"
         class_mapping_path = model_dir / "class_mapping.json"
         
@@ -267,13 +674,14 @@ class ModelManager:
             with open(metadata_path, 'r') as f:
                 model_config = json.load(f)
         
-        class_labels = None
+        class_labels = default_labels
         if class_mapping_path.exists():
             with open(class_mapping_path, 'r') as f:
                 class_labels = json.load(f)
         
         model_type = model_config.get("framework", "onnx")
         img_size = model_config.get("img_size", 224)
+        temperature = model_config.get("temperature")
         
         model_file = None
         if model_type == "onnx":
@@ -283,18 +691,17 @@ class ModelManager:
         
         model_path = str(model_file) if model_file and model_file.exists() else None
         
-        self.models[crop_type] = CropModel(
+        return CropModel(
             crop_type=crop_type,
             model_path=model_path,
             class_labels=class_labels,
             model_type=model_type,
-            img_size=img_size
+            img_size=img_size,
+            temperature=temperature,
+            version=version,
+            load_session=self.load_sessions,
+            mmap_weights=self.mmap_weights
         )
-        
-        if model_path:
-            logger.info(f"Loaded model for {crop_type} from {model_path}")
-        else:
-            logger.info(f"Using mock model for {crop_type} (no model file found)")
     
     def load_model(self, crop_type: str, model_path: str, model_type: str = "onnx") -> bool:
         crop_type = crop_type.lower()
@@ -307,43 +714,468 @@ class ModelManager:
             logger.error(f"Model file not found: {model_path}")
             return False
         
-        self.models[crop_type] = CropModel(
+        model = CropModel(
             crop_type=crop_type,
             model_path=model_path,
-            model_type=model_type
+            model_type=model_type,
+            mmap_weights=self.mmap_weights
         )
         
-        return self.models[crop_type].is_loaded
+        if model.is_loaded:
+            self._swap_model(crop_type, model)
+        
+        return model.is_loaded
+    
+    def _swap_model(self, crop_type: str, model: CropModel) -> Optional[CropModel]:
+        with self._swap_lock:
+            old_model = self.models.get(crop_type)
+            self.models[crop_type] = model
+            if self.default_model is old_model:
+                self.default_model = model
+        return old_model
+    
+    def _drain_model(self, model: CropModel, timeout: float = SWAP_DRAIN_TIMEOUT) -> bool:
+        if not model.wait_idle(timeout):
+            logger.warning(f"Timed out draining {model.crop_type} version {model.version}; leaving it to GC")
+            return False
+        model.unload()
+        return True
+    
+    def stage_model_version(self, crop_type: str, version: str, rollback: bool = False) -> Dict[str, Any]:
+        crop_type = crop_type.lower()
+        
+        if crop_type not in self.supported_crops:
+            raise ValueError(f"Unsupported crop type: {crop_type}")
+        
+        if not self.registry.has_version(crop_type, version):
+            raise ValueError(f"Model version {version} not found for {crop_type}")
+        
+        with self._swap_lock:
+            thread = self._deploy_threads.get(crop_type)
+            if thread is not None and thread.is_alive():
+                raise RuntimeError(f"A deployment is already in progress for {crop_type}")
+            
+            self.deployments[crop_type] = {
+                "crop_type": crop_type,
+                "version": version,
+                "previous_version": self.models[crop_type].version if crop_type in self.models else None,
+                "rollback": rollback,
+                "status": "loading",
+                "started_at": time.time()
+            }
+            thread = threading.Thread(
+                target=self._deploy_version,
+                args=(crop_type, version, rollback),
+                name=f"deploy-{crop_type}-{version}",
+                daemon=True
+            )
+            self._deploy_threads[crop_type] = thread
+        
+        thread.start()
+        return dict(self.deployments[crop_type])
+    
+    def rollback_model(self, crop_type: str) -> Dict[str, Any]:
+        crop_type = crop_type.lower()
+        previous = self.registry.previous_version(crop_type)
+        
+        if previous is None:
+            raise ValueError(f"No previous model version recorded for {crop_type}")
+        
+        return self.stage_model_version(crop_type, previous, rollback=True)
+    
+    def _deploy_version(self, crop_type: str, version: str, rollback: bool):
+        deployment = self.deployments[crop_type]
+        
+        try:
+            model = self._build_crop_model(
+                crop_type, self.registry.version_dir(crop_type, version), version, bundle_verify="full"
+            )
+            if not model.is_loaded:
+                raise RuntimeError(f"Model files for {crop_type} version {version} could not be loaded")
+            
+            deployment["status"] = "warming"
+            deployment["warmup_ms"] = round(model.warmup(WARMUP_BATCH_SIZES, WARMUP_ITERATIONS), 2)
+            
+            old_model = self._swap_model(crop_type, model)
+            self.registry.activate(crop_type, version, rollback=rollback)
+            deployment["status"] = "draining"
+            deployment["swapped_at"] = time.time()
+            logger.info(f"Activated {crop_type} model version {version}")
+            
+            if old_model is not None and old_model is not model:
+                deployment["drained"] = self._drain_model(old_model)
+            
+            deployment["status"] = "active"
+        
+        except Exception as e:
+            logger.error(f"Deployment of {crop_type} version {version} failed: {str(e)}")
+            deployment["status"] = "failed"
+            deployment["error"] = str(e)
+        
+        finally:
+            deployment["finished_at"] = time.time()
+    
+    def wait_for_deployment(self, crop_type: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        crop_type = crop_type.lower()
+        thread = self._deploy_threads.get(crop_type)
+        if thread is not None:
+            thread.join(timeout)
+        return self.get_deployment_status(crop_type).get("deployment")
+    
+    def get_deployment_status(self, crop_type: str) -> Dict[str, Any]:
+        crop_type = crop_type.lower()
+        state = self.registry.get_state(crop_type)
+        model = self.models.get(crop_type)
+        
+        return {
+            "crop_type": crop_type,
+            "serving_version": model.version if model else None,
+            "active_version": state["active"],
+            "history": state["history"],
+            "available_versions": self.registry.list_versions(crop_type),
+            "deployment": dict(self.deployments[crop_type]) if crop_type in self.deployments else None
+        }
+    
+    def start_experiment(self, crop_type: str, version: str, mode: str, percent: float) -> Dict[str, Any]:
+        crop_type = crop_type.lower()
+        
+        if crop_type not in self.supported_crops:
+            raise ValueError(f"Unsupported crop type: {crop_type}")
+        
+        if not self.registry.has_version(crop_type, version):
+            raise ValueError(f"Model version {version} not found for {crop_type}")
+        
+        if crop_type in self.experiments:
+            raise RuntimeError(f"An experiment is already running for {crop_type}")
+        
+        model = self._build_crop_model(crop_type, self.registry.version_dir(crop_type, version), version)
+        if not model.is_loaded:
+            raise ValueError(f"Model files for {crop_type} version {version} could not be loaded")
+        model.warmup(WARMUP_BATCH_SIZES, WARMUP_ITERATIONS)
+        
+        experiment = ModelExperiment(crop_type, version, mode, percent, model)
+        with self._swap_lock:
+            if crop_type in self.experiments:
+                raise RuntimeError(f"An experiment is already running for {crop_type}")
+            self.experiments[crop_type] = experiment
+        
+        logger.info(f"Started {mode} experiment for {crop_type} version {version} at {percent}%")
+        return self.get_experiment_report(crop_type)
+    
+    def stop_experiment(self, crop_type: str) -> Optional[Dict[str, Any]]:
+        crop_type = crop_type.lower()
+        
+        with self._swap_lock:
+            experiment = self.experiments.pop(crop_type, None)
+        
+        if experiment is None:
+            return None
+        
+        report = self._experiment_report(experiment)
+        self._drain_model(experiment.model)
+        logger.info(f"Stopped {experiment.mode} experiment for {crop_type} version {experiment.version}")
+        return report
+    
+    def get_experiment_report(self, crop_type: str) -> Optional[Dict[str, Any]]:
+        experiment = self.experiments.get(crop_type.lower())
+        return self._experiment_report(experiment) if experiment else None
+    
+    def _experiment_report(self, experiment: ModelExperiment) -> Dict[str, Any]:
+        report = experiment.report()
+        primary = self.models.get(experiment.crop_type)
+        report["primary_version"] = primary.version if primary else None
+        return report
+    
+    @traced("model_manager.warmup")
+    def warmup_models(
+        self,
+        batch_sizes: Tuple[int, ...] = WARMUP_BATCH_SIZES,
+        iterations: int = WARMUP_ITERATIONS,
+        crops: Tuple[str, ...] = WARMUP_CROPS
+    ) -> Dict[str, Any]:
+        start_time = time.time()
+        self.warmup_status = {
+            "state": "running",
+            "batch_sizes": list(batch_sizes),
+            "iterations": iterations,
+            "started_at": start_time,
+            "models": {}
+        }
+        
+        targets = [
+            crop_type for crop_type, model in self.models.items()
+            if model.is_loaded or crop_type in crops
+        ]
+        for model in self.large_models.values():
+            if model.is_loaded:
+                targets.append(f"{model.crop_type}/large")
+        if self.crop_router is not None and self.crop_router.is_loaded:
+            targets.append(ROUTER_DIR)
+        
+        for target in targets:
+            crop_type, _, variant = target.partition("/")
+            if target == ROUTER_DIR:
+                model = self.crop_router.model
+            else:
+                model = self.large_models[crop_type] if variant else self.models[crop_type]
+            
+            timings = {}
+            errors = {}
+            for batch_size in batch_sizes:
+                try:
+                    timings[str(batch_size)] = round(model.warmup((batch_size,), iterations), 2)
+                except Exception as e:
+                    # Models exported with a fixed batch dimension reject other sizes
+                    logger.warning(f"Warmup of {target} at batch size {batch_size} failed: {str(e)}")
+                    errors[str(batch_size)] = str(e)
+            
+            self.warmup_status["models"][target] = {
+                "duration_ms": round(sum(timings.values()), 2),
+                "batch_ms": timings,
+                **({"errors": errors} if errors else {})
+            }
+        
+        self.warmup_status["state"] = "complete"
+        self.warmup_status["duration_ms"] = round((time.time() - start_time) * 1000, 2)
+        self._ready.set()
+        
+        logger.info(f"Warmed up {len(targets)} models in {self.warmup_status['duration_ms']:.0f} ms")
+        return self.warmup_status
+    
+    def start_warmup(self) -> threading.Thread:
+        thread = threading.Thread(target=self.warmup_models, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+    
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+    
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+    
+    def get_readiness(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready,
+            "warmup": self.warmup_status,
+            "models_loaded": sum(1 for m in self.models.values() if m.is_loaded)
+        }
     
     def get_model(self, crop_type: str) -> Optional[CropModel]:
+        # No fallback to default_model: an unknown crop must not be diagnosed
+        # by another crop's classifier
         crop_type = crop_type.lower()
-        return self.models.get(crop_type, self.default_model)
+        return self.models.get(crop_type)
+    
+    @traced("model_manager.route_crops")
+    def route_crops(self, images: List[bytes]) -> List[Dict[str, Any]]:
+        return self.crop_router.route(images)
+    
+    @contextmanager
+    def _serving_model(self, crop_type: str):
+        # Taken under the swap lock so a concurrent swap cannot drain the model
+        # between lookup and the in-flight count going up.
+        with self._swap_lock:
+            model = self.get_model(crop_type)
+            if model is not None:
+                model.begin_request()
+        try:
+            yield model
+        finally:
+            if model is not None:
+                model.end_request()
     
+    @traced("model_manager.predict")
     def predict(
         self,
         crop_type: str,
         image_bytes: bytes,
         use_tta: bool = False,
-        calibrate: bool = True
+        calibrate: bool = True,
+        cascade: Optional[bool] = None,
+        tta_early_exit: Optional[bool] = None
     ) -> Dict[str, Any]:
-        model = self.get_model(crop_type)
+        if cascade is None:
+            cascade = self.cascade_config.enabled
         
-        if model is None:
-            return {
-                "success": False,
-                "error": f"No model available for crop type: {crop_type}"
-            }
+        if tta_early_exit is None:
+            tta_early_exit = TTA_EARLY_EXIT
+        
+        if not crop_type or crop_type.lower() == AUTO_CROP:
+            if not self.auto_routing_available:
+                return self._crop_type_required()
+            
+            routing = self.route_crops([image_bytes])[0]
+            if not routing["success"]:
+                return {"success": False, "error": routing["error"], "crop_routing": routing}
+            
+            result = self.predict(routing["crop_type"], image_bytes, use_tta, calibrate, cascade, tta_early_exit)
+            result["crop_routing"] = routing
+            return result
         
-        return model.predict(image_bytes, use_tta=use_tta, calibrate=calibrate)
+        with self._serving_model(crop_type) as model:
+            if model is None:
+                return {
+                    "success": False,
+                    "error": f"No model available for crop type: {crop_type}"
+                }
+            
+            experiment = self.experiments.get(model.crop_type)
+            predict_kwargs = {"use_tta": use_tta, "calibrate": calibrate, "early_exit": tta_early_exit}
+            
+            if (
+                experiment is not None
+                and experiment.mode == "canary"
+                and experiment.selects(image_bytes)
+                and self._begin_experiment_request(experiment)
+            ):
+                return self._predict_canary(experiment, image_bytes, predict_kwargs)
+            
+            if cascade and not use_tta:
+                result = self._predict_cascade(model, image_bytes, calibrate, tta_early_exit)
+            else:
+                result = model.predict(image_bytes, **predict_kwargs)
+            
+            if experiment is not None and result.get("success", False):
+                if experiment.mode == "canary":
+                    experiment.metrics.record_arm("primary", result["confidence"], result["inference_time_ms"])
+                elif experiment.selects(image_bytes) and self._begin_experiment_request(experiment):
+                    self.shadow_runner.submit(experiment, image_bytes, result, **predict_kwargs)
+            
+            return result
+    
+    def _begin_experiment_request(self, experiment: ModelExperiment) -> bool:
+        # Same contract as _serving_model: once stop_experiment has removed the
+        # experiment, no new request may start on its model.
+        with self._swap_lock:
+            if self.experiments.get(experiment.crop_type) is not experiment:
+                return False
+            experiment.model.begin_request()
+            return True
+    
+    def _predict_canary(
+        self,
+        experiment: ModelExperiment,
+        image_bytes: bytes,
+        predict_kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        try:
+            result = experiment.model.predict(image_bytes, **predict_kwargs)
+        finally:
+            experiment.model.end_request()
+        
+        if result.get("success", False):
+            experiment.metrics.record_arm("candidate", result["confidence"], result["inference_time_ms"])
+        return result
+    
+    def _predict_cascade(
+        self,
+        model: CropModel,
+        image_bytes: bytes,
+        calibrate: bool,
+        tta_early_exit: bool = False
+    ) -> Dict[str, Any]:
+        config = self.cascade_config
+        start_time = time.time()
+        
+        result = model.predict(image_bytes, calibrate=calibrate)
+        stages = [("base", result.get("inference_time_ms", 0.0))]
+        resolved_by = "base"
+        
+        for stage in config.stages:
+            if not result.get("success", False) or not is_uncertain(result, config):
+                break
+            
+            stage_start = time.time()
+            with span("model_manager.cascade_stage", stage=stage, crop_type=model.crop_type):
+                if stage == "tta":
+                    candidate = model.predict(
+                        image_bytes, use_tta=True, calibrate=calibrate, early_exit=tta_early_exit
+                    )
+                elif stage == "large":
+                    large_model = self.large_models.get(model.crop_type)
+                    if large_model is None:
+                        continue
+                    candidate = large_model.predict(image_bytes, calibrate=calibrate)
+                else:
+                    if not config.llava_url:
+                        continue
+                    llava_result = query_llava(config.llava_url, image_bytes, config.llava_timeout)
+                    result["llava_diagnosis"] = llava_result
+                    candidate = result if llava_result.get("success", False) else llava_result
+            
+            stages.append((stage, (time.time() - stage_start) * 1000))
+            if candidate.get("success", False):
+                result = candidate
+                resolved_by = stage
+        
+        self.cascade_metrics.record(stages, resolved_by)
+        
+        result["cascade"] = {
+            "stages": [stage for stage, _ in stages],
+            "escalated": len(stages) > 1,
+            "resolved_by": resolved_by,
+            "uncertain": is_uncertain(result, config)
+        }
+        result["inference_time_ms"] = round((time.time() - start_time) * 1000, 2)
+        return result
     
+    @traced("model_manager.batch_predict")
     def batch_predict(
         self,
-        predictions_request: List[Tuple[str, bytes]]
+        predictions_request: List[Tuple[str, bytes]],
+        calibrate: bool = True
     ) -> List[Dict[str, Any]]:
-        results = []
-        for crop_type, image_bytes in predictions_request:
-            result = self.predict(crop_type, image_bytes)
-            results.append(result)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(predictions_request)
+        crop_types = [crop_type for crop_type, _ in predictions_request]
+        
+        # Auto items are identified in one router batch, then join the
+        # per-crop groups below with the explicitly labelled items
+        auto_indices = [i for i, crop_type in enumerate(crop_types) if not crop_type or crop_type.lower() == AUTO_CROP]
+        routings: Dict[int, Dict[str, Any]] = {}
+        if auto_indices and not self.auto_routing_available:
+            for i in auto_indices:
+                results[i] = self._crop_type_required()
+        elif auto_indices:
+            for i, routing in zip(auto_indices, self.route_crops([predictions_request[i][1] for i in auto_indices])):
+                routings[i] = routing
+                if routing["success"]:
+                    crop_types[i] = routing["crop_type"]
+                else:
+                    results[i] = {"success": False, "error": routing["error"], "crop_routing": routing}
+        
+        # Group by resolved model so each crop runs a single batched inference
+        groups: Dict[int, Tuple[CropModel, List[int]]] = {}
+        with self._swap_lock:
+            for i, crop_type in enumerate(crop_types):
+                if results[i] is not None:
+                    continue
+                model = self.get_model(crop_type)
+                if model is None:
+                    results[i] = {
+                        "success": False,
+                        "error": f"No model available for crop type: {crop_type}"
+                    }
+                    continue
+                if id(model) not in groups:
+                    model.begin_request()
+                groups.setdefault(id(model), (model, []))[1].append(i)
+        
+        try:
+            for model, indices in groups.values():
+                batch_results = model.predict_batch(
+                    [predictions_request[i][1] for i in indices],
+                    calibrate=calibrate
+                )
+                for i, result in zip(indices, batch_results):
+                    results[i] = result
+        finally:
+            for model, _ in groups.values():
+                model.end_request()
+        
+        for i, routing in routings.items():
+            results[i].setdefault("crop_routing", routing)
+        
         return results
     
     def get_supported_crops(self) -> List[Dict[str, str]]:
@@ -352,7 +1184,7 @@ class ModelManager:
                 "crop_type": crop_type,
                 "name": info["name"],
                 "hindi_name": info["hindi_name"],
-                "model_loaded": self.models.get(crop_type, CropModel(crop_type)).is_loaded,
+                "model_loaded": self.models.get(crop_type, CropModel(crop_type)).has_model,
                 "num_diseases": len(CROP_DISEASES.get(crop_type, {}))
             }
             for crop_type, info in SUPPORTED_CROPS.items()
@@ -364,37 +1196,54 @@ class ModelManager:
             if model:
                 return {
                     "crop_type": model.crop_type,
-                    "model_loaded": model.is_loaded,
+                    "model_loaded": model.has_model,
                     "mock_mode": model.mock_mode,
                     "model_type": model.model_type,
                     "num_classes": model.num_classes,
                     "class_labels": model.class_labels,
-                    "img_size": model.img_size
+                    "img_size": model.img_size,
+                    "temperature": model.temperature,
+                    "version": model.version,
+                    "weights_mmapped": model.weights_mmapped,
+                    "bundle": model.bundle_info
                 }
             return {"error": f"Model not found for crop type: {crop_type}"}
         
         return {
             "total_models": len(self.models),
-            "loaded_models": sum(1 for m in self.models.values() if m.is_loaded),
+            "loaded_models": sum(1 for m in self.models.values() if m.has_model),
             "mock_models": sum(1 for m in self.models.values() if m.mock_mode),
             "supported_crops": self.supported_crops,
             "models": {
                 crop: {
-                    "loaded": model.is_loaded,
+                    "loaded": model.has_model,
                     "mock_mode": model.mock_mode,
-                    "num_classes": model.num_classes
+                    "num_classes": model.num_classes,
+                    "version": model.version
                 }
                 for crop, model in self.models.items()
-            }
+            },
+            "crop_router": {
+                "loaded": self.crop_router.model.has_model,
+                "mock_mode": self.crop_router.model.mock_mode,
+                "crops": self.crop_router.model.label_list,
+                "min_confidence": self.crop_router.min_confidence,
+                "version": self.crop_router.model.version,
+                "auto_routing_available": self.auto_routing_available
+            } if self.crop_router is not None else None
         }
     
     def get_health_status(self) -> Dict[str, Any]:
         return {
             "status": "healthy",
             "models_initialized": len(self.models),
-            "models_loaded": sum(1 for m in self.models.values() if m.is_loaded),
+            "models_loaded": sum(1 for m in self.models.values() if m.has_model),
             "mock_mode_count": sum(1 for m in self.models.values() if m.mock_mode),
             "supported_crops": len(self.supported_crops),
+            "large_models_loaded": len(self.large_models),
+            "cascade": self.cascade_config.to_dict(),
+            "ready": self.is_ready,
+            "warmup_duration_ms": self.warmup_status.get("duration_ms"),
             "onnx_available": ONNX_AVAILABLE,
             "torch_available": TORCH_AVAILABLE
         }
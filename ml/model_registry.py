@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+
+logger = logging.getLogger(__name__)
+
+
+REGISTRY_FILE = "registry.json"
+RESERVED_DIRS = ("large",)
+VERSION_MARKERS = ("model.bundle", "model_metadata.json", "model.onnx", "model.pt")
+MAX_HISTORY = 10
+
+
+class ModelRegistry:
+    # On-disk layout: <models_dir>/<crop>/<version>/{model.bundle, or model.onnx,
+    # model_metadata.json, class_mapping.json}, with <crop>/registry.json recording the active version
+    # and the versions it replaced (most recent last) for rollback.
+
+    def __init__(self, models_dir: str):
+        self.models_dir = Path(models_dir)
+        self._lock = threading.Lock()
+
+    def crop_dir(self, crop_type: str) -> Path:
+        return self.models_dir / crop_type.lower()
+
+    def version_dir(self, crop_type: str, version: str) -> Path:
+        if not version or version.startswith(".") or os.sep in version or "/" in version:
+            raise ValueError(f"Invalid model version: {version!r}")
+        if version in RESERVED_DIRS:
+            raise ValueError(f"Model version name is reserved: {version}")
+        return self.crop_dir(crop_type) / version
+
+    def list_versions(self, crop_type: str) -> List[str]:
+        crop_dir = self.crop_dir(crop_type)
+        if not crop_dir.is_dir():
+            return []
+
+        return sorted(
+            entry.name for entry in crop_dir.iterdir()
+            if entry.is_dir()
+            and entry.name not in RESERVED_DIRS
+            and not entry.name.startswith(".")
+            and any((entry / marker).exists() for marker in VERSION_MARKERS)
+        )
+
+    def has_version(self, crop_type: str, version: str) -> bool:
+        return version in self.list_versions(crop_type)
+
+    def _read_state(self, crop_type: str) -> Dict[str, Any]:
+        path = self.crop_dir(crop_type) / REGISTRY_FILE
+        if not path.exists():
+            return {"active": None, "history": []}
+
+        try:
+            with open(path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read model registry for {crop_type}: {str(e)}")
+            return {"active": None, "history": []}
+
+        state.setdefault("active", None)
+        state.setdefault("history", [])
+        return state
+
+    def _write_state(self, crop_type: str, state: Dict[str, Any]):
+        path = self.crop_dir(crop_type) / REGISTRY_FILE
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write-then-rename so a crash never leaves a half-written pointer
+        tmp_path = path.with_name(f".{REGISTRY_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def get_state(self, crop_type: str) -> Dict[str, Any]:
+        with self._lock:
+            return self._read_state(crop_type)
+
+    def active_version(self, crop_type: str) -> Optional[str]:
+        return self.get_state(crop_type)["active"]
+
+    def previous_version(self, crop_type: str) -> Optional[str]:
+        history = self.get_state(crop_type)["history"]
+        return history[-1] if history else None
+
+    def activate(self, crop_type: str, version: str, rollback: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            state = self._read_state(crop_type)
+
+            if rollback:
+                if state["history"] and state["history"][-1] == version:
+                    state["history"].pop()
+            elif state["active"] and state["active"] != version:
+                state["history"] = (state["history"] + [state["active"]])[-MAX_HISTORY:]
+
+            state["active"] = version
+            state["updated_at"] = time.time()
+            self._write_state(crop_type, state)
+            return state
@@ -0,0 +1,112 @@
+import os
+import mmap
+import logging
+from typing import Dict, Any
+
+try:
+    import onnx
+    from onnx import TensorProto, numpy_helper
+    ONNX_PROTO_AVAILABLE = True
+except ImportError:
+    ONNX_PROTO_AVAILABLE = False
+
+
+logger = logging.getLogger(__name__)
+
+
+# Offsets of external tensors are multiples of this so ONNX Runtime can map
+# each one straight from the file (Windows needs the 64 KiB granularity).
+WEIGHT_ALIGNMENT = max(mmap.ALLOCATIONGRANULARITY, mmap.PAGESIZE)
+
+# Smaller tensors (biases, BN scalars) stay inline in the graph
+EXTERNAL_SIZE_THRESHOLD = 1024
+
+
+def external_data_name(onnx_path: str) -> str:
+    return f"{os.path.basename(onnx_path)}.data"
+
+
+def _external_locations(model) -> set:
+    return {
+        entry.value
+        for tensor in model.graph.initializer
+        if tensor.data_location == TensorProto.EXTERNAL
+        for entry in tensor.external_data
+        if entry.key == "location"
+    }
+
+
+def save_with_external_data(
+    onnx_path: str,
+    size_threshold: int = EXTERNAL_SIZE_THRESHOLD,
+    alignment: int = WEIGHT_ALIGNMENT
+) -> Dict[str, Any]:
+    if not ONNX_PROTO_AVAILABLE:
+        raise ImportError("onnx is required to write external weight files")
+
+    base_dir = os.path.dirname(os.path.abspath(onnx_path))
+    model = onnx.load(onnx_path, load_external_data=False)
+    stale_locations = _external_locations(model)
+    onnx.load_external_data_for_model(model, base_dir)
+
+    data_name = external_data_name(onnx_path)
+    data_path = os.path.join(base_dir, data_name)
+    tmp_data_path = f"{data_path}.tmp"
+
+    num_external = 0
+    offset = 0
+    with open(tmp_data_path, 'wb') as f:
+        for tensor in model.graph.initializer:
+            if not tensor.HasField("raw_data"):
+                tensor.CopyFrom(numpy_helper.from_array(numpy_helper.to_array(tensor), tensor.name))
+
+            raw = tensor.raw_data
+            if len(raw) < size_threshold:
+                continue
+
+            padding = -offset % alignment
+            f.write(b"\0" * padding)
+            offset += padding
+            f.write(raw)
+
+            tensor.ClearField("raw_data")
+            del tensor.external_data[:]
+            tensor.data_location = TensorProto.EXTERNAL
+            for key, value in (("location", data_name), ("offset", str(offset)), ("length", str(len(raw)))):
+                entry = tensor.external_data.add()
+                entry.key = key
+                entry.value = value
+
+            offset += len(raw)
+            num_external += 1
+
+    tmp_onnx_path = f"{onnx_path}.tmp"
+    onnx.save(model, tmp_onnx_path)
+    os.replace(tmp_data_path, data_path)
+    os.replace(tmp_onnx_path, onnx_path)
+
+    for location in stale_locations - {data_name}:
+        stale_path = os.path.join(base_dir, location)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+
+    logger.info(f"Wrote {num_external} tensors ({offset / 1e6:.1f} MB) to {data_path} with {alignment}-byte alignment")
+    return {
+        "onnx_path": onnx_path,
+        "data_path": data_path,
+        "external_tensors": num_external,
+        "data_bytes": offset,
+        "alignment": alignment
+    }
+
+
+def uses_external_data(onnx_path: str) -> bool:
+    if ONNX_PROTO_AVAILABLE:
+        try:
+            return bool(_external_locations(onnx.load(onnx_path, load_external_data=False)))
+        except Exception as e:
+            logger.warning(f"Could not inspect {onnx_path} for external data: {str(e)}")
+            return False
+
+    # Without the onnx package fall back to the exporter's naming convention
+    return os.path.exists(os.path.join(os.path.dirname(onnx_path), external_data_name(onnx_path)))
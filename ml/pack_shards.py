@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+import cv2
+
+from dataset import SHARD_INDEX_FILE, SHARD_LABELS_FILE, SHARD_ROWS_FILE, resolve_manifest_paths
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def load_resized(path: str, image_size: int) -> Optional[np.ndarray]:
+    """Decode an image as RGB, resize its shorter side and center-crop to a square
+
+    Returns None when the file cannot be decoded.
+    """
+    img = cv2.imread(path)
+    if img is None:
+        return None
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+    h, w = img.shape[:2]
+    scale = image_size / min(h, w)
+    new_w, new_h = max(image_size, round(w * scale)), max(image_size, round(h * scale))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    img = cv2.resize(img, (new_w, new_h), interpolation=interpolation)
+
+    top, left = (new_h - image_size) // 2, (new_w - image_size) // 2
+    return img[top:top + image_size, left:left + image_size]
+
+
+def pack_manifest(
+    manifest_csv: str,
+    output_dir: str,
+    image_size: int = 256,
+    shard_size: int = 4096,
+    num_workers: int = 8
+) -> Dict[str, Any]:
+    """Decode and resize every manifest image into memory-mappable uint8 shards
+
+    Args:
+        manifest_csv: CSV with columns image_path,label (paths relative to the CSV)
+        output_dir: Directory for the shards, labels and index
+        image_size: Side length images are resized and center-cropped to;
+            keep it above the training crop size so random crops still vary
+        shard_size: Images per shard file
+        num_workers: Decode threads (OpenCV releases the GIL while decoding)
+
+    Returns:
+        The shard index, also written to ``index.json``
+    """
+    df = pd.read_csv(manifest_csv)
+    paths = list(resolve_manifest_paths(df['image_path'], os.path.dirname(os.path.abspath(manifest_csv))))
+    labels = df['label'].to_numpy(dtype=np.int64)
+
+    os.makedirs(output_dir, exist_ok=True)
+    index_path = os.path.join(output_dir, SHARD_INDEX_FILE)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+    start = time.time()
+    shards = []
+    kept_labels = []
+    kept_rows = []
+    skipped = []
+
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        for shard_start in range(0, len(paths), shard_size):
+            shard_paths = paths[shard_start:shard_start + shard_size]
+            images = list(pool.map(lambda p: load_resized(p, image_size), shard_paths))
+
+            ok = [i for i, img in enumerate(images) if img is not None]
+            skipped.extend(shard_paths[i] for i, img in enumerate(images) if img is None)
+            if not ok:
+                continue
+
+            shard_file = f"shard_{len(shards):05d}.npy"
+            tmp_path = os.path.join(output_dir, shard_file + ".tmp")
+            shard = np.lib.format.open_memmap(
+                tmp_path, mode='w+', dtype=np.uint8, shape=(len(ok), image_size, image_size, 3)
+            )
+            for row, i in enumerate(ok):
+                shard[row] = images[i]
+            shard.flush()
+            del shard
+            os.replace(tmp_path, os.path.join(output_dir, shard_file))
+
+            shards.append({"file": shard_file, "count": len(ok)})
+            kept_labels.extend(labels[shard_start + i] for i in ok)
+            kept_rows.extend(shard_start + i for i in ok)
+            logger.info(f"Wrote {shard_file} ({len(ok)} images)")
+
+    np.save(os.path.join(output_dir, SHARD_LABELS_FILE), np.asarray(kept_labels, dtype=np.int64))
+    np.save(os.path.join(output_dir, SHARD_ROWS_FILE), np.asarray(kept_rows, dtype=np.int64))
+
+    if skipped:
+        logger.warning(f"Skipped {len(skipped)} unreadable images, e.g. {skipped[:5]}")
+
+    index = {
+        "source_manifest": os.path.abspath(manifest_csv),
+        "image_size": image_size,
+        "num_samples": len(kept_labels),
+        "skipped": len(skipped),
+        "shards": shards,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    # The index is written last so a partially packed directory is never loaded
+    with open(index_path, 'w') as f:
+        json.dump(index, f, indent=2)
+
+    logger.info(f"Packed {len(kept_labels)} images into {len(shards)} shards in {time.time() - start:.1f}s")
+    return index
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Pack a training manifest into memory-mapped image shards')
+    parser.add_argument('--manifest', type=str, required=True,
+                        help='Path to manifest CSV file')
+    parser.add_argument('--output-dir', type=str, required=True,
+                        help='Directory to write shards to (pass it to train.py --shards)')
+    parser.add_argument('--image-size', type=int, default=256,
+                        help='Side length images are resized and center-cropped to')
+    parser.add_argument('--shard-size', type=int, default=4096,
+                        help='Images per shard file')
+    parser.add_argument('--num-workers', type=int, default=8,
+                        help='Decode threads')
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+
+    pack_manifest(
+        args.manifest,
+        args.output_dir,
+        image_size=args.image_size,
+        shard_size=args.shard_size,
+        num_workers=args.num_workers
+    )
+
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,99 @@
+from collections.abc import Mapping
+from typing import Dict, List, Optional, Iterator, Tuple
+
+import numpy as np
+
+
+MAX_CONFIDENCE = 0.99
+
+
+def softmax(x: np.ndarray) -> np.ndarray:
+    e_x = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e_x / e_x.sum(axis=-1, keepdims=True)
+
+
+def temperature_softmax(logits: np.ndarray, temperature: float = 1.0) -> np.ndarray:
+    if temperature == 1.0:
+        return softmax(logits)
+    return softmax(logits / temperature)
+
+
+def top_k(probabilities: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    probabilities = np.atleast_2d(probabilities)
+    k = min(k, probabilities.shape[-1])
+
+    if k < probabilities.shape[-1]:
+        candidates = np.argpartition(-probabilities, k - 1, axis=-1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(k), probabilities.shape).copy()
+
+    candidate_probs = np.take_along_axis(probabilities, candidates, axis=-1)
+    order = np.argsort(-candidate_probs, axis=-1, kind="stable")
+
+    indices = np.take_along_axis(candidates, order, axis=-1)
+    values = np.take_along_axis(candidate_probs, order, axis=-1)
+    return indices, values
+
+
+class LazyClassProbabilities(Mapping):
+    # Builds the {label: probability} dict only when a caller reads it, so
+    # responses that never expose all_predictions skip the per-class work.
+
+    __slots__ = ("_probabilities", "_labels", "_materialized")
+
+    def __init__(self, probabilities: np.ndarray, labels: List[str]):
+        self._probabilities = probabilities
+        self._labels = labels
+        self._materialized: Optional[Dict[str, float]] = None
+
+    def _materialize(self) -> Dict[str, float]:
+        if self._materialized is None:
+            self._materialized = dict(zip(self._labels, self._probabilities.tolist()))
+        return self._materialized
+
+    def __getitem__(self, key: str) -> float:
+        return self._materialize()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._materialize())
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def __repr__(self) -> str:
+        return repr(self._materialize())
+
+
+def postprocess_batch(
+    logits: np.ndarray,
+    temperature: float = 1.0,
+    k: int = 3,
+    group_size: int = 1,
+    max_confidence: float = MAX_CONFIDENCE
+) -> Dict[str, np.ndarray]:
+    # Rows are grouped in consecutive blocks of group_size (TTA augmentations of
+    # one image) and averaged after softmax.
+    probabilities = temperature_softmax(np.asarray(logits, dtype=np.float32), temperature)
+
+    if group_size > 1:
+        num_images = probabilities.shape[0] // group_size
+        probabilities = probabilities.reshape(num_images, group_size, -1).mean(axis=1)
+
+    return postprocess_probabilities(probabilities, k, max_confidence)
+
+
+def postprocess_probabilities(
+    probabilities: np.ndarray,
+    k: int = 3,
+    max_confidence: float = MAX_CONFIDENCE
+) -> Dict[str, np.ndarray]:
+    probabilities = np.atleast_2d(probabilities)
+    top_indices, top_probabilities = top_k(probabilities, k)
+
+    return {
+        "probabilities": probabilities,
+        "class_ids": top_indices[:, 0],
+        "confidences": np.minimum(top_probabilities[:, 0], max_confidence),
+        "top_indices": top_indices,
+        "top_probabilities": top_probabilities
+    }
@@ -1,14 +1,17 @@
 import io
-from typing import List, Tuple, Optional
+from typing import Iterator, List, Tuple, Optional
 import numpy as np
 import cv2
 from PIL import Image
 
+from tracing import traced
+
 
 IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
 IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
 
 
+@traced("preprocessing.decode_image_bytes")
 def decode_image_bytes(image_bytes: bytes) -> Optional[np.ndarray]:
     try:
         nparr = np.frombuffer(image_bytes, np.uint8)
@@ -41,6 +44,7 @@ def add_batch_dimension(image: np.ndarray) -> np.ndarray:
     return np.expand_dims(image, axis=0)
 
 
+@traced("preprocessing.preprocess_image")
 def preprocess_image(
     image_bytes: bytes,
     target_size: Tuple[int, int] = (224, 224),
@@ -92,10 +96,9 @@ def augment_for_tta(image: np.ndarray, num_augmentations: int = 5) -> List[np.nd
     return augmented_images[:num_augmentations]
 
 
-def preprocess_batch_for_tta(
+def decode_for_tta(
     image_bytes: bytes,
-    target_size: Tuple[int, int] = (224, 224),
-    num_augmentations: int = 5
+    target_size: Tuple[int, int] = (224, 224)
 ) -> Optional[np.ndarray]:
     image = decode_image_bytes(image_bytes)
     if image is None:
@@ -106,17 +109,35 @@ def preprocess_batch_for_tta(
     elif image.shape[2] == 4:
         image = cv2.cvtColor(image, cv2.COLOR_RGBA2RGB)
     
-    image = resize_image(image, target_size)
-    
+    return resize_image(image, target_size)
+
+
+def tta_chunks(
+    image: np.ndarray,
+    num_augmentations: int = 5,
+    chunk_size: int = 1
+) -> Iterator[np.ndarray]:
     augmented = augment_for_tta(image, num_augmentations)
     
-    batch = []
-    for aug_image in augmented:
-        normalized = normalize_image(aug_image)
-        chw = to_chw_format(normalized)
-        batch.append(chw)
+    for start in range(0, len(augmented), chunk_size):
+        batch = [
+            to_chw_format(normalize_image(aug_image))
+            for aug_image in augmented[start:start + chunk_size]
+        ]
+        yield np.stack(batch, axis=0).astype(np.float32)
+
+
+@traced("preprocessing.preprocess_batch_for_tta")
+def preprocess_batch_for_tta(
+    image_bytes: bytes,
+    target_size: Tuple[int, int] = (224, 224),
+    num_augmentations: int = 5
+) -> Optional[np.ndarray]:
+    image = decode_for_tta(image_bytes, target_size)
+    if image is None:
+        return None
     
-    return np.stack(batch, axis=0).astype(np.float32)
+    return next(tta_chunks(image, num_augmentations, chunk_size=num_augmentations))
 
 
 def apply_center_crop(
@@ -133,6 +154,7 @@ def apply_center_crop(
     return image[start_y:start_y + crop_height, start_x:start_x + crop_width]
 
 
+@traced("preprocessing.preprocess_with_center_crop")
 def preprocess_with_center_crop(
     image_bytes: bytes,
     target_size: Tuple[int, int] = (224, 224),
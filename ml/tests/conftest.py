@@ -0,0 +1,88 @@
+import pytest
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def image_bytes():
+    np = pytest.importorskip("numpy")
+    cv2 = pytest.importorskip("cv2")
+    image = np.random.default_rng(0).integers(0, 255, size=(64, 64, 3), dtype=np.uint8)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def write_onnx_model(path, num_classes, bias_class):
+    """Write an ONNX classifier that always predicts ``bias_class``"""
+    np = pytest.importorskip("numpy")
+    onnx = pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from onnx import helper, TensorProto
+
+    weights = np.zeros((3, num_classes), dtype=np.float32)
+    bias = np.zeros(num_classes, dtype=np.float32)
+    bias[bias_class] = 5.0
+
+    graph = helper.make_graph(
+        [
+            helper.make_node("GlobalAveragePool", ["input"], ["pooled"]),
+            helper.make_node("Flatten", ["pooled"], ["flat"]),
+            helper.make_node("Gemm", ["flat", "weights", "bias"], ["output"]),
+        ],
+        "tiny",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["batch", 3, None, None])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, ["batch", num_classes])],
+        initializer=[
+            helper.make_tensor("weights", TensorProto.FLOAT, weights.shape, weights.flatten()),
+            helper.make_tensor("bias", TensorProto.FLOAT, bias.shape, bias),
+        ]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+
+
+def write_model(path, num_classes=4):
+    """Write a small ONNX MLP whose weights are large enough to store externally"""
+    np = pytest.importorskip("numpy")
+    onnx = pytest.importorskip("onnx")
+    from onnx import helper, numpy_helper, TensorProto
+
+    rng = np.random.default_rng(0)
+    hidden = rng.standard_normal((3, 512)).astype(np.float32)
+    head = rng.standard_normal((512, num_classes)).astype(np.float32)
+
+    graph = helper.make_graph(
+        [
+            helper.make_node("GlobalAveragePool", ["input"], ["pooled"]),
+            helper.make_node("Flatten", ["pooled"], ["flat"]),
+            helper.make_node("MatMul", ["flat", "hidden"], ["features"]),
+            helper.make_node("Relu", ["features"], ["activated"]),
+            helper.make_node("Gemm", ["activated", "head", "bias"], ["output"]),
+        ],
+        "mlp",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["batch", 3, None, None])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, ["batch", num_classes])],
+        initializer=[
+            numpy_helper.from_array(hidden, "hidden"),
+            numpy_helper.from_array(head, "head"),
+            numpy_helper.from_array(np.zeros(num_classes, dtype=np.float32), "bias"),
+        ]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+
+
+def make_version(models_dir, crop_type, version, bias_class):
+    """Create ``<models_dir>/<crop_type>/<version>`` with a model predicting ``bias_class``"""
+    from disease_database import get_disease_class_labels
+
+    version_dir = models_dir / crop_type / version
+    version_dir.mkdir(parents=True)
+    num_classes = len(get_disease_class_labels(crop_type))
+    write_onnx_model(version_dir / "model.onnx", num_classes, bias_class)
+    (version_dir / "model_metadata.json").write_text(json.dumps({"framework": "onnx", "img_size": 32}))
+    return version_dir
@@ -0,0 +1,131 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+pytest.importorskip("cv2")
+
+from corpus import generate_corpus
+from preprocessing import decode_image_bytes
+
+
+class TestCorpus:
+    def test_corpus_is_deterministic(self):
+        first = generate_corpus(3, seed=7, resolutions=[(320, 240)])
+        second = generate_corpus(3, seed=7, resolutions=[(320, 240)])
+        assert [img.data for img in first] == [img.data for img in second]
+
+    def test_corpus_images_decode(self):
+        corpus = generate_corpus(3, seed=1, resolutions=[(320, 240), (240, 320)], formats=["jpeg", "png", "webp"])
+        for img in corpus:
+            decoded = decode_image_bytes(img.data)
+            assert decoded is not None
+            assert decoded.shape[:2] == (img.height, img.width)
+
+
+class TestLoadTest:
+    def test_parse_mix_normalizes(self):
+        pytest.importorskip("requests")
+        from load_test import parse_mix
+
+        mix = parse_mix("rice=3,wheat=1")
+        assert mix == {"rice": 0.75, "wheat": 0.25}
+
+    def test_schedule_is_reproducible(self):
+        pytest.importorskip("requests")
+        from load_test import build_schedule
+
+        corpus = generate_corpus(2, seed=1, resolutions=[(64, 64)])
+        mix = {"rice": 0.5, "wheat": 0.5}
+        endpoints = {"predict": 0.5, "batch_predict": 0.5}
+        assert build_schedule(20, corpus, mix, endpoints, 3) == build_schedule(20, corpus, mix, endpoints, 3)
+
+
+class TestMicroBenchmarks:
+    def test_compare_flags_regressions(self):
+        from micro_benchmarks import compare_to_baseline
+
+        baseline = {"fast": {"min_us": 100.0}, "slow": {"min_us": 100.0}}
+        results = {"fast": {"min_us": 105.0}, "slow": {"min_us": 150.0}, "new": {"min_us": 1.0}}
+        rows = {row["name"]: row for row in compare_to_baseline(results, baseline, threshold=0.2)}
+
+        assert set(rows) == {"fast", "slow"}
+        assert not rows["fast"]["regression"]
+        assert rows["slow"]["regression"]
+
+    def test_time_case_reports_stats(self):
+        from micro_benchmarks import time_case
+
+        stats = time_case(lambda: sum(range(100)), repeat=3, min_time=0.001)
+        assert stats["repeat"] == 3
+        assert 0 < stats["min_us"] <= stats["median_us"]
+
+
+class TestTrainThroughput:
+    def test_parse_mode(self):
+        for module in ("torch", "timm", "mlflow", "albumentations"):
+            pytest.importorskip(module)
+        from train_throughput import parse_mode
+
+        assert parse_mode("bf16+channels_last+compile") == {
+            "precision": "bf16", "channels_last": True, "compile_model": True
+        }
+        assert parse_mode("fp32") == {"precision": "fp32", "channels_last": False, "compile_model": False}
+        with pytest.raises(ValueError):
+            parse_mode("fp16+channels_last")
+
+    @pytest.mark.parametrize("argv", [["--steps", "0"], ["--warmup", "-1"]])
+    def test_parse_args_rejects_empty_timing(self, monkeypatch, argv):
+        for module in ("torch", "timm", "mlflow", "albumentations"):
+            pytest.importorskip(module)
+        from train_throughput import parse_args
+
+        monkeypatch.setattr(sys, "argv", ["train_throughput.py", "--manifest", "m.csv", *argv])
+        with pytest.raises(SystemExit):
+            parse_args()
+
+    def test_load_batches_rejects_manifest_smaller_than_a_batch(self, tmp_path):
+        for module in ("torch", "timm", "mlflow", "albumentations"):
+            pytest.importorskip(module)
+        import pandas as pd
+        from train_throughput import load_batches
+
+        images = generate_corpus(num_images=3, resolutions=[(32, 32)], formats=["png"])
+        for i, image in enumerate(images):
+            (tmp_path / f"{i}.png").write_bytes(image.data)
+        manifest = tmp_path / "manifest.csv"
+        pd.DataFrame({"image_path": [f"{i}.png" for i in range(3)], "label": [0, 1, 0]}).to_csv(manifest, index=False)
+
+        with pytest.raises(ValueError, match="fewer than one batch"):
+            load_batches(str(manifest), 16, batch_size=4, num_batches=2)
+        assert len(load_batches(str(manifest), 16, batch_size=2, num_batches=3)) == 3
+
+    @pytest.mark.parametrize("precision", ["fp32", "bf16"])
+    def test_train_step_channels_last(self, precision):
+        for module in ("timm", "mlflow", "albumentations"):
+            pytest.importorskip(module)
+        torch = pytest.importorskip("torch")
+        from train import prepare_training_model, train_step
+
+        model = torch.nn.Sequential(
+            torch.nn.Conv2d(3, 4, 3), torch.nn.AdaptiveAvgPool2d(1), torch.nn.Flatten(), torch.nn.Linear(4, 2)
+        )
+        train_model, autocast, settings = prepare_training_model(model, 'cpu', precision=precision, channels_last=True)
+        optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+        before = model[0].weight.detach().clone()
+
+        loss, preds = train_step(train_model, torch.randn(4, 3, 8, 8), torch.tensor([0, 1, 0, 1]),
+                                 torch.nn.CrossEntropyLoss(), optimizer, autocast, channels_last=True)
+
+        assert preds.shape == (4, 2)
+        assert torch.isfinite(loss)
+        assert model[0].weight.dtype == torch.float32
+        assert model[0].weight.is_contiguous(memory_format=torch.channels_last)
+        assert not torch.equal(model[0].weight, before)
+        assert settings["precision"] in ("fp32", precision)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
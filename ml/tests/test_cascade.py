@@ -0,0 +1,88 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from cascade import CascadeConfig, CascadeMetrics, is_uncertain, top2_margin
+from model_manager import ModelManager
+
+
+@pytest.fixture(scope="module")
+def manager(tmp_path_factory):
+    return ModelManager(str(tmp_path_factory.mktemp("models")))
+
+
+class TestCascade:
+    def test_uncertainty_uses_confidence_and_margin(self):
+        config = CascadeConfig(confidence_threshold=0.6, margin_threshold=0.2)
+        confident = {"confidence": 0.8, "top_predictions": [{"confidence": 0.8}, {"confidence": 0.1}]}
+        close_call = {"confidence": 0.7, "top_predictions": [{"confidence": 0.7}, {"confidence": 0.6}]}
+
+        assert top2_margin(confident) == pytest.approx(0.7)
+        assert not is_uncertain(confident, config)
+        assert is_uncertain(close_call, config)
+        assert is_uncertain({"confidence": 0.5, "top_predictions": []}, config)
+
+    def test_unknown_stage_rejected(self):
+        with pytest.raises(ValueError):
+            CascadeConfig(stages=("tta", "ensemble"))
+
+    def test_confident_prediction_is_not_escalated(self, manager, image_bytes):
+        manager.cascade_config = CascadeConfig(confidence_threshold=0.0, margin_threshold=0.0)
+        manager.cascade_metrics.reset()
+
+        result = manager.predict("rice", image_bytes, cascade=True)
+
+        assert result["cascade"]["stages"] == ["base"]
+        assert manager.cascade_metrics.snapshot()["escalation_rate"] == 0.0
+
+    def test_uncertain_prediction_escalates_to_tta(self, manager, image_bytes):
+        manager.cascade_config = CascadeConfig(confidence_threshold=1.0, stages=("tta", "large", "llava"))
+        manager.cascade_metrics.reset()
+
+        result = manager.predict("rice", image_bytes, cascade=True)
+
+        # No large model or LLaVA URL configured, so only TTA runs
+        assert result["cascade"]["stages"] == ["base", "tta"]
+        assert result["cascade"]["resolved_by"] == "tta"
+
+        snapshot = manager.cascade_metrics.snapshot()
+        assert snapshot["escalation_rate"] == 1.0
+        assert snapshot["stage_rates"]["tta"] == 1.0
+
+    def test_blocking_prediction_leaves_event_loop_free(self, manager, image_bytes, monkeypatch):
+        import asyncio
+        import threading
+        import inference_service
+
+        release = threading.Event()
+
+        def slow_predict(**kwargs):
+            # Stands in for a LLaVA escalation waiting on the network
+            release.wait(5)
+            return {"success": True, "crop_type": kwargs["crop_type"]}
+
+        monkeypatch.setattr(inference_service, "worker_pool", None)
+        monkeypatch.setattr(inference_service, "model_manager", manager)
+        monkeypatch.setattr(manager, "predict", slow_predict)
+
+        async def scenario():
+            pending = asyncio.create_task(inference_service.run_prediction(crop_type="rice", image_bytes=image_bytes))
+            await asyncio.sleep(0.05)
+            # The loop still runs other work while the prediction blocks
+            assert not pending.done()
+            release.set()
+            return await asyncio.wait_for(pending, 5)
+
+        assert asyncio.run(scenario())["crop_type"] == "rice"
+
+    def test_metrics_snapshot_empty(self):
+        assert CascadeMetrics().snapshot()["escalation_rate"] == 0.0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
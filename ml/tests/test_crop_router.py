@@ -0,0 +1,129 @@
+import pytest
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from model_manager import ModelManager
+from crop_router import CropRouter, AUTO_CROP, CROP_TYPE_REQUIRED, ROUTER_DIR
+from disease_database import SUPPORTED_CROPS, get_disease_class_labels
+from conftest import write_onnx_model
+
+
+ROUTER_CROPS = ["rice", "wheat", "tomato"]
+
+
+def make_router(models_dir, bias_class, crops=ROUTER_CROPS):
+    router_dir = models_dir / ROUTER_DIR
+    router_dir.mkdir(parents=True)
+    write_onnx_model(router_dir / "model.onnx", len(crops), bias_class)
+    (router_dir / "model_metadata.json").write_text(json.dumps({"framework": "onnx", "img_size": 32, "temperature": 1.0}))
+    (router_dir / "class_mapping.json").write_text(json.dumps({str(i): crop for i, crop in enumerate(crops)}))
+
+
+def make_crop_model(models_dir, crop_type):
+    (models_dir / crop_type).mkdir(parents=True)
+    write_onnx_model(models_dir / crop_type / "model.onnx", len(get_disease_class_labels(crop_type)), 0)
+
+
+def encode(seed):
+    image = np.random.default_rng(seed).integers(0, 255, size=(64, 64, 3), dtype=np.uint8)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+class TestCropRouter:
+    def test_mock_router_is_deterministic(self, tmp_path):
+        manager = ModelManager(str(tmp_path))
+        images = [encode(seed) for seed in range(4)]
+
+        first = manager.route_crops(images)
+        second = manager.route_crops(images)
+
+        assert not manager.crop_router.is_loaded
+        assert [r["crop_type"] for r in first] == [r["crop_type"] for r in second]
+        assert all(r["success"] and r["crop_type"] in SUPPORTED_CROPS and r["mock_prediction"] for r in first)
+
+    def test_auto_prediction_uses_routed_crop(self, tmp_path):
+        make_router(tmp_path, bias_class=1)
+        manager = ModelManager(str(tmp_path))
+
+        result = manager.predict(AUTO_CROP, encode(0))
+
+        assert manager.crop_router.is_loaded
+        assert result["success"]
+        assert result["crop_type"] == "wheat"
+        assert result["crop_routing"]["crop_type"] == "wheat"
+        assert result["crop_routing"]["candidates"][0]["crop_type"] == "wheat"
+        assert manager.predict("", encode(0))["crop_type"] == "wheat"
+
+    def test_batch_routes_auto_items_alongside_explicit_ones(self, tmp_path):
+        make_router(tmp_path, bias_class=2)
+        manager = ModelManager(str(tmp_path))
+
+        results = manager.batch_predict([
+            ("rice", encode(0)),
+            (AUTO_CROP, encode(1)),
+            ("tomato", encode(2)),
+            (AUTO_CROP, b"not an image"),
+        ])
+
+        assert [r.get("crop_type") for r in results[:3]] == ["rice", "tomato", "tomato"]
+        assert "crop_routing" not in results[0]
+        assert results[1]["crop_routing"]["crop_type"] == "tomato"
+        assert not results[3]["success"]
+
+    def test_low_confidence_routing_rejected(self, tmp_path):
+        manager = ModelManager(str(tmp_path))
+        manager.crop_router = CropRouter(manager.crop_router.model, min_confidence=1.01)
+
+        result = manager.predict(AUTO_CROP, encode(0))
+
+        assert not result["success"]
+        assert "Could not identify crop type" in result["error"]
+        assert result["crop_routing"]["candidates"]
+
+    def test_unsupported_router_class_rejected(self, tmp_path):
+        make_router(tmp_path, bias_class=0, crops=["cactus", "rice"])
+        manager = ModelManager(str(tmp_path))
+
+        result = manager.predict(AUTO_CROP, encode(0))
+
+        assert not result["success"]
+        assert "cactus" in result["error"]
+
+    def test_mock_router_refused_next_to_real_models(self, tmp_path):
+        make_crop_model(tmp_path, "rice")
+        manager = ModelManager(str(tmp_path))
+
+        assert manager.models["rice"].is_loaded
+        assert not manager.auto_routing_available
+        result = manager.predict(AUTO_CROP, encode(0))
+        assert not result["success"]
+        assert result["error_code"] == CROP_TYPE_REQUIRED
+
+        results = manager.batch_predict([(AUTO_CROP, encode(0)), ("rice", encode(1))])
+        assert results[0]["error_code"] == CROP_TYPE_REQUIRED
+        assert results[1]["success"] and results[1]["crop_type"] == "rice"
+
+    def test_trained_router_allows_auto_next_to_real_models(self, tmp_path):
+        make_router(tmp_path, bias_class=0)
+        make_crop_model(tmp_path, "rice")
+        manager = ModelManager(str(tmp_path))
+
+        assert manager.auto_routing_available
+        assert manager.predict(AUTO_CROP, encode(0))["crop_type"] == "rice"
+
+    def test_unknown_crop_does_not_fall_back(self, tmp_path):
+        manager = ModelManager(str(tmp_path))
+
+        assert manager.get_model("cactus") is None
+        assert not manager.predict("cactus", encode(0))["success"]
+        assert not manager.batch_predict([("cactus", encode(0))])[0]["success"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,141 @@
+import pytest
+import sys
+import os
+import pickle
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pd = pytest.importorskip("pandas")
+torch = pytest.importorskip("torch")
+pytest.importorskip("sklearn")
+
+from dataset import ManifestImageDataset, ShardedImageDataset, FILE_CHECK_SUFFIX, create_data_splits
+from pack_shards import pack_manifest, load_resized
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(10):
+        image = rng.integers(0, 255, size=(48 + i, 64, 3), dtype=np.uint8)
+        cv2.imwrite(str(tmp_path / f"{i}.png"), image)
+        rows.append((f"{i}.png", i % 3))
+    rows.append(("missing.png", 1))
+    pd.DataFrame(rows, columns=["image_path", "label"]).to_csv(tmp_path / "manifest.csv", index=False)
+    return tmp_path / "manifest.csv"
+
+
+class TestShards:
+    def test_pack_skips_unreadable_images(self, manifest, tmp_path):
+        index = pack_manifest(str(manifest), str(tmp_path / "shards"), image_size=32, shard_size=4, num_workers=2)
+
+        assert index["num_samples"] == 10
+        assert index["skipped"] == 1
+        assert [shard["count"] for shard in index["shards"]] == [4, 4, 2]
+        assert ShardedImageDataset(str(tmp_path / "shards")).source_rows.tolist() == list(range(10))
+
+    def test_samples_match_decoded_images(self, manifest, tmp_path):
+        pack_manifest(str(manifest), str(tmp_path / "shards"), image_size=32, shard_size=4)
+        dataset = ShardedImageDataset(str(tmp_path / "shards"))
+
+        assert len(dataset) == 10
+        assert dataset.class_counts == {0: 4, 1: 3, 2: 3}
+        for idx in (0, 5, 9, -1):
+            img, label = dataset[idx]
+            expected = load_resized(str(tmp_path / f"{idx % 10}.png"), 32)
+            assert label == (idx % 10) % 3
+            assert img.shape == (3, 32, 32)
+            np.testing.assert_allclose(img.numpy(), expected.transpose(2, 0, 1) / 255.0, atol=1e-6)
+
+    def test_shards_are_memory_mapped_and_not_pickled(self, manifest, tmp_path):
+        pack_manifest(str(manifest), str(tmp_path / "shards"), image_size=32, shard_size=4)
+        dataset = ShardedImageDataset(str(tmp_path / "shards"))
+        dataset[0]
+
+        assert isinstance(dataset._shard(0), np.memmap)
+        restored = pickle.loads(pickle.dumps(dataset))
+        assert restored._shards == {}
+        assert torch.equal(restored[3][0], dataset[3][0])
+
+
+class TestManifestDataset:
+    def test_to_tensor_transform_output_is_not_rescaled(self, manifest):
+        A = pytest.importorskip("albumentations")
+        from albumentations.pytorch import ToTensorV2
+
+        transform = A.Compose([A.Resize(32, 32), A.Normalize(), ToTensorV2()])
+        dataset = ManifestImageDataset(str(manifest), transform=transform)
+        img, _ = dataset[0]
+
+        expected = transform(image=cv2.cvtColor(cv2.imread(str(manifest.parent / "0.png")), cv2.COLOR_BGR2RGB))["image"]
+        assert torch.allclose(img, expected.float())
+
+    def test_missing_files_are_found_and_cached(self, manifest):
+        dataset = ManifestImageDataset(str(manifest))
+        cache_path = str(manifest) + FILE_CHECK_SUFFIX
+
+        assert dataset.missing_files == [str(manifest.parent / "missing.png")]
+        assert os.path.exists(cache_path)
+
+        # An unchanged manifest reuses the cached result without stat-ing files
+        (manifest.parent / "0.png").unlink()
+        assert ManifestImageDataset(str(manifest)).missing_files == dataset.missing_files
+
+        # Touching the manifest invalidates the cache
+        os.utime(manifest, ns=(0, os.stat(manifest).st_mtime_ns + 10**9))
+        assert len(ManifestImageDataset(str(manifest)).missing_files) == 2
+
+    def test_paths_resolved_against_manifest_dir(self, manifest, tmp_path):
+        absolute = str(tmp_path / "3.png")
+        df = pd.read_csv(manifest)
+        df.loc[0, "image_path"] = absolute
+        df.to_csv(manifest, index=False)
+
+        dataset = ManifestImageDataset(str(manifest), use_check_cache=False)
+
+        assert dataset.paths[0] == absolute
+        assert dataset.paths[1] == os.path.join(str(tmp_path), "1.png")
+        assert not os.path.exists(str(manifest) + FILE_CHECK_SUFFIX)
+
+    def test_with_transform_leaves_original_untouched(self, manifest):
+        dataset = ManifestImageDataset(str(manifest))
+        view = dataset.with_transform(lambda image: {"image": image[:8, :8]})
+
+        assert dataset.transform is None
+        assert view[0][0].shape == (3, 8, 8)
+        assert dataset[0][0].shape == (3, 48, 64)
+
+
+class TestDataSplits:
+    @pytest.mark.parametrize("test_size", [0, 0.2])
+    def test_groups_never_straddle_splits(self, test_size):
+        dataset = list(range(200))
+        groups = np.random.default_rng(0).integers(0, 60, size=200)
+
+        splits = [s for s in create_data_splits(dataset, val_size=0.2, test_size=test_size, groups=groups) if s]
+        split_groups = [set(groups[s.indices]) for s in splits]
+
+        assert sorted(i for s in splits for i in s.indices) == dataset
+        for a in range(len(split_groups)):
+            for b in range(a + 1, len(split_groups)):
+                assert not split_groups[a] & split_groups[b]
+        assert 30 <= len(splits[1]) <= 60
+
+    def test_group_split_is_seeded(self):
+        groups = np.arange(100) // 3
+
+        first = create_data_splits(list(range(100)), test_size=0, groups=groups, random_seed=1)
+        second = create_data_splits(list(range(100)), test_size=0, groups=groups, random_seed=1)
+
+        assert first[1].indices == second[1].indices
+
+    def test_group_count_must_match(self):
+        with pytest.raises(ValueError):
+            create_data_splits(list(range(10)), groups=np.zeros(9))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,113 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("scipy")
+
+from dedup import near_duplicate_pairs, find_duplicate_groups, summarize_duplicates
+from image_checks import ImageCheckRun
+
+
+def brute_force_pairs(hashes, max_distance):
+    return {
+        (i, j)
+        for i in range(len(hashes)) for j in range(i + 1, len(hashes))
+        if bin(int(hashes[i]) ^ int(hashes[j])).count("1") <= max_distance
+    }
+
+
+def smooth_image(rng):
+    # Low-frequency content like a photo, so the 9x8 dHash thumbnail has contrast
+    coarse = rng.integers(0, 255, size=(6, 8, 3), dtype=np.uint8)
+    return cv2.resize(coarse, (128, 96), interpolation=cv2.INTER_CUBIC)
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(6):
+        image = smooth_image(rng)
+        cv2.imwrite(str(tmp_path / f"{i}.png"), image)
+        rows.append((f"{i}.png", i % 2))
+
+    # Exact copy with the same label, re-encoded resize with a different label
+    (tmp_path / "copy_of_0.png").write_bytes((tmp_path / "0.png").read_bytes())
+    resized = cv2.resize(cv2.imread(str(tmp_path / "1.png")), (64, 48))
+    cv2.imwrite(str(tmp_path / "small_1.jpg"), resized, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    rows += [("copy_of_0.png", 0), ("small_1.jpg", 0), ("missing.png", 1)]
+
+    pd.DataFrame(rows, columns=["image_path", "label"]).to_csv(tmp_path / "manifest.csv", index=False)
+    return tmp_path / "manifest.csv"
+
+
+class TestNearDuplicatePairs:
+    @pytest.mark.parametrize("max_distance", [0, 3, 8])
+    def test_matches_brute_force(self, max_distance):
+        rng = np.random.default_rng(max_distance)
+        base = rng.integers(0, 2**63, size=40, dtype=np.uint64)
+        # Flip a few random bits of each base hash to plant near neighbours
+        flips = [
+            np.bitwise_or.reduce(np.uint64(1) << rng.integers(0, 64, size=bits).astype(np.uint64))
+            for bits in (1, 3, 6) for _ in base
+        ]
+        hashes = np.concatenate([base, np.tile(base, 3) ^ np.array(flips, dtype=np.uint64)])
+
+        i, j = near_duplicate_pairs(hashes, max_distance)
+
+        assert set(zip(i.tolist(), j.tolist())) == brute_force_pairs(hashes, max_distance)
+
+    def test_large_buckets_compared_in_tiles(self, monkeypatch):
+        import dedup
+
+        monkeypatch.setattr(dedup, "MAX_BUCKET_COMPARE", 4)
+        rng = np.random.default_rng(7)
+        # Few distinct low bits, so every band bucket is several tiles wide
+        high = rng.integers(0, 4, size=30, dtype=np.uint64) << np.uint64(60)
+        hashes = high | rng.integers(0, 8, size=30, dtype=np.uint64)
+        i, j = near_duplicate_pairs(hashes, 2)
+
+        assert set(zip(i.tolist(), j.tolist())) == brute_force_pairs(hashes, 2)
+
+    def test_no_pairs(self):
+        i, j = near_duplicate_pairs(np.array([0, 2**64 - 1], dtype=np.uint64), 4)
+
+        assert len(i) == len(j) == 0
+
+
+class TestDuplicateGroups:
+    def test_exact_and_near_duplicates_grouped(self, manifest, tmp_path):
+        checks = ImageCheckRun(str(manifest), str(tmp_path / "checks"), num_workers=1).run()
+        groups = find_duplicate_groups(checks).set_index("image_path")
+        groups.index = groups.index.map(os.path.basename)
+
+        assert groups.loc["0.png", "dup_group"] == groups.loc["copy_of_0.png", "dup_group"]
+        assert groups.loc["1.png", "dup_group"] == groups.loc["small_1.jpg", "dup_group"]
+        assert groups.loc["copy_of_0.png", "dup_kind"] == "exact"
+        assert groups.loc["small_1.jpg", "dup_kind"] == "near"
+        assert groups.loc[["2.png", "missing.png"], "dup_group_size"].tolist() == [1, 1]
+        assert groups["dup_group"].nunique() == len(groups) - 2
+
+    def test_summary_reports_label_conflicts(self, manifest, tmp_path):
+        checks = ImageCheckRun(str(manifest), str(tmp_path / "checks"), num_workers=1).run()
+        summary = summarize_duplicates(find_duplicate_groups(checks))
+
+        assert (summary["duplicate_groups"], summary["duplicate_rows"], summary["redundant_rows"]) == (2, 4, 2)
+        assert summary["label_conflict_groups"] == 1
+        assert not summary["success"]
+
+    def test_exact_only(self, manifest, tmp_path):
+        checks = ImageCheckRun(str(manifest), str(tmp_path / "checks"), num_workers=1).run()
+        summary = summarize_duplicates(find_duplicate_groups(checks, max_distance=-1))
+
+        assert summary["duplicate_groups"] == 1
+        assert summary["success"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,188 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.utils.data import DataLoader, Subset, TensorDataset
+
+from distributed import (
+    DistributedContext, NullTracker, broadcast_buffers, shard_indices, all_reduce_sum, gather_evaluation
+)
+from utils import evaluate
+
+
+WORLD_SIZE = 2
+
+
+def make_data(n=11, num_classes=3):
+    generator = torch.Generator().manual_seed(0)
+    x = torch.randn(n, 8, generator=generator)
+    y = torch.randint(0, num_classes, (n,), generator=generator)
+    return TensorDataset(x, y)
+
+
+def make_model(num_classes=3):
+    torch.manual_seed(0)
+    return torch.nn.Linear(8, num_classes)
+
+
+def make_bn_model(num_classes=3):
+    torch.manual_seed(0)
+    return torch.nn.Sequential(
+        torch.nn.Linear(8, 8), torch.nn.BatchNorm1d(8), torch.nn.ReLU(), torch.nn.Linear(8, num_classes)
+    )
+
+
+def _run_rank(rank, init_file, out_dir, fn):
+    dist.init_process_group("gloo", init_method=f"file://{init_file}", rank=rank, world_size=WORLD_SIZE)
+    try:
+        ctx = DistributedContext(rank=rank, local_rank=rank, world_size=WORLD_SIZE)
+        torch.save(fn(ctx), os.path.join(out_dir, f"rank{rank}.pt"))
+    finally:
+        dist.destroy_process_group()
+
+
+def run_ranks(tmp_path, fn):
+    """Run fn(ctx) on WORLD_SIZE forked gloo ranks and return their results"""
+    context = mp.get_context("fork")
+    procs = [
+        context.Process(target=_run_rank, args=(rank, str(tmp_path / "init"), str(tmp_path), fn))
+        for rank in range(WORLD_SIZE)
+    ]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(timeout=120)
+        assert proc.exitcode == 0
+    return [torch.load(tmp_path / f"rank{rank}.pt", weights_only=False) for rank in range(WORLD_SIZE)]
+
+
+def sharded_evaluation(ctx, gather_outputs=True):
+    dataset = make_data()
+    loader = DataLoader(Subset(dataset, shard_indices(range(len(dataset)), ctx)), batch_size=4)
+    return gather_evaluation(evaluate(make_model(), loader, keep_logits=True), ctx, gather_outputs=gather_outputs)
+
+
+def sharded_metrics_only(ctx):
+    return sharded_evaluation(ctx, gather_outputs=False)
+
+
+def uneven_evaluation(ctx):
+    # Rank 1 gets no samples at all
+    dataset = make_data(n=3)
+    indices = list(range(len(dataset))) if ctx.rank == 0 else []
+    loader = DataLoader(Subset(dataset, indices), batch_size=4)
+    return gather_evaluation(evaluate(make_model(), loader), ctx)
+
+
+def reduced_totals(ctx):
+    return all_reduce_sum(torch.tensor([float(ctx.rank + 1), 1.0], dtype=torch.float64), ctx)
+
+
+def ddp_steps(ctx):
+    from train import prepare_training_model, train_step
+
+    dataset = make_data(n=16)
+    model = make_bn_model()
+    train_model, autocast, settings = prepare_training_model(model, 'cpu', ddp=True)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+    criterion = torch.nn.CrossEntropyLoss()
+    # Ranks see different batches; gradient averaging keeps the replicas equal
+    for xb, yb in DataLoader(Subset(dataset, shard_indices(range(len(dataset)), ctx)), batch_size=4):
+        train_step(train_model, xb, yb, criterion, optimizer, autocast, channels_last=False)
+    # The last forward pass leaves rank-local BatchNorm statistics
+    local_state = {k: v.clone() for k, v in model.state_dict().items()}
+    broadcast_buffers(model, ctx)
+    return {"settings": settings, "local_state": local_state, "state": model.state_dict()}
+
+
+class TestShardIndices:
+    def test_shards_partition_without_padding(self):
+        shards = [shard_indices(range(11), DistributedContext(rank=r, world_size=3)) for r in range(3)]
+        assert sorted(sum(shards, [])) == list(range(11))
+        assert [len(s) for s in shards] == [4, 4, 3]
+
+    def test_single_process_keeps_everything(self):
+        assert shard_indices([5, 3, 9], DistributedContext()) == [5, 3, 9]
+
+
+class TestSingleProcess:
+    def test_gather_evaluation_is_identity(self):
+        metrics = evaluate(make_model(), DataLoader(make_data(), batch_size=4))
+        assert gather_evaluation(metrics, DistributedContext()) is metrics
+
+    def test_all_reduce_sum_is_identity(self):
+        totals = torch.tensor([1.0, 2.0])
+        assert torch.equal(all_reduce_sum(totals, DistributedContext()), torch.tensor([1.0, 2.0]))
+
+    def test_null_tracker_accepts_mlflow_calls(self):
+        tracker = NullTracker()
+        tracker.set_experiment("x")
+        with tracker.start_run(run_name="r") as run:
+            tracker.log_params({"a": 1})
+            tracker.log_metrics({"m": 1.0}, step=1)
+            tracker.log_artifact("missing.pth")
+            tracker.pytorch.log_model(None, "model")
+        assert run.info.run_id is None
+
+
+@pytest.mark.skipif(not dist.is_available(), reason="torch.distributed not available")
+class TestGlooRanks:
+    def test_gathered_metrics_match_single_process(self, tmp_path):
+        expected = evaluate(make_model(), DataLoader(make_data(), batch_size=4))
+        results = run_ranks(tmp_path, sharded_evaluation)
+
+        for gathered in results:
+            np.testing.assert_array_equal(gathered['confusion_matrix'], expected['confusion_matrix'])
+            for key in ('accuracy', 'precision', 'recall', 'f1'):
+                assert gathered[key] == pytest.approx(expected[key])
+            assert len(gathered['labels']) == len(make_data())
+            assert sorted(gathered['labels'].tolist()) == sorted(expected['labels'].tolist())
+            assert gathered['probabilities'].shape == expected['probabilities'].shape
+            assert gathered['logits'].shape == expected['probabilities'].shape
+
+    def test_metrics_only_skips_per_sample_arrays(self, tmp_path):
+        expected = evaluate(make_model(), DataLoader(make_data(), batch_size=4))
+
+        for gathered in run_ranks(tmp_path, sharded_metrics_only):
+            np.testing.assert_array_equal(gathered['confusion_matrix'], expected['confusion_matrix'])
+            assert gathered['accuracy'] == pytest.approx(expected['accuracy'])
+            assert gathered['predictions'] is None and gathered['logits'] is None
+
+    def test_rank_without_samples(self, tmp_path):
+        expected = evaluate(make_model(), DataLoader(make_data(n=3), batch_size=4))
+
+        for gathered in run_ranks(tmp_path, uneven_evaluation):
+            np.testing.assert_array_equal(gathered['confusion_matrix'], expected['confusion_matrix'])
+
+    def test_all_reduce_sum_across_ranks(self, tmp_path):
+        for totals in run_ranks(tmp_path, reduced_totals):
+            assert totals.tolist() == [3.0, 2.0]
+
+    def test_ddp_replicas_stay_in_sync(self, tmp_path):
+        results = run_ranks(tmp_path, ddp_steps)
+
+        assert results[0]["settings"]["ddp"] is True
+        for name, tensor in results[0]["state"].items():
+            torch.testing.assert_close(results[1]["state"][name], tensor)
+        # The replicas moved away from the shared initial weights
+        assert not torch.equal(results[0]["state"]["0.weight"], make_bn_model()[0].weight.detach())
+
+    def test_broadcast_buffers_syncs_batchnorm_stats(self, tmp_path):
+        results = run_ranks(tmp_path, ddp_steps)
+
+        local = [result["local_state"] for result in results]
+        assert not torch.equal(local[0]["1.running_mean"], local[1]["1.running_mean"])
+        for result in results:
+            torch.testing.assert_close(result["state"]["1.running_mean"], local[0]["1.running_mean"])
+            torch.testing.assert_close(result["state"]["1.running_var"], local[0]["1.running_var"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,165 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+
+from feature_cache import FeatureCache, backbone_version, extract_features, train_head, FEATURES_FILE
+
+
+class TinyNet(torch.nn.Module):
+    # Minimal stand-in for the timm feature API
+    pretrained_cfg = {"classifier": "fc"}
+    num_features = 4
+
+    def __init__(self, num_classes=2):
+        super().__init__()
+        self.conv = torch.nn.Conv2d(3, 4, 3)
+        self.fc = torch.nn.Linear(4, num_classes)
+        self.calls = 0
+
+    def forward_features(self, x):
+        self.calls += len(x)
+        return self.conv(x)
+
+    def forward_head(self, x, pre_logits=False):
+        x = x.mean(dim=(2, 3))
+        return x if pre_logits else self.fc(x)
+
+
+def make_dataset(n=10, seed=0):
+    images = torch.as_tensor(np.random.default_rng(seed).normal(size=(n, 3, 8, 8)), dtype=torch.float32)
+    return torch.utils.data.TensorDataset(images, torch.arange(n) % 2)
+
+
+def _write_rows(cache_root, writer, num_rows):
+    cache = FeatureCache(cache_root, "v1", 3)
+    for i in range(num_rows):
+        cache.append([f"{writer}-{i}"], np.full((1, 3), writer * 100 + i))
+        cache.flush()
+
+
+class TestFeatureCache:
+    def test_append_and_reopen(self, tmp_path):
+        cache = FeatureCache(str(tmp_path), "v1", 3)
+        cache.append(["a", "b"], np.arange(6).reshape(2, 3))
+        cache.flush()
+
+        reopened = FeatureCache(str(tmp_path), "v1", 3)
+        assert reopened.lookup(["b", "c", "a"]).tolist() == [1, -1, 0]
+        np.testing.assert_array_equal(reopened.features()[1], [3, 4, 5])
+
+    def test_unflushed_rows_are_dropped(self, tmp_path):
+        cache = FeatureCache(str(tmp_path), "v1", 3)
+        cache.append(["a"], np.zeros((1, 3)))
+        cache.flush()
+        cache.append(["b"], np.ones((1, 3)))
+        # Rows of a writer interrupted before it replaced the index
+        with open(tmp_path / "v1" / FEATURES_FILE, "ab") as f:
+            f.write(np.ones((1, 3), dtype=np.float32).tobytes())
+
+        reopened = FeatureCache(str(tmp_path), "v1", 3)
+        reopened.append(["c"], np.full((1, 3), 2.0))
+        reopened.flush()
+
+        assert len(reopened) == 2
+        assert reopened.lookup(["b"]).tolist() == [-1]
+        assert os.path.getsize(tmp_path / "v1" / FEATURES_FILE) == 2 * 3 * 4
+        np.testing.assert_array_equal(FeatureCache(str(tmp_path), "v1", 3).features()[1], [2, 2, 2])
+
+    def test_concurrent_writers_keep_each_others_rows(self, tmp_path):
+        first = FeatureCache(str(tmp_path), "v1", 3)
+        second = FeatureCache(str(tmp_path), "v1", 3)
+        first.append(["imgA", "shared"], np.array([[1, 1, 1], [5, 5, 5]]))
+        second.append(["imgB", "shared"], np.array([[2, 2, 2], [6, 6, 6]]))
+        first.flush()
+        second.flush()
+
+        reopened = FeatureCache(str(tmp_path), "v1", 3)
+        features = reopened.features()
+        rows = reopened.lookup(["imgA", "imgB", "shared"])
+        assert len(reopened) == 3
+        np.testing.assert_array_equal(features[rows], [[1, 1, 1], [2, 2, 2], [5, 5, 5]])
+        assert second.lookup(["imgA"]).tolist() == rows[:1].tolist()
+
+    def test_writer_processes_share_a_cache(self, tmp_path):
+        import multiprocessing as mp
+
+        context = mp.get_context("fork")
+        procs = [context.Process(target=_write_rows, args=(str(tmp_path), writer, 20)) for writer in (1, 2)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join(timeout=60)
+            assert proc.exitcode == 0
+
+        cache = FeatureCache(str(tmp_path), "v1", 3)
+        assert len(cache) == 40
+        for writer in (1, 2):
+            rows = cache.lookup([f"{writer}-{i}" for i in range(20)])
+            np.testing.assert_array_equal(cache.features()[rows, 0], writer * 100 + np.arange(20))
+
+    def test_backbone_version_ignores_classifier(self):
+        torch.manual_seed(0)
+        model = TinyNet()
+        version = backbone_version(model, "tiny", 8)
+
+        with torch.no_grad():
+            model.fc.weight.add_(1.0)
+        assert backbone_version(model, "tiny", 8) == version
+
+        with torch.no_grad():
+            model.conv.weight.add_(1.0)
+        assert backbone_version(model, "tiny", 8) != version
+        assert backbone_version(model, "tiny", 16) != backbone_version(model, "tiny", 8)
+
+
+class TestExtractAndTrain:
+    def test_only_missing_features_are_extracted(self, tmp_path):
+        model = TinyNet()
+        dataset = make_dataset()
+        keys = [f"img{i % 8}" for i in range(10)]
+        cache = FeatureCache(str(tmp_path), "v1", model.num_features)
+
+        rows = extract_features(model, dataset, keys, cache, batch_size=3, num_workers=0, flush_every=1)
+        assert model.calls == 8
+        assert rows[8] == rows[0]
+
+        model.calls = 0
+        grown = torch.utils.data.ConcatDataset([dataset, make_dataset(1, seed=1)])
+        again = extract_features(model, grown, keys + ["new"], cache, num_workers=0)
+        assert model.calls == 1
+        np.testing.assert_array_equal(again[:10], rows)
+
+    def test_cached_features_match_backbone(self, tmp_path):
+        model = TinyNet()
+        dataset = make_dataset()
+        cache = FeatureCache(str(tmp_path), "v1", model.num_features)
+        rows = extract_features(model, dataset, [str(i) for i in range(10)], cache, num_workers=0)
+
+        with torch.no_grad():
+            expected = model.forward_head(model.forward_features(dataset.tensors[0]), pre_logits=True)
+        np.testing.assert_allclose(cache.features()[rows], expected.numpy(), rtol=1e-5, atol=1e-6)
+
+    def test_train_head_separates_classes(self):
+        rng = np.random.default_rng(0)
+        labels = np.arange(200) % 3
+        features = rng.normal(size=(200, 8)).astype(np.float32)
+        features[np.arange(200), labels] += 4.0
+        head = torch.nn.Linear(8, 3)
+
+        result = train_head(head, features, np.arange(150), labels[:150], np.arange(150, 200), labels[150:],
+                            epochs=20, lr=0.05)
+
+        assert result["best_val_accuracy"] > 0.9
+        assert len(result["history"]) == 20
+        with torch.no_grad():
+            accuracy = (head(torch.from_numpy(features[150:])).argmax(dim=1).numpy() == labels[150:]).mean()
+        assert accuracy == pytest.approx(result["best_val_accuracy"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
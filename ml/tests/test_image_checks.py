@@ -0,0 +1,134 @@
+import pytest
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pd = pytest.importorskip("pandas")
+
+from image_checks import ImageCheckRun, check_image, difference_hash, summarize_checks, PROGRESS_FILE
+
+
+def smooth_image(rng):
+    # Low-frequency content like a photo, so the 9x8 dHash thumbnail has contrast
+    coarse = rng.integers(0, 255, size=(6, 8, 3), dtype=np.uint8)
+    return cv2.resize(coarse, (128, 96), interpolation=cv2.INTER_CUBIC)
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(7):
+        image = rng.integers(0, 255, size=(32, 40, 3), dtype=np.uint8)
+        cv2.imwrite(str(tmp_path / f"{i}.jpg"), image)
+        rows.append((f"{i}.jpg", i % 2))
+
+    data = (tmp_path / "0.jpg").read_bytes()
+    (tmp_path / "truncated.jpg").write_bytes(data[:len(data) // 2])
+    cv2.imwrite(str(tmp_path / "tiny.png"), np.zeros((4, 4, 3), dtype=np.uint8))
+    (tmp_path / "duplicate.jpg").write_bytes(data)
+    rows += [("truncated.jpg", 0), ("tiny.png", 1), ("missing.jpg", 0), ("duplicate.jpg", 0)]
+
+    pd.DataFrame(rows, columns=["image_path", "label"]).to_csv(tmp_path / "manifest.csv", index=False)
+    return tmp_path / "manifest.csv"
+
+
+class TestCheckImage:
+    def test_valid_image(self, manifest):
+        result = check_image(str(manifest.parent / "1.jpg"))
+
+        assert result["status"] == "valid"
+        assert (result["width"], result["height"], result["channels"]) == (40, 32, 3)
+        assert result["format"] == "jpeg"
+        assert len(result["sha256"]) == 64
+
+    def test_dhash_survives_resize_and_reencode(self, manifest):
+        rng = np.random.default_rng(1)
+        image = smooth_image(rng)
+        copy = cv2.imdecode(cv2.imencode(".jpg", cv2.resize(image, (64, 48)), [cv2.IMWRITE_JPEG_QUALITY, 60])[1], 1)
+        other = smooth_image(rng)
+
+        assert bin(difference_hash(image) ^ difference_hash(copy)).count("1") <= 4
+        assert bin(difference_hash(image) ^ difference_hash(other)).count("1") > 10
+        assert len(check_image(str(manifest.parent / "1.jpg"))["dhash"]) == 16
+
+    def test_jpeg_with_trailing_data_is_valid(self, manifest, tmp_path):
+        # e.g. camera maker notes appended after the end-of-image marker
+        data = (manifest.parent / "1.jpg").read_bytes() + b"\x00" * 2048
+        (tmp_path / "trailer.jpg").write_bytes(data)
+
+        result = check_image(str(tmp_path / "trailer.jpg"))
+
+        assert result["status"] == "valid"
+        assert (result["width"], result["height"]) == (40, 32)
+
+    def test_png_with_trailing_data_is_valid(self, tmp_path):
+        image = np.random.default_rng(2).integers(0, 255, size=(32, 40, 3), dtype=np.uint8)
+        data = cv2.imencode(".png", image)[1].tobytes()
+        (tmp_path / "trailer.png").write_bytes(data + b"\x00" * 64)
+        (tmp_path / "truncated.png").write_bytes(data[:len(data) // 2])
+
+        assert check_image(str(tmp_path / "trailer.png"))["status"] == "valid"
+        truncated = check_image(str(tmp_path / "truncated.png"))
+        assert truncated["status"] == "corrupt" and "truncated" in truncated["reason"]
+
+    @pytest.mark.parametrize("name,status,reason", [
+        ("truncated.jpg", "corrupt", "truncated"),
+        ("tiny.png", "corrupt", "invalid dimensions"),
+        ("missing.jpg", "missing", "missing"),
+    ])
+    def test_invalid_images(self, manifest, name, status, reason):
+        result = check_image(str(manifest.parent / name))
+
+        assert result["status"] == status
+        assert reason in result["reason"]
+
+
+class TestImageCheckRun:
+    def test_full_run_and_summary(self, manifest, tmp_path):
+        run = ImageCheckRun(str(manifest), str(tmp_path / "checks"), chunk_size=3, num_workers=2, batch_size=2)
+        checks = run.run()
+        summary = summarize_checks(checks)
+
+        assert checks["row"].tolist() == list(range(11))
+        assert summary["total"] == 11
+        assert (summary["valid"], summary["corrupt"], summary["missing"]) == (8, 2, 1)
+        assert summary["duplicate_files"] == 1
+        assert not summary["success"]
+        assert os.path.exists(run.write_report(checks))
+
+    def test_resumes_after_last_completed_chunk(self, manifest, tmp_path):
+        output_dir = tmp_path / "checks"
+        run = ImageCheckRun(str(manifest), str(output_dir), chunk_size=3, num_workers=1)
+        expected = run.run()
+
+        # Simulate an interruption before the last chunk was recorded
+        progress = json.loads((output_dir / PROGRESS_FILE).read_text())
+        progress["completed_chunks"] = progress["completed_chunks"][:2]
+        (output_dir / PROGRESS_FILE).write_text(json.dumps(progress))
+        (output_dir / "part-00003.csv").unlink()
+        os.utime(output_dir / "part-00000.csv", ns=(0, 0))
+
+        resumed = run.run()
+
+        pd.testing.assert_frame_equal(resumed, expected)
+        assert os.stat(output_dir / "part-00000.csv").st_mtime_ns == 0
+
+    def test_changed_manifest_restarts(self, manifest, tmp_path):
+        output_dir = tmp_path / "checks"
+        ImageCheckRun(str(manifest), str(output_dir), chunk_size=3, num_workers=1).run()
+
+        df = pd.read_csv(manifest)
+        df.head(4).to_csv(manifest, index=False)
+        checks = ImageCheckRun(str(manifest), str(output_dir), chunk_size=3, num_workers=1).run()
+
+        assert len(checks) == 4
+        assert sorted(os.listdir(output_dir)) == ["part-00000.csv", "part-00001.csv", PROGRESS_FILE]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
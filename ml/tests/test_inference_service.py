@@ -110,6 +110,106 @@ class TestModelManager:
             if "cv2" in str(e) or "numpy" in str(e):
                 pytest.skip("OpenCV/NumPy not installed")
             raise
+    
+    def test_mock_inference_is_deterministic(self):
+        np = pytest.importorskip("numpy")
+        pytest.importorskip("cv2")
+        from model_manager import CropModel
+        
+        model = CropModel("rice")
+        batch = np.random.default_rng(0).normal(size=(4, 3, 8, 8)).astype(np.float32)
+        
+        first = model._mock_inference(batch, seed=123)
+        second = model._mock_inference(batch, seed=123)
+        
+        assert first.shape == (4, model.num_classes)
+        assert np.array_equal(first, second)
+        assert not np.array_equal(first, model._mock_inference(batch, seed=124))
+    
+    def test_mock_inference_leaves_global_rng_untouched(self):
+        np = pytest.importorskip("numpy")
+        pytest.importorskip("cv2")
+        import random
+        from model_manager import CropModel
+        
+        random.seed(99)
+        np.random.seed(99)
+        expected = (random.random(), np.random.random())
+        
+        random.seed(99)
+        np.random.seed(99)
+        CropModel("wheat")._mock_inference(np.zeros((2, 3, 8, 8), dtype=np.float32))
+        
+        assert (random.random(), np.random.random()) == expected
+    
+    def test_mock_latency_model(self):
+        np = pytest.importorskip("numpy")
+        pytest.importorskip("cv2")
+        from model_manager import MockLatencyModel
+        
+        latency = MockLatencyModel.from_spec("base=10,per_item=5")
+        assert latency.enabled
+        assert latency.delay_seconds(4, np.random.default_rng(0)) == pytest.approx(0.030)
+        assert not MockLatencyModel.from_spec("").enabled
+        
+        with pytest.raises(ValueError):
+            MockLatencyModel.from_spec("warmup=3")
+
+    
+    def test_temperature_loaded_from_metadata(self, tmp_path):
+        pytest.importorskip("numpy")
+        pytest.importorskip("cv2")
+        import json
+        from model_manager import ModelManager, DEFAULT_TEMPERATURE
+        
+        crop_dir = tmp_path / "wheat"
+        crop_dir.mkdir()
+        (crop_dir / "model_metadata.json").write_text(json.dumps({"framework": "onnx", "temperature": 2.25}))
+        
+        manager = ModelManager(str(tmp_path))
+        assert manager.get_model("wheat").temperature == 2.25
+        assert manager.get_model("rice").temperature == DEFAULT_TEMPERATURE
+    
+    def test_warmup_sets_readiness(self, tmp_path):
+        pytest.importorskip("numpy")
+        pytest.importorskip("cv2")
+        from model_manager import ModelManager
+        
+        manager = ModelManager(str(tmp_path))
+        assert not manager.is_ready
+        assert manager.get_readiness()["warmup"]["state"] == "pending"
+        
+        status = manager.warmup_models(batch_sizes=(1, 4), iterations=1, crops=("rice",))
+        
+        assert manager.is_ready
+        assert status["state"] == "complete"
+        assert list(status["models"]) == ["rice"]
+        assert set(status["models"]["rice"]["batch_ms"]) == {"1", "4"}
+        assert manager.get_health_status()["warmup_duration_ms"] == status["duration_ms"]
+    
+    def test_progressive_tta_reports_augmentations_used(self):
+        np = pytest.importorskip("numpy")
+        cv2 = pytest.importorskip("cv2")
+        import time
+        from model_manager import CropModel
+        
+        image = np.random.default_rng(0).integers(0, 255, size=(64, 64, 3), dtype=np.uint8)
+        image_bytes = cv2.imencode(".png", image)[1].tobytes()
+        model = CropModel("rice")
+        
+        full = model.predict(image_bytes, use_tta=True, num_tta=5)
+        assert full["tta_augmentations_used"] == 5
+        
+        progressive = model.predict(image_bytes, use_tta=True, num_tta=5, early_exit=True)
+        assert progressive["success"]
+        assert 2 <= progressive["tta_augmentations_used"] <= 5
+        
+        exhaustive = model._predict_progressive_tta(
+            image_bytes, 5, model.temperature, time.time(), chunk_size=2, stability_margin=1.1
+        )
+        assert exhaustive["tta_augmentations_used"] == 5
+        assert sum(exhaustive["all_predictions"].values()) == pytest.approx(1.0, abs=1e-5)
+        assert exhaustive["disease_id"] == full["disease_id"]
 
 
 class TestPreprocessing:
@@ -121,6 +221,21 @@ class TestPreprocessing:
             if "cv2" in str(e) or "numpy" in str(e):
                 pytest.skip("OpenCV/NumPy not installed")
             raise
+    
+    def test_tta_chunks_match_full_batch(self):
+        np = pytest.importorskip("numpy")
+        cv2 = pytest.importorskip("cv2")
+        from preprocessing import decode_for_tta, tta_chunks, preprocess_batch_for_tta
+        
+        image = np.random.default_rng(1).integers(0, 255, size=(48, 64, 3), dtype=np.uint8)
+        image_bytes = cv2.imencode(".png", image)[1].tobytes()
+        
+        chunks = list(tta_chunks(decode_for_tta(image_bytes, (32, 32)), num_augmentations=5, chunk_size=2))
+        assert [chunk.shape[0] for chunk in chunks] == [2, 2, 1]
+        assert np.array_equal(
+            np.concatenate(chunks),
+            preprocess_batch_for_tta(image_bytes, target_size=(32, 32), num_augmentations=5)
+        )
 
 
 if __name__ == "__main__":
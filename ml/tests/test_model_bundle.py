@@ -0,0 +1,169 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+onnx = pytest.importorskip("onnx")
+ort = pytest.importorskip("onnxruntime")
+pytest.importorskip("cv2")
+
+from model_bundle import ModelBundle, BundleError, write_bundle, BUNDLE_FILENAME, TRAILER
+from onnx_weights import WEIGHT_ALIGNMENT
+from model_registry import ModelRegistry
+from conftest import write_model
+
+
+CLASS_MAPPING = {str(i): d for i, d in enumerate(["healthy", "blast", "brown_spot", "bacterial_blight"])}
+
+
+@pytest.fixture
+def batch():
+    return np.random.default_rng(1).standard_normal((2, 3, 16, 16)).astype(np.float32)
+
+
+@pytest.fixture
+def bundle_path(tmp_path):
+    onnx_path = tmp_path / "source.onnx"
+    write_model(onnx_path)
+    path = tmp_path / BUNDLE_FILENAME
+    write_bundle(str(path), str(onnx_path), {"img_size": 16, "temperature": 1.2}, CLASS_MAPPING)
+    return path
+
+
+def corrupt(path, section):
+    with ModelBundle(str(path), verify="none") as bundle:
+        offset = bundle.header["sections"][section]["offset"] + 1
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+
+class TestModelBundle:
+    def test_round_trip(self, bundle_path, batch):
+        expected = ort.InferenceSession(str(bundle_path.parent / "source.onnx")).run(None, {"input": batch})[0]
+
+        with ModelBundle(str(bundle_path), verify="full") as bundle:
+            assert bundle.metadata == {"img_size": 16, "temperature": 1.2}
+            assert bundle.class_mapping == CLASS_MAPPING
+            assert bundle.header["sections"]["weights"]["offset"] % WEIGHT_ALIGNMENT == 0
+            session, mapped = bundle.create_session()
+
+        assert mapped
+        np.testing.assert_allclose(session.run(None, {"input": batch})[0], expected, rtol=1e-5, atol=1e-6)
+
+    def test_weight_offsets_are_aligned(self, bundle_path):
+        with ModelBundle(str(bundle_path)) as bundle:
+            model = onnx.load_model_from_string(bundle.graph_bytes())
+
+        offsets = [
+            int(entry.value)
+            for tensor in model.graph.initializer
+            for entry in tensor.external_data
+            if entry.key == "offset"
+        ]
+        assert len(offsets) == 2
+        assert all(offset % WEIGHT_ALIGNMENT == 0 for offset in offsets)
+
+    def test_renamed_bundle_still_loads(self, bundle_path, batch):
+        renamed = bundle_path.parent / "renamed.bundle"
+        bundle_path.rename(renamed)
+
+        with ModelBundle(str(renamed)) as bundle:
+            session, _ = bundle.create_session()
+        assert session.run(None, {"input": batch})[0].shape == (2, 4)
+
+    def test_fast_verify_skips_weights(self, bundle_path):
+        corrupt(bundle_path, "weights")
+
+        ModelBundle(str(bundle_path), verify="fast").close()
+        with pytest.raises(BundleError, match="weights"):
+            ModelBundle(str(bundle_path), verify="full")
+
+    def test_corrupt_graph_rejected(self, bundle_path):
+        corrupt(bundle_path, "graph")
+
+        with pytest.raises(BundleError, match="graph"):
+            ModelBundle(str(bundle_path))
+
+    def test_truncated_file_rejected(self, bundle_path):
+        data = bundle_path.read_bytes()
+        bundle_path.write_bytes(data[:-TRAILER.size // 2])
+
+        with pytest.raises(BundleError):
+            ModelBundle(str(bundle_path))
+
+
+class TestBundleServing:
+    def test_manager_loads_bundle_version(self, tmp_path, batch, monkeypatch):
+        import model_manager
+        from model_manager import ModelManager
+
+        monkeypatch.setattr(model_manager, "ONNX_MMAP_WEIGHTS", True)
+
+        version_dir = tmp_path / "models" / "rice" / "v1"
+        version_dir.mkdir(parents=True)
+        write_model(tmp_path / "source.onnx")
+        write_bundle(str(version_dir / BUNDLE_FILENAME), str(tmp_path / "source.onnx"), {"img_size": 16}, CLASS_MAPPING)
+        ModelRegistry(str(tmp_path / "models")).activate("rice", "v1")
+
+        manager = ModelManager(str(tmp_path / "models"))
+        model = manager.models["rice"]
+
+        assert model.is_loaded and model.model_type == "bundle"
+        assert model.version == "v1"
+        assert model.weights_mmapped
+        assert model.img_size == 16
+        assert model.label_list == list(CLASS_MAPPING.values())
+        assert model._run_inference(batch).shape == (2, 4)
+        assert manager.get_model_info("rice")["bundle"]["format_version"] == 1
+
+    def test_staging_rejects_corrupt_weights(self, tmp_path):
+        from model_manager import ModelManager
+
+        crop_dir = tmp_path / "models" / "rice"
+        version_dir = crop_dir / "v2"
+        version_dir.mkdir(parents=True)
+        write_model(tmp_path / "source.onnx")
+        write_bundle(str(version_dir / BUNDLE_FILENAME), str(tmp_path / "source.onnx"), {"img_size": 16}, CLASS_MAPPING)
+        corrupt(version_dir / BUNDLE_FILENAME, "weights")
+
+        manager = ModelManager(str(tmp_path / "models"))
+        manager.stage_model_version("rice", "v2")
+        deployment = manager.wait_for_deployment("rice", timeout=30)
+
+        assert deployment["status"] == "failed"
+        assert manager.models["rice"].version is None
+
+
+
+class TestBundleExport:
+    def test_class_mapping_must_cover_every_output(self, tmp_path):
+        pytest.importorskip("torch")
+        pytest.importorskip("timm")
+        pytest.importorskip("mlflow")
+        pytest.importorskip("albumentations")
+        from train import load_class_mapping
+
+        path = tmp_path / "classes.json"
+        path.write_text('{"0": "healthy", "1": "blast"}')
+        assert load_class_mapping(str(path), 2) == {"0": "healthy", "1": "blast"}
+        with pytest.raises(ValueError):
+            load_class_mapping(str(path), 3)
+
+    def test_export_refuses_bundle_without_class_mapping(self, tmp_path):
+        torch = pytest.importorskip("torch")
+        pytest.importorskip("timm")
+        pytest.importorskip("mlflow")
+        pytest.importorskip("albumentations")
+        from train import export_model
+
+        with pytest.raises(ValueError, match="class mapping"):
+            export_model(torch.nn.Linear(4, 2), str(tmp_path), "m", bundle=True)
+        assert not os.listdir(tmp_path)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,182 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from model_registry import ModelRegistry
+from model_manager import ModelManager
+from disease_database import get_disease_class_labels
+from conftest import make_version
+
+
+class TestModelRegistry:
+    def test_lists_only_version_directories(self, tmp_path):
+        registry = ModelRegistry(str(tmp_path))
+        (tmp_path / "rice" / "v1").mkdir(parents=True)
+        (tmp_path / "rice" / "v1" / "model_metadata.json").write_text("{}")
+        (tmp_path / "rice" / "large").mkdir()
+        (tmp_path / "rice" / "large" / "model.onnx").write_text("")
+        (tmp_path / "rice" / "empty").mkdir()
+
+        assert registry.list_versions("rice") == ["v1"]
+        assert registry.list_versions("wheat") == []
+
+    def test_activate_and_rollback_history(self, tmp_path):
+        registry = ModelRegistry(str(tmp_path))
+
+        registry.activate("rice", "v1")
+        registry.activate("rice", "v2")
+        assert registry.active_version("rice") == "v2"
+        assert registry.previous_version("rice") == "v1"
+
+        registry.activate("rice", "v1", rollback=True)
+        state = registry.get_state("rice")
+        assert state["active"] == "v1"
+        assert state["history"] == []
+
+    def test_rejects_unsafe_version_names(self, tmp_path):
+        registry = ModelRegistry(str(tmp_path))
+        for version in ("", "../v1", ".hidden", "large"):
+            with pytest.raises(ValueError):
+                registry.version_dir("rice", version)
+
+
+class TestHotSwap:
+    def test_stage_swap_and_rollback(self, tmp_path, image_bytes):
+        make_version(tmp_path, "rice", "v1", bias_class=0)
+        make_version(tmp_path, "rice", "v2", bias_class=1)
+        ModelRegistry(str(tmp_path)).activate("rice", "v1")
+
+        manager = ModelManager(str(tmp_path))
+        v1_model = manager.get_model("rice")
+        assert v1_model.version == "v1"
+        assert manager.default_model is v1_model
+        labels = get_disease_class_labels("rice")
+        assert manager.predict("rice", image_bytes)["disease_id"] == labels["0"]
+
+        manager.stage_model_version("rice", "v2")
+        deployment = manager.wait_for_deployment("rice", timeout=30)
+        assert deployment["status"] == "active"
+        assert deployment["drained"]
+        assert not v1_model.is_loaded
+        assert manager.default_model.version == "v2"
+        assert manager.predict("rice", image_bytes)["disease_id"] == labels["1"]
+
+        manager.rollback_model("rice")
+        manager.wait_for_deployment("rice", timeout=30)
+        status = manager.get_deployment_status("rice")
+        assert status["serving_version"] == "v1"
+        assert status["active_version"] == "v1"
+        assert status["history"] == []
+
+        with pytest.raises(ValueError):
+            manager.rollback_model("rice")
+
+    def test_failed_stage_keeps_serving_model(self, tmp_path):
+        make_version(tmp_path, "rice", "v1", bias_class=0)
+        broken = tmp_path / "rice" / "v2"
+        broken.mkdir()
+        (broken / "model.onnx").write_bytes(b"not an onnx model")
+        ModelRegistry(str(tmp_path)).activate("rice", "v1")
+
+        manager = ModelManager(str(tmp_path))
+        manager.stage_model_version("rice", "v2")
+        deployment = manager.wait_for_deployment("rice", timeout=30)
+
+        assert deployment["status"] == "failed"
+        assert manager.get_model("rice").version == "v1"
+        assert manager.registry.active_version("rice") == "v1"
+
+    def test_swap_waits_for_in_flight_requests(self, tmp_path):
+        make_version(tmp_path, "rice", "v1", bias_class=0)
+        make_version(tmp_path, "rice", "v2", bias_class=1)
+        ModelRegistry(str(tmp_path)).activate("rice", "v1")
+
+        manager = ModelManager(str(tmp_path))
+        with manager._serving_model("rice") as old_model:
+            manager.stage_model_version("rice", "v2")
+            manager._deploy_threads["rice"].join(timeout=0.5)
+            assert manager.get_model("rice").version == "v2"
+            assert old_model.is_loaded
+
+        manager.wait_for_deployment("rice", timeout=30)
+        assert not old_model.is_loaded
+
+    def test_startup_warmup_covers_loaded_models(self, tmp_path):
+        make_version(tmp_path, "rice", "v1", bias_class=0)
+        ModelRegistry(str(tmp_path)).activate("rice", "v1")
+
+        manager = ModelManager(str(tmp_path))
+        manager.start_warmup()
+        assert manager.wait_until_ready(timeout=30)
+        assert list(manager.warmup_status["models"]) == ["rice"]
+
+
+class TestExperiments:
+    @pytest.fixture
+    def manager(self, tmp_path):
+        make_version(tmp_path, "rice", "v1", bias_class=0)
+        make_version(tmp_path, "rice", "v2", bias_class=1)
+        ModelRegistry(str(tmp_path)).activate("rice", "v1")
+        return ModelManager(str(tmp_path))
+
+    def images(self, count):
+        rng = np.random.default_rng(1)
+        return [
+            cv2.imencode(".png", rng.integers(0, 255, size=(32, 32, 3), dtype=np.uint8))[1].tobytes()
+            for _ in range(count)
+        ]
+
+    def test_shadow_compares_without_changing_responses(self, manager):
+        manager.start_experiment("rice", "v2", "shadow", 100)
+        labels = get_disease_class_labels("rice")
+
+        for image in self.images(5):
+            result = manager.predict("rice", image)
+            assert result["disease_id"] == labels["0"]
+            assert result["model_info"]["model_version"] == "v1"
+
+        manager.shadow_runner.shutdown()
+        report = manager.stop_experiment("rice")
+        metrics = report["metrics"]
+
+        assert report["primary_version"] == "v1"
+        assert metrics["compared"] + metrics["dropped"] == 5
+        assert metrics["agreement_rate"] == 0.0
+        assert metrics["arms"]["candidate"]["latency_ms"]["count"] == metrics["compared"]
+        assert manager.get_experiment_report("rice") is None
+
+    def test_canary_serves_sampled_requests(self, manager):
+        manager.start_experiment("rice", "v2", "canary", 50)
+        images = self.images(40)
+        experiment = manager.experiments["rice"]
+
+        versions = [manager.predict("rice", image)["model_info"]["model_version"] for image in images]
+        expected = ["v2" if experiment.selects(image) else "v1" for image in images]
+        assert versions == expected
+
+        arms = manager.get_experiment_report("rice")["metrics"]["arms"]
+        assert arms["candidate"]["requests"] == expected.count("v2")
+        assert arms["primary"]["requests"] == expected.count("v1")
+
+        candidate = experiment.model
+        manager.stop_experiment("rice")
+        assert not candidate.is_loaded
+        assert manager.predict("rice", images[0])["model_info"]["model_version"] == "v1"
+
+    def test_rejects_unknown_mode_and_duplicates(self, manager):
+        with pytest.raises(ValueError):
+            manager.start_experiment("rice", "v2", "blue-green", 10)
+
+        manager.start_experiment("rice", "v2", "shadow", 10)
+        with pytest.raises(RuntimeError):
+            manager.start_experiment("rice", "v2", "canary", 10)
+        manager.stop_experiment("rice")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,95 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+onnx = pytest.importorskip("onnx")
+ort = pytest.importorskip("onnxruntime")
+pytest.importorskip("cv2")
+
+from onnx import TensorProto
+from onnx_weights import save_with_external_data, uses_external_data, WEIGHT_ALIGNMENT
+from conftest import write_model
+
+
+@pytest.fixture
+def batch():
+    return np.random.default_rng(1).standard_normal((2, 3, 16, 16)).astype(np.float32)
+
+
+class TestExternalData:
+    def test_weights_are_page_aligned(self, tmp_path):
+        path = tmp_path / "model.onnx"
+        write_model(path)
+        assert not uses_external_data(str(path))
+
+        info = save_with_external_data(str(path))
+
+        assert info["external_tensors"] == 2
+        assert os.path.exists(tmp_path / "model.onnx.data")
+        assert uses_external_data(str(path))
+
+        model = onnx.load(str(path), load_external_data=False)
+        offsets = [
+            int(entry.value)
+            for tensor in model.graph.initializer
+            for entry in tensor.external_data
+            if entry.key == "offset"
+        ]
+        assert offsets and all(offset % WEIGHT_ALIGNMENT == 0 for offset in offsets)
+        # The bias is under the size threshold and stays inline
+        assert [t.name for t in model.graph.initializer if t.data_location != TensorProto.EXTERNAL] == ["bias"]
+
+    def test_outputs_unchanged(self, tmp_path, batch):
+        path = tmp_path / "model.onnx"
+        write_model(path)
+        expected = ort.InferenceSession(str(path)).run(None, {"input": batch})[0]
+
+        save_with_external_data(str(path))
+        actual = ort.InferenceSession(str(path)).run(None, {"input": batch})[0]
+
+        np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-6)
+
+    def test_rewrite_replaces_existing_external_file(self, tmp_path):
+        path = tmp_path / "model.onnx"
+        write_model(path)
+        model = onnx.load(str(path))
+        onnx.save(model, str(path), save_as_external_data=True, location="exporter_weights.bin", size_threshold=0)
+
+        save_with_external_data(str(path))
+
+        assert not (tmp_path / "exporter_weights.bin").exists()
+        assert (tmp_path / "model.onnx.data").exists()
+
+    def test_crop_model_maps_external_weights(self, tmp_path, batch, monkeypatch):
+        import model_manager
+        from model_manager import CropModel
+
+        path = tmp_path / "model.onnx"
+        write_model(path)
+        save_with_external_data(str(path))
+        labels = {str(i): f"c{i}" for i in range(4)}
+
+        # Default (auto) in a serving process: full graph optimization and prepacking
+        monkeypatch.setattr(model_manager, "ONNX_MMAP_WEIGHTS", None)
+        model = CropModel("rice", model_path=str(path), class_labels=labels, img_size=16)
+        assert model.is_loaded
+        assert not model.weights_mmapped
+        expected = model._run_inference(batch)
+
+        # Default (auto) in an inference worker: mapped weights
+        model = CropModel("rice", model_path=str(path), class_labels=labels, img_size=16, mmap_weights=True)
+        assert model.is_loaded
+        assert model.weights_mmapped
+        np.testing.assert_allclose(model._run_inference(batch), expected, rtol=1e-5, atol=1e-6)
+
+        monkeypatch.setattr(model_manager, "ONNX_MMAP_WEIGHTS", False)
+        assert not CropModel("rice", model_path=str(path), class_labels=labels, mmap_weights=True).weights_mmapped
+        monkeypatch.setattr(model_manager, "ONNX_MMAP_WEIGHTS", True)
+        assert CropModel("rice", model_path=str(path), class_labels=labels).weights_mmapped
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
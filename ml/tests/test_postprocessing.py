@@ -0,0 +1,73 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+
+from postprocessing import (
+    softmax,
+    temperature_softmax,
+    top_k,
+    postprocess_batch,
+    LazyClassProbabilities
+)
+
+
+class TestPostprocessing:
+    def test_top_k_matches_argsort(self):
+        probs = softmax(np.random.default_rng(0).normal(size=(16, 12)))
+        indices, values = top_k(probs, 3)
+
+        expected = np.argsort(probs, axis=-1)[:, ::-1][:, :3]
+        assert np.array_equal(indices, expected)
+        assert np.allclose(values, np.take_along_axis(probs, expected, axis=-1))
+
+    def test_top_k_with_k_larger_than_classes(self):
+        indices, values = top_k(np.array([0.2, 0.5, 0.3]), 5)
+        assert indices.tolist() == [[1, 2, 0]]
+
+    def test_temperature_flattens_distribution(self):
+        logits = np.array([[3.0, 1.0, 0.0]])
+        assert temperature_softmax(logits, 2.0).max() < softmax(logits).max()
+
+    def test_postprocess_batch_groups_tta_rows(self):
+        logits = np.random.default_rng(1).normal(size=(10, 4))
+        batch = postprocess_batch(logits, group_size=5)
+
+        assert batch["probabilities"].shape == (2, 4)
+        expected = softmax(logits[:5]).mean(axis=0)
+        assert np.allclose(batch["probabilities"][0], expected, atol=1e-6)
+        assert batch["class_ids"][0] == int(np.argmax(expected))
+
+    def test_lazy_class_probabilities(self):
+        lazy = LazyClassProbabilities(np.array([0.25, 0.75]), ["healthy", "blight"])
+        assert len(lazy) == 2
+        assert lazy._materialized is None
+        assert dict(lazy) == {"healthy": 0.25, "blight": 0.75}
+
+
+class TestBatchPrediction:
+    def test_predict_batch_matches_single_predictions(self):
+        cv2 = pytest.importorskip("cv2")
+        from model_manager import CropModel
+
+        rng = np.random.default_rng(0)
+        images = []
+        for _ in range(3):
+            ok, encoded = cv2.imencode(".png", rng.integers(0, 255, size=(64, 64, 3), dtype=np.uint8))
+            images.append(encoded.tobytes())
+
+        model = CropModel("rice")
+        batch_results = model.predict_batch(images + [b"not an image"])
+
+        assert batch_results[-1]["success"] is False
+        for image_bytes, batched in zip(images, batch_results):
+            single = model.predict(image_bytes)
+            assert batched["disease_id"] == single["disease_id"]
+            assert batched["confidence"] == pytest.approx(single["confidence"], rel=1e-5)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,152 @@
+import pytest
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tracing
+from tracing import (
+    span,
+    traced,
+    configure_tracing,
+    trace_file_path,
+    get_collector,
+    SamplingProfiler,
+    format_collapsed_stacks
+)
+
+
+@pytest.fixture
+def memory_tracing():
+    get_collector().clear()
+    configure_tracing(True, exporter="memory")
+    yield get_collector()
+    configure_tracing(False, exporter="memory")
+    get_collector().clear()
+
+
+class TestTracing:
+    def test_disabled_span_is_noop(self):
+        configure_tracing(False)
+        get_collector().clear()
+
+        with span("noop") as s:
+            s.set_attribute("key", "value")
+
+        assert span("other") is tracing._NOOP_SPAN
+        assert get_collector().get_spans() == []
+
+    def test_nested_spans_share_trace(self, memory_tracing):
+        with span("parent", crop_type="rice"):
+            with span("child"):
+                pass
+
+        child, parent = memory_tracing.get_spans()
+        assert parent["name"] == "parent"
+        assert parent["attributes"]["crop_type"] == "rice"
+        assert parent["parent_span_id"] is None
+        assert child["trace_id"] == parent["trace_id"]
+        assert child["parent_span_id"] == parent["span_id"]
+        assert child["end_time_unix_nano"] >= child["start_time_unix_nano"]
+
+    def test_traced_records_errors(self, memory_tracing):
+        @traced("failing")
+        def failing():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            failing()
+
+        (record,) = memory_tracing.get_spans()
+        assert record["status"] == "ERROR"
+        assert record["attributes"]["exception.type"] == "ValueError"
+
+    def test_file_exporter(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        configure_tracing(True, exporter="file", file_path=str(path))
+        try:
+            with span("to_file"):
+                pass
+        finally:
+            configure_tracing(False)
+
+        assert '"name": "to_file"' in path.read_text()
+
+
+    @pytest.mark.parametrize("file_name", ["../escape.jsonl", "/etc/passwd", "sub/traces.jsonl", "", ".."])
+    def test_trace_file_must_stay_in_trace_dir(self, tmp_path, file_name):
+        with pytest.raises(ValueError):
+            trace_file_path(file_name, str(tmp_path / "traces"))
+
+    def test_trace_file_path_resolves_inside_trace_dir(self, tmp_path):
+        path = trace_file_path("run1.jsonl", str(tmp_path / "traces"))
+        assert path == os.path.realpath(tmp_path / "traces" / "run1.jsonl")
+        assert (tmp_path / "traces").is_dir()
+
+
+class TestAdminEndpoints:
+    @pytest.fixture
+    def client(self):
+        pytest.importorskip("httpx")
+        from fastapi.testclient import TestClient
+        import inference_service
+
+        return TestClient(inference_service.app)
+
+    def test_admin_disabled_without_token(self, client, monkeypatch):
+        monkeypatch.delenv("ML_ADMIN_TOKEN", raising=False)
+        assert client.get("/admin/traces").status_code == 503
+        assert client.get("/admin/traces", headers={"X-Admin-Token": ""}).status_code == 503
+
+    def test_admin_requires_matching_token(self, client, monkeypatch):
+        monkeypatch.setenv("ML_ADMIN_TOKEN", "secret")
+        assert client.get("/admin/traces").status_code == 401
+        assert client.get("/admin/traces", headers={"X-Admin-Token": "wrong"}).status_code == 401
+        assert client.get("/admin/traces", headers={"X-Admin-Token": "secret"}).status_code == 200
+
+    def test_tracing_file_name_cannot_escape_trace_dir(self, client, monkeypatch, tmp_path):
+        import tracing
+
+        monkeypatch.setenv("ML_ADMIN_TOKEN", "secret")
+        monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path / "traces"))
+        headers = {"X-Admin-Token": "secret"}
+
+        params = {"enabled": False, "exporter": "file", "file_name": "../outside.jsonl"}
+        assert client.post("/admin/tracing", params=params, headers=headers).status_code == 400
+        assert not (tmp_path / "outside.jsonl").exists()
+
+        params["file_name"] = "run1.jsonl"
+        response = client.post("/admin/tracing", params=params, headers=headers)
+        configure_tracing(False)
+        assert response.status_code == 200
+        assert response.json()["file_path"] == os.path.realpath(tmp_path / "traces" / "run1.jsonl")
+
+
+class TestSamplingProfiler:
+    def test_collapsed_stacks(self):
+        stop = threading.Event()
+
+        def busy_worker():
+            while not stop.is_set():
+                sum(range(1000))
+
+        worker = threading.Thread(target=busy_worker)
+        worker.start()
+        try:
+            stacks = SamplingProfiler(interval=0.001).profile(0.05)
+        finally:
+            stop.set()
+            worker.join()
+
+        assert any("busy_worker" in stack for stack in stacks)
+
+        output = format_collapsed_stacks(stacks)
+        for line in output.strip().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            assert int(count) > 0
+            assert stack
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
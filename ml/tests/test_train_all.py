@@ -0,0 +1,148 @@
+import pytest
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("cv2")
+
+import train_all
+from train_all import discover_manifests, count_classes, plan_concurrency, train_all as run_train_all
+from model_manager import ModelManager
+from model_registry import ModelRegistry
+
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Stands in for train.py: exports a small bundle and writes the summary,
+# or fails for manifests named fail.csv
+FAKE_TRAIN = f"""
+import sys, os, json, argparse
+sys.path.insert(0, {os.path.dirname(TESTS_DIR)!r})
+sys.path.insert(0, {TESTS_DIR!r})
+from model_bundle import write_bundle
+from conftest import write_model
+
+p = argparse.ArgumentParser()
+p.add_argument('--manifest'); p.add_argument('--output-dir'); p.add_argument('--num-classes', type=int)
+p.add_argument('--class-mapping', default=None); p.add_argument('--epochs', type=int, default=10)
+p.add_argument('--num-workers', type=int, default=4)
+args, _ = p.parse_known_args()
+if args.manifest.endswith('fail.csv'):
+    sys.exit(3)
+
+export_dir = os.path.join(args.output_dir, 'exported')
+os.makedirs(export_dir)
+write_model(os.path.join(export_dir, 'm.onnx'))
+mapping = json.load(open(args.class_mapping)) if args.class_mapping else None
+write_bundle(os.path.join(export_dir, 'm.bundle'), os.path.join(export_dir, 'm.onnx'), {{'img_size': 16}}, mapping)
+json.dump({{'final_val_accuracy': 0.9, 'final_val_f1': 0.8, 'train_seconds': 1.5, 'epochs': args.epochs,
+           'threads': os.environ['OMP_NUM_THREADS'], 'num_workers': args.num_workers, 'exported': {{'bundle': os.path.join(export_dir, 'm.bundle')}}}},
+          open(os.path.join(args.output_dir, 'training_summary.json'), 'w'))
+"""
+
+
+def write_manifest(path, labels):
+    pd.DataFrame({"image_path": [f"{i}.jpg" for i in range(len(labels))], "label": labels}).to_csv(path, index=False)
+
+
+@pytest.fixture
+def manifests_dir(tmp_path):
+    root = tmp_path / "manifests"
+    root.mkdir()
+    write_manifest(root / "rice.csv", [0, 1, 2, 1])
+    (root / "rice.classes.json").write_text(json.dumps({"0": "healthy", "1": "blast", "2": "brown_spot"}))
+    (root / "wheat").mkdir()
+    write_manifest(root / "wheat" / "manifest.csv", [0, 3])
+    write_manifest(root / "cactus.csv", [0, 1])
+    return root
+
+
+class TestPlanning:
+    def test_discover_manifests(self, manifests_dir):
+        jobs = discover_manifests(str(manifests_dir))
+
+        assert sorted(jobs) == ["rice", "wheat"]
+        assert jobs["rice"]["class_mapping"].endswith("rice.classes.json")
+        assert jobs["wheat"]["class_mapping"] is None
+
+    def test_count_classes(self, manifests_dir):
+        assert count_classes(str(manifests_dir / "wheat" / "manifest.csv")) == 4
+        assert count_classes(str(manifests_dir / "rice.csv"), str(manifests_dir / "rice.classes.json")) == 3
+
+    @pytest.mark.parametrize("num_jobs,threads,cpus,mem_per_job,mem_budget,expected", [
+        (20, 2, 16, 4, None, 8),
+        (20, 2, 16, 4, 13, 3),
+        (2, 2, 16, 4, 64, 2),
+        (5, 8, 4, 4, 1, 1),
+    ])
+    def test_plan_concurrency(self, num_jobs, threads, cpus, mem_per_job, mem_budget, expected):
+        assert plan_concurrency(num_jobs, threads, cpus, mem_per_job, mem_budget) == expected
+
+    @pytest.mark.parametrize("loader_workers,mem_per_worker,mem_budget,expected", [
+        (2, 0.5, None, 4),
+        (2, 0.5, 13, 2),
+        (0, 0.5, 13, 3),
+    ])
+    def test_plan_concurrency_counts_loader_workers(self, loader_workers, mem_per_worker, mem_budget, expected):
+        assert plan_concurrency(20, 2, 16, 4, mem_budget, loader_workers, mem_per_worker) == expected
+
+
+class TestTrainAll:
+    def test_trains_and_installs_versions(self, manifests_dir, tmp_path, monkeypatch):
+        fake = tmp_path / "fake_train.py"
+        fake.write_text(FAKE_TRAIN)
+        monkeypatch.setattr(train_all, "TRAIN_SCRIPT", str(fake))
+        models_dir = tmp_path / "models"
+
+        rows = run_train_all(
+            str(manifests_dir), str(models_dir), str(tmp_path / "work"), cpu_budget=4, threads_per_job=2,
+            memory_budget_gb=None, train_args=["--epochs", "1", "--no-pretrained"]
+        )
+
+        assert [(row["crop"], row["status"]) for row in rows] == [("rice", "deployed"), ("wheat", "failed")]
+        assert rows[0]["activated"] and rows[0]["threads"] == "2" and rows[0]["epochs"] == 1
+        assert rows[0]["num_workers"] == 1
+        # Without a class mapping the bundle would be labelled in disease-database order
+        assert "No class mapping" in rows[1]["error"]
+        assert not (tmp_path / "work" / "wheat").exists()
+        assert (tmp_path / "work" / "summary.csv").exists()
+
+        version = rows[0]["version"]
+        registry = ModelRegistry(str(models_dir))
+        assert registry.active_version("rice") == version
+        assert (models_dir / "rice" / version / "class_mapping.json").exists()
+
+        manager = ModelManager(str(models_dir))
+        assert manager.models["rice"].model_type == "bundle"
+        assert manager.models["rice"].version == version
+        assert manager.models["rice"].label_list[:3] == ["healthy", "blast", "brown_spot"]
+
+    def test_failed_job_reported(self, manifests_dir, tmp_path, monkeypatch):
+        fake = tmp_path / "fake_train.py"
+        fake.write_text(FAKE_TRAIN)
+        monkeypatch.setattr(train_all, "TRAIN_SCRIPT", str(fake))
+        monkeypatch.setattr(train_all, "discover_manifests", lambda d: {
+            "maize": {"manifest": str(manifests_dir / "fail.csv"), "class_mapping": str(manifests_dir / "rice.classes.json")}
+        })
+        write_manifest(manifests_dir / "fail.csv", [0, 1])
+
+        rows = run_train_all(str(manifests_dir), str(tmp_path / "models"), str(tmp_path / "work"),
+                             train_args=["--no-pretrained"])
+
+        assert rows[0]["status"] == "failed"
+        assert "exited with 3" in rows[0]["error"]
+        assert ModelRegistry(str(tmp_path / "models")).active_version("maize") is None
+
+    def test_num_workers_comes_from_the_plan(self, manifests_dir, tmp_path):
+        with pytest.raises(ValueError, match="loader_workers_per_job"):
+            run_train_all(str(manifests_dir), str(tmp_path / "models"), str(tmp_path / "work"),
+                          train_args=["--num-workers", "4"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,109 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+sklearn_metrics = pytest.importorskip("sklearn.metrics")
+pytest.importorskip("matplotlib")
+
+from utils import fit_temperature, negative_log_likelihood, expected_calibration_error, evaluate
+
+
+def sample_overconfident_logits(true_temperature: float, n: int = 5000, num_classes: int = 6, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    logits = rng.normal(0, 3, size=(n, num_classes))
+    scaled = logits / true_temperature
+    probs = np.exp(scaled - scaled.max(axis=1, keepdims=True))
+    probs /= probs.sum(axis=1, keepdims=True)
+    labels = (probs.cumsum(axis=1) > rng.random((n, 1))).argmax(axis=1)
+    return logits, labels
+
+
+class TestTemperatureScaling:
+    def test_fit_temperature_recovers_true_temperature(self):
+        logits, labels = sample_overconfident_logits(2.0)
+        temperature = fit_temperature(logits, labels)
+        assert temperature == pytest.approx(2.0, rel=0.1)
+
+    def test_fitted_temperature_lowers_nll(self):
+        logits, labels = sample_overconfident_logits(2.5, seed=1)
+        temperature = fit_temperature(logits, labels)
+        assert negative_log_likelihood(logits, labels, temperature) < negative_log_likelihood(logits, labels)
+
+    def test_expected_calibration_error(self):
+        probs = np.array([[0.9, 0.1], [0.9, 0.1], [0.6, 0.4], [0.6, 0.4]])
+        labels = np.array([0, 0, 0, 1])
+        assert expected_calibration_error(probs, labels, n_bins=10) == pytest.approx(0.1)
+
+    def test_calibration_report_lowers_ece(self):
+        for module in ("timm", "mlflow", "albumentations"):
+            pytest.importorskip(module)
+        from train import fit_calibration_report
+        from postprocessing import softmax
+
+        logits, labels = sample_overconfident_logits(2.0, seed=2)
+        temperature = fit_temperature(logits, labels)
+        report = fit_calibration_report({"logits": logits, "labels": labels, "probabilities": softmax(logits)},
+                                        temperature)
+
+        assert report["val_ece_calibrated"] < report["val_ece"]
+        assert report["val_nll_calibrated"] < report["val_nll"]
+
+
+class FixedLogits(torch.nn.Module):
+    # Returns the logits stored for each sample index passed as input
+    def __init__(self, logits):
+        super().__init__()
+        self.logits = torch.as_tensor(logits, dtype=torch.float32)
+
+    def forward(self, idx):
+        return self.logits[idx.long()]
+
+
+def make_loader(n=103, num_classes=5, seed=0):
+    rng = np.random.default_rng(seed)
+    logits = rng.normal(0, 2, size=(n, num_classes))
+    labels = rng.integers(0, num_classes, size=n)
+    dataset = torch.utils.data.TensorDataset(torch.arange(n), torch.as_tensor(labels))
+    return FixedLogits(logits), torch.utils.data.DataLoader(dataset, batch_size=16), logits, labels
+
+
+class TestEvaluate:
+    def test_matches_sklearn(self):
+        model, loader, logits, labels = make_loader()
+        metrics = evaluate(model, loader, keep_logits=True)
+        preds = logits.argmax(axis=1)
+        precision, recall, f1, _ = sklearn_metrics.precision_recall_fscore_support(
+            labels, preds, average='weighted', zero_division=0
+        )
+
+        assert metrics['accuracy'] == pytest.approx(sklearn_metrics.accuracy_score(labels, preds))
+        assert (metrics['precision'], metrics['recall'], metrics['f1']) == pytest.approx((precision, recall, f1))
+        np.testing.assert_array_equal(metrics['confusion_matrix'], sklearn_metrics.confusion_matrix(labels, preds))
+        np.testing.assert_array_equal(metrics['predictions'], preds)
+        np.testing.assert_array_equal(metrics['labels'], labels)
+        np.testing.assert_allclose(metrics['logits'], logits, rtol=1e-6)
+        np.testing.assert_allclose(metrics['probabilities'].sum(axis=1), 1.0, rtol=1e-5)
+
+    def test_absent_classes_get_zero_rows(self):
+        model, loader, _, _ = make_loader(n=20, num_classes=8, seed=1)
+        metrics = evaluate(model, loader, keep_probabilities=False)
+
+        assert metrics['confusion_matrix'].shape == (8, 8)
+        assert metrics['confusion_matrix'].sum() == 20
+        assert metrics['probabilities'] is None
+        assert metrics['logits'] is None
+
+    def test_loader_without_length(self):
+        model, loader, logits, _ = make_loader(n=50)
+        metrics = evaluate(model, list(loader), keep_logits=True)
+
+        assert len(metrics['predictions']) == 50
+        np.testing.assert_allclose(metrics['logits'], logits, rtol=1e-6)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,144 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from worker_pool import InferenceWorkerPool, preload_model_files
+from conftest import write_model
+
+
+def mapped_file_kb(pid, path):
+    """Rss and Pss (kB) of the mappings of path in a process"""
+    totals = {"Rss": 0, "Pss": 0}
+    in_file = False
+    with open(f"/proc/{pid}/smaps") as f:
+        for line in f:
+            fields = line.split()
+            if "-" in fields[0] and len(fields) >= 5:
+                in_file = line.rstrip().endswith(path)
+            elif in_file and fields[0].rstrip(":") in totals:
+                totals[fields[0].rstrip(":")] += int(fields[1])
+    return totals
+
+
+@pytest.fixture(scope="module")
+def pool(tmp_path_factory):
+    pool = InferenceWorkerPool(str(tmp_path_factory.mktemp("models")), num_workers=1, warmup=False)
+    pool.start()
+    assert pool.wait_until_ready(timeout=120)
+    yield pool
+    pool.shutdown()
+
+
+class TestWorkerPool:
+    def test_preload_counts_model_files_only(self, tmp_path):
+        (tmp_path / "rice").mkdir()
+        (tmp_path / "rice" / "model.onnx").write_bytes(b"x" * 100)
+        (tmp_path / "rice" / "model.onnx.data").write_bytes(b"x" * 4096)
+        (tmp_path / "rice" / "class_mapping.json").write_text("{}")
+
+        assert preload_model_files(str(tmp_path)) == 4196
+
+    def test_prediction_matches_in_process_manager(self, pool, image_bytes):
+        from model_manager import ModelManager
+
+        result = pool.predict(crop_type="rice", image_bytes=image_bytes)
+        expected = ModelManager(pool.models_dir).predict("rice", image_bytes)
+
+        assert result["success"]
+        assert result["disease_id"] == expected["disease_id"]
+        assert result["confidence"] == pytest.approx(expected["confidence"])
+        assert "all_predictions" not in result
+
+        with_all = pool.predict(include_all_predictions=True, crop_type="rice", image_bytes=image_bytes)
+        assert isinstance(with_all["all_predictions"], dict)
+
+    def test_batch_predict_and_status(self, pool, image_bytes):
+        results = pool.submit(
+            "batch_predict",
+            predictions_request=[("rice", image_bytes), ("wheat", image_bytes)]
+        ).result(timeout=30)
+
+        assert [r["crop_type"] for r in results] == ["rice", "wheat"]
+        status = pool.status()
+        assert status["ready"]
+        assert status["pending_requests"] == 0
+        assert len(status["workers"]) == 1
+
+    def test_metadata_only_manager_loads_no_sessions(self, tmp_path):
+        from model_manager import ModelManager
+        from conftest import make_version
+
+        make_version(tmp_path, "rice", "v1", bias_class=0)
+        ModelManager(str(tmp_path)).registry.activate("rice", "v1")
+        manager = ModelManager(str(tmp_path), load_sessions=False)
+
+        rice = manager.models["rice"]
+        assert rice.onnx_session is None and not rice.is_loaded
+        assert rice.has_model and rice.version == "v1"
+        assert manager.get_model_info("rice")["model_loaded"]
+        assert not manager.get_model_info("wheat")["model_loaded"]
+
+    def test_service_in_worker_mode(self, pool, monkeypatch):
+        pytest.importorskip("httpx")
+        from fastapi.testclient import TestClient
+        from model_manager import ModelManager
+        import inference_service
+
+        monkeypatch.setenv("ML_ADMIN_TOKEN", "secret")
+        monkeypatch.setattr(inference_service, "worker_pool", pool)
+        monkeypatch.setattr(inference_service, "model_manager", ModelManager(pool.models_dir, load_sessions=False))
+        client = TestClient(inference_service.app, headers={"X-Admin-Token": "secret"})
+
+        ready = client.get("/ready")
+        assert ready.status_code == 200
+        assert ready.json()["workers"]["ready"]
+        assert client.post("/admin/models/rice/stage", params={"version": "v1"}).status_code == 409
+        assert client.post("/admin/models/rice/rollback").status_code == 409
+        assert client.get("/admin/models/rice/experiment").status_code == 409
+        assert client.post("/admin/tracing", params={"enabled": True}).status_code == 409
+        assert client.get("/analytics/cascade").status_code == 409
+        assert client.get("/crops").status_code == 200
+
+    @pytest.mark.skipif(not os.path.exists("/proc/self/smaps"), reason="needs /proc/<pid>/smaps")
+    def test_workers_share_bundle_weight_pages(self, tmp_path):
+        from model_bundle import write_bundle, BUNDLE_FILENAME
+        from model_registry import ModelRegistry
+
+        num_classes = 4096
+        version_dir = tmp_path / "models" / "rice" / "v1"
+        version_dir.mkdir(parents=True)
+        write_model(tmp_path / "source.onnx", num_classes=num_classes)
+        bundle_path = str(version_dir / BUNDLE_FILENAME)
+        write_bundle(bundle_path, str(tmp_path / "source.onnx"), {"img_size": 16},
+                     {str(i): f"c{i}" for i in range(num_classes)})
+        ModelRegistry(str(tmp_path / "models")).activate("rice", "v1")
+        weights_kb = 512 * num_classes * 4 // 1024
+
+        two_workers = InferenceWorkerPool(str(tmp_path / "models"), num_workers=2, warmup=True)
+        two_workers.start()
+        try:
+            assert two_workers.wait_until_ready(timeout=120)
+            pids = [worker["pid"] for worker in two_workers.status()["workers"]]
+            usage = [mapped_file_kb(pid, os.path.realpath(bundle_path)) for pid in pids]
+        finally:
+            two_workers.shutdown()
+
+        # Both workers serve the weights from the same file-backed pages
+        # rather than from a private heap copy each, so each one is charged
+        # half of them
+        for totals in usage:
+            assert totals["Rss"] >= 0.9 * weights_kb
+            assert totals["Pss"] <= 0.6 * totals["Rss"]
+
+    def test_unknown_method_rejected(self, pool):
+        with pytest.raises(ValueError):
+            pool.submit("get_model_info")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,270 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import contextvars
+from collections import deque, Counter
+from functools import wraps
+from typing import Dict, List, Optional, Any, Callable
+
+try:
+    from opentelemetry import trace as otel_trace
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+
+logger = logging.getLogger(__name__)
+
+
+TRACER_NAME = "kheti_sahayak.ml"
+SUPPORTED_EXPORTERS = ("memory", "file", "otel")
+TRACE_DIR = os.environ.get("ML_TRACE_DIR", "./traces")
+DEFAULT_TRACE_FILE = "traces.jsonl"
+
+_enabled = os.environ.get("ML_TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+_current_span: contextvars.ContextVar = contextvars.ContextVar("ml_current_span", default=None)
+
+
+class InMemoryCollector:
+    def __init__(self, max_spans: int = 10000):
+        self.spans: deque = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, span_record: Dict[str, Any]):
+        with self._lock:
+            self.spans.append(span_record)
+
+    def get_spans(self, limit: Optional[int] = None, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            spans = list(self.spans)
+        if trace_id:
+            spans = [s for s in spans if s["trace_id"] == trace_id]
+        if limit:
+            spans = spans[-limit:]
+        return spans
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+class FileSpanExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1)
+
+    def export(self, span_record: Dict[str, Any]):
+        line = json.dumps(span_record)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+_collector = InMemoryCollector()
+_exporter: Any = _collector
+_exporter_name = "memory"
+_otel_tracer = None
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_span_id", "attributes",
+        "start_time_unix_nano", "end_time_unix_nano", "status", "_token"
+    )
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        parent = _current_span.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.start_time_unix_nano = 0
+        self.end_time_unix_nano = 0
+        self.status = "OK"
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start_time_unix_nano = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_time_unix_nano = time.time_ns()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.status = "ERROR"
+            self.attributes["exception.type"] = exc_type.__name__
+            self.attributes["exception.message"] = str(exc)
+        try:
+            _exporter.export(self.to_dict())
+        except Exception as e:
+            logger.warning(f"Failed to export span {self.name}: {str(e)}")
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": round((self.end_time_unix_nano - self.start_time_unix_nano) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": self.status
+        }
+
+
+def trace_file_path(file_name: str, trace_dir: Optional[str] = None) -> str:
+    # Callers only name the file; it always lands directly in the trace
+    # directory so the file exporter cannot append to arbitrary files
+    trace_dir = os.path.realpath(trace_dir or TRACE_DIR)
+    path = os.path.realpath(os.path.join(trace_dir, file_name))
+    if os.path.basename(file_name) != file_name or os.path.dirname(path) != trace_dir:
+        raise ValueError(f"Trace file must be a plain file name inside the trace directory: {file_name!r}")
+    os.makedirs(trace_dir, exist_ok=True)
+    return path
+
+
+def configure_tracing(
+    enabled: bool,
+    exporter: str = "memory",
+    file_path: Optional[str] = None
+) -> Dict[str, Any]:
+    global _enabled, _exporter, _exporter_name, _otel_tracer
+
+    if exporter not in SUPPORTED_EXPORTERS:
+        raise ValueError(f"Unsupported trace exporter: {exporter}. Supported: {list(SUPPORTED_EXPORTERS)}")
+
+    if exporter == "otel" and not OTEL_AVAILABLE:
+        raise ValueError("OpenTelemetry API is not installed")
+
+    if isinstance(_exporter, FileSpanExporter):
+        _exporter.close()
+
+    if exporter == "file":
+        _exporter = FileSpanExporter(file_path or trace_file_path(DEFAULT_TRACE_FILE))
+    else:
+        _exporter = _collector
+
+    _otel_tracer = otel_trace.get_tracer(TRACER_NAME) if exporter == "otel" else None
+    _exporter_name = exporter
+    _enabled = enabled
+
+    logger.info(f"Tracing {'enabled' if enabled else 'disabled'} with {exporter} exporter")
+    return get_tracing_status()
+
+
+def get_tracing_status() -> Dict[str, Any]:
+    return {
+        "enabled": _enabled,
+        "exporter": _exporter_name,
+        "file_path": _exporter.path if isinstance(_exporter, FileSpanExporter) else None,
+        "buffered_spans": len(_collector.spans),
+        "otel_available": OTEL_AVAILABLE
+    }
+
+
+def is_tracing_enabled() -> bool:
+    return _enabled
+
+
+def get_collector() -> InMemoryCollector:
+    return _collector
+
+
+def span(name: str, **attributes):
+    if not _enabled:
+        return _NOOP_SPAN
+    if _otel_tracer is not None:
+        return _otel_tracer.start_as_current_span(name, attributes=attributes)
+    return Span(name, attributes)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+
+    def _collapse(self, frame) -> str:
+        frames = []
+        while frame is not None and len(frames) < self.max_depth:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(frames))
+
+    def profile(self, duration: float) -> Dict[str, int]:
+        stacks: Counter = Counter()
+        own_thread = threading.get_ident()
+        deadline = time.monotonic() + duration
+
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stacks[self._collapse(frame)] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+        return dict(stacks)
+
+
+_profiler_lock = threading.Lock()
+
+
+def run_sampling_profiler(duration: float, interval: float = 0.005) -> Optional[Dict[str, int]]:
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    try:
+        logger.info(f"Sampling profiler started for {duration}s at {interval * 1000:.1f}ms interval")
+        return SamplingProfiler(interval=interval).profile(duration)
+    finally:
+        _profiler_lock.release()
+
+
+def format_collapsed_stacks(stacks: Dict[str, int]) -> str:
+    lines = [f"{stack} {count}" for stack, count in sorted(stacks.items(), key=lambda kv: -kv[1])]
+    return "\n".join(lines) + ("\n" if lines else "")
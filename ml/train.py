@@ -1,22 +1,37 @@
 import argparse
+import contextlib
 import os
 import time
 import logging
 import json
 from pathlib import Path
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Callable
 
 import torch
 import timm
 import mlflow
 import numpy as np
+import pandas as pd
 from torch import nn
-from torch.utils.data import DataLoader
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, Subset
+from torch.utils.data.distributed import DistributedSampler
 import albumentations as A
 from albumentations.pytorch import ToTensorV2
 
-from dataset import ManifestImageDataset, create_data_splits
-from utils import save_checkpoint, evaluate
+from dataset import ManifestImageDataset, ShardedImageDataset, create_data_splits
+from onnx_weights import save_with_external_data
+from model_bundle import write_bundle
+from distributed import (
+    DistributedContext, NullTracker, init_distributed, cleanup_distributed, barrier,
+    broadcast_buffers, shard_indices, all_reduce_sum, gather_evaluation, launched_distributed
+)
+from postprocessing import temperature_softmax
+from feature_cache import FeatureCache, backbone_version, sample_keys, extract_features, train_head
+from utils import (
+    save_checkpoint, evaluate, fit_temperature,
+    negative_log_likelihood, expected_calibration_error
+)
 
 # Configure logging
 logging.basicConfig(
@@ -52,8 +67,158 @@ def build_model(model_name='tf_efficientnet_b0', num_classes=2, pretrained=True)
     return model
 
 
-def export_model(model: nn.Module, output_dir: str, model_name: str, img_size: int = 224):
-    """Export model to ONNX and TorchScript formats"""
+PRECISIONS = ('fp32', 'bf16')
+TRAINING_SUMMARY_FILE = "training_summary.json"
+
+
+def bf16_supported(device: str = 'cpu') -> bool:
+    """Whether bfloat16 autocast has fast kernels on this device (AVX512/AMX on CPU)"""
+    if device == 'cuda':
+        return torch.cuda.is_available() and torch.cuda.is_bf16_supported()
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def prepare_training_model(model: nn.Module, device: str, precision: str = 'fp32',
+                           channels_last: bool = False, compile_model: bool = False, ddp: bool = False
+                           ) -> Tuple[nn.Module, Callable[[], contextlib.AbstractContextManager], Dict[str, Any]]:
+    """Apply the opt-in fast training settings
+
+    Weights stay FP32 under bf16 autocast, so checkpoints, evaluation and
+    export keep using ``model``; only the training forward pass goes
+    through the returned module, which is the DistributedDataParallel
+    and/or compiled wrapper when ``ddp`` / ``compile_model`` is set.
+
+    Returns:
+        Tuple of (module for training steps, autocast context factory,
+        settings actually applied)
+    """
+    if precision == 'bf16' and not bf16_supported(device):
+        logger.warning("bfloat16 autocast is not supported on this device, training in fp32")
+        precision = 'fp32'
+    
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    
+    train_model = model
+    if ddp:
+        device_ids = [torch.device(device).index] if device.startswith('cuda') else None
+        train_model = DistributedDataParallel(model, device_ids=device_ids)
+    
+    if compile_model:
+        if hasattr(torch, 'compile'):
+            train_model = torch.compile(train_model)
+        else:
+            logger.warning("torch.compile is not available in this PyTorch version, running eagerly")
+            compile_model = False
+    
+    def autocast():
+        if precision == 'bf16':
+            return torch.autocast(device_type=device, dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+    
+    settings = {"precision": precision, "channels_last": channels_last, "compile": compile_model, "ddp": ddp}
+    return train_model, autocast, settings
+
+
+def train_step(train_model: nn.Module, xb: torch.Tensor, yb: torch.Tensor, criterion, optimizer,
+               autocast: Callable[[], contextlib.AbstractContextManager], channels_last: bool = False
+               ) -> Tuple[torch.Tensor, torch.Tensor]:
+    """One optimizer step; returns the detached loss and logits"""
+    if channels_last:
+        xb = xb.contiguous(memory_format=torch.channels_last)
+    
+    optimizer.zero_grad()
+    with autocast():
+        preds = train_model(xb)
+        loss = criterion(preds, yb)
+    loss.backward()
+    optimizer.step()
+    return loss.detach(), preds.detach()
+
+
+def load_backbone(model: nn.Module, checkpoint_path: str):
+    """Initialize from a previous checkpoint, skipping a classifier of a different shape
+
+    Lets a crop whose disease classes changed start from its last trained
+    backbone.
+    """
+    state = torch.load(checkpoint_path, map_location='cpu')['model_state']
+    own_state = model.state_dict()
+    skipped = [name for name, tensor in state.items()
+               if name in own_state and own_state[name].shape != tensor.shape]
+    for name in skipped:
+        del state[name]
+    
+    missing, unexpected = model.load_state_dict(state, strict=False)
+    logger.info(f"Initialized from {checkpoint_path} "
+                f"(re-initialized: {sorted(set(skipped) | set(missing))}, ignored: {sorted(unexpected)})")
+
+
+def fit_head_on_cached_features(model: nn.Module, dataset, train_indices: List[int], val_indices: List[int],
+                                args, device: str, class_weights: Optional[torch.Tensor] = None) -> Dict[str, Any]:
+    """Train only the classifier from memory-mapped backbone features
+
+    Features are computed once per image content and backbone version (the
+    backbone is frozen here, so every later head-only run on the same
+    backbone reads them straight from the cache).
+    """
+    start = time.time()
+    version = backbone_version(model, args.model, args.img_size)
+    cache = FeatureCache(args.feature_cache or os.path.join(args.output_dir, 'feature_cache'),
+                         version, model.num_features)
+    rows = extract_features(model, dataset, sample_keys(dataset), cache,
+                            batch_size=args.batch_size, num_workers=args.num_workers, device=device)
+    extract_time = time.time() - start
+    logger.info(f"Backbone {version}: {len(cache)} cached feature rows ({extract_time:.1f}s)")
+    
+    start = time.time()
+    labels = np.asarray(dataset.labels)
+    result = train_head(
+        model.get_classifier(), cache.features(),
+        rows[train_indices], labels[train_indices], rows[val_indices], labels[val_indices],
+        epochs=args.head_epochs, lr=args.head_lr, class_weights=class_weights, seed=args.seed
+    )
+    result.update(extract_time=extract_time, fit_time=time.time() - start, backbone_version=version)
+    logger.info(f"Head-only training: val_acc={result['best_val_accuracy']:.4f} "
+                f"at epoch {result['best_epoch']} ({result['fit_time']:.1f}s)")
+    return result
+
+
+def load_class_mapping(path: str, num_classes: int) -> Dict[str, str]:
+    """Read a class index -> disease id mapping and check it covers every output"""
+    with open(path, 'r') as f:
+        class_mapping = json.load(f)
+    
+    expected = {str(i) for i in range(num_classes)}
+    if set(class_mapping) != expected:
+        raise ValueError(
+            f"Class mapping {path} must map exactly the indices 0..{num_classes - 1}, "
+            f"got {sorted(class_mapping, key=lambda k: (len(k), k))}"
+        )
+    return class_mapping
+
+
+def export_model(model: nn.Module, output_dir: str, model_name: str, img_size: int = 224,
+                 temperature: Optional[float] = None, external_data: bool = True,
+                 class_mapping: Optional[Dict[str, str]] = None, bundle: bool = True):
+    """Export model to ONNX and TorchScript formats
+
+    With external_data the ONNX weights go to a page-aligned
+    ``<model_name>.onnx.data`` file next to the graph, which the inference
+    service memory-maps; copy both files together.
+
+    With bundle a single ``<model_name>.bundle`` is also written holding the
+    graph, weights, metadata and class mapping with content hashes; deploy it
+    as ``model.bundle`` in a model version directory. A bundle needs the
+    class mapping: without it the service would label outputs in
+    disease-database order, which need not match the training label indices.
+    """
+    if bundle and not class_mapping:
+        raise ValueError("A model bundle needs the class mapping of the training labels")
+    
     os.makedirs(output_dir, exist_ok=True)
     model.eval()
     
@@ -75,6 +240,9 @@ def export_model(model: nn.Module, output_dir: str, model_name: str, img_size: i
     )
     logger.info(f"Model exported to ONNX: {onnx_path}")
     
+    if external_data:
+        save_with_external_data(onnx_path)
+    
     # Export to TorchScript
     script_path = os.path.join(output_dir, f"{model_name}.pt")
     scripted_model = torch.jit.trace(model, dummy_input)
@@ -89,6 +257,14 @@ def export_model(model: nn.Module, output_dir: str, model_name: str, img_size: i
         "framework": "pytorch",
         "export_date": time.strftime("%Y-%m-%d %H:%M:%S")
     }
+    if temperature is not None:
+        metadata["temperature"] = temperature
+    if bundle:
+        bundle_path = os.path.join(output_dir, f"{model_name}.bundle")
+        write_bundle(bundle_path, onnx_path, {**metadata, "framework": "onnx"}, class_mapping)
+        metadata["bundle"] = os.path.basename(bundle_path)
+    if external_data:
+        metadata["onnx_external_data"] = os.path.basename(onnx_path) + ".data"
     
     with open(os.path.join(output_dir, f"{model_name}_metadata.json"), 'w') as f:
         json.dump(metadata, f, indent=2)
@@ -96,14 +272,39 @@ def export_model(model: nn.Module, output_dir: str, model_name: str, img_size: i
     return onnx_path, script_path
 
 
-def train(args):
-    """Main training function with MLflow tracking"""
+def fit_calibration_report(val_metrics: Dict[str, Any], temperature: float) -> Dict[str, float]:
+    """Validation NLL and ECE before and after temperature scaling"""
+    logits = val_metrics['logits']
+    labels = val_metrics['labels']
+    
+    return {
+        "temperature": temperature,
+        "val_nll": negative_log_likelihood(logits, labels),
+        "val_nll_calibrated": negative_log_likelihood(logits, labels, temperature),
+        "val_ece": expected_calibration_error(val_metrics['probabilities'], labels),
+        "val_ece_calibrated": expected_calibration_error(temperature_softmax(logits, temperature), labels),
+    }
+
+
+def train(args, ctx: Optional[DistributedContext] = None):
+    """Main training function with MLflow tracking
+    
+    Under torchrun every rank trains a DistributedDataParallel replica on
+    its share of the training set; validation metrics are gathered from
+    all ranks, and only rank 0 logs to MLflow, writes checkpoints and
+    exports.
+    """
+    ctx = ctx or DistributedContext()
+    tracker = mlflow if ctx.is_main else NullTracker()
+    
     # Set up MLflow
-    mlflow.set_experiment(args.experiment_name)
+    tracker.set_experiment(args.experiment_name)
     
-    with mlflow.start_run(run_name=args.run_name) as run:
+    with tracker.start_run(run_name=args.run_name) as run:
+        run_start = time.time()
+        
         # Log parameters
-        mlflow.log_params({
+        tracker.log_params({
             "model": args.model,
             "epochs": args.epochs,
             "batch_size": args.batch_size,
@@ -111,10 +312,13 @@ def train(args):
             "img_size": args.img_size,
             "num_classes": args.num_classes,
             "pretrained": not args.no_pretrained,
+            "world_size": ctx.world_size,
         })
         
         # Set device
         device = 'cuda' if torch.cuda.is_available() and not args.force_cpu else 'cpu'
+        if device == 'cuda' and ctx.is_distributed:
+            device = f'cuda:{ctx.local_rank}'
         logger.info(f"Using device: {device}")
         
         # Create transforms for training and validation
@@ -122,33 +326,48 @@ def train(args):
         val_transforms = get_transforms(args.img_size, train=False)
         
         # Load dataset
-        full_dataset = ManifestImageDataset(args.manifest, transform=None)
+        if args.shards:
+            full_dataset = ShardedImageDataset(args.shards, transform=None)
+        else:
+            full_dataset = ManifestImageDataset(args.manifest, transform=None)
         logger.info(f"Loaded dataset with {len(full_dataset)} samples")
         logger.info(f"Class distribution: {full_dataset.class_counts}")
         
-        # Split dataset
+        # Split dataset; duplicate groups from data_validation.py keep
+        # copies of an image out of both train and validation
+        groups = load_split_groups(args.dedup_groups, full_dataset) if args.dedup_groups else None
         train_dataset, val_dataset, _ = create_data_splits(
-            full_dataset, val_size=args.val_size, test_size=0, random_seed=args.seed
+            full_dataset, val_size=args.val_size, test_size=0, random_seed=args.seed, groups=groups
         )
         
-        # Apply transforms
-        train_dataset.dataset.transform = train_transforms
-        val_dataset.dataset.transform = val_transforms
+        # Apply transforms; each split gets its own view of the dataset so
+        # the validation transform does not replace the training one
+        train_dataset = Subset(full_dataset.with_transform(train_transforms), train_dataset.indices)
+        val_dataset = Subset(full_dataset.with_transform(val_transforms), val_dataset.indices)
         
         logger.info(f"Train set: {len(train_dataset)} samples")
         logger.info(f"Validation set: {len(val_dataset)} samples")
         
-        # Create data loaders
+        # Create data loaders; with several ranks each one trains on a
+        # DistributedSampler share (--batch-size is per rank) and validates
+        # on an unpadded shard whose metrics are gathered afterwards
+        train_sampler = None
+        if ctx.is_distributed:
+            train_sampler = DistributedSampler(
+                train_dataset, num_replicas=ctx.world_size, rank=ctx.rank, shuffle=True, seed=args.seed
+            )
+        
         train_loader = DataLoader(
             train_dataset, 
             batch_size=args.batch_size, 
-            shuffle=True, 
+            shuffle=train_sampler is None, 
+            sampler=train_sampler,
             num_workers=args.num_workers,
             pin_memory=True
         )
         
         val_loader = DataLoader(
-            val_dataset, 
+            Subset(val_dataset, shard_indices(range(len(val_dataset)), ctx)), 
             batch_size=args.batch_size, 
             shuffle=False, 
             num_workers=args.num_workers,
@@ -161,6 +380,16 @@ def train(args):
             num_classes=args.num_classes, 
             pretrained=not args.no_pretrained
         ).to(device)
+        if args.init_checkpoint:
+            load_backbone(model, args.init_checkpoint)
+        
+        # Opt-in bf16 autocast / channels_last / torch.compile
+        train_model, autocast, fast_settings = prepare_training_model(
+            model, device, precision=args.precision,
+            channels_last=args.channels_last, compile_model=args.compile_model, ddp=ctx.is_distributed
+        )
+        tracker.log_params(fast_settings)
+        logger.info(f"Training mode: {fast_settings}")
         
         # Calculate class weights for imbalanced datasets
         if args.use_class_weights:
@@ -176,92 +405,242 @@ def train(args):
             optimizer, mode='max', factor=0.5, patience=2, verbose=True
         )
         
-        # Training loop
+        # Full passes over the training split reuse the validation transform
+        # so they measure fit rather than augmentation noise
+        train_eval_loader = None
+        if args.train_eval_every > 0:
+            train_eval_loader = DataLoader(
+                Subset(full_dataset.with_transform(val_transforms), shard_indices(train_dataset.indices, ctx)),
+                batch_size=args.batch_size,
+                shuffle=False,
+                num_workers=args.num_workers,
+                pin_memory=True
+            )
+        
         best_val_acc = 0.0
-        for epoch in range(1, args.epochs + 1):
-            # Train
+        num_epochs = args.epochs
+        
+        # Head-only retraining from cached backbone features; falls back to
+        # the full fine-tuning loop below when the head is not good enough
+        if args.head_only:
+            head_result = fit_head_on_cached_features(
+                model, full_dataset.with_transform(val_transforms),
+                train_dataset.indices, val_dataset.indices, args, device, class_weights=criterion.weight
+            )
+            tracker.log_metrics({
+                "head_val_accuracy": head_result['best_val_accuracy'],
+                "head_best_epoch": head_result['best_epoch'],
+                "feature_extract_time": head_result['extract_time'],
+                "head_fit_time": head_result['fit_time'],
+            })
+            
+            if args.head_only_min_accuracy is not None and head_result['best_val_accuracy'] < args.head_only_min_accuracy:
+                logger.warning(f"Head-only validation accuracy {head_result['best_val_accuracy']:.4f} is below "
+                               f"{args.head_only_min_accuracy:.4f}; falling back to full fine-tuning")
+            else:
+                num_epochs = 0
+                best_val_acc = head_result['best_val_accuracy']
+                checkpoint_path = save_checkpoint(
+                    {
+                        'model_state': model.state_dict(),
+                        'epoch': 0,
+                        'val_acc': best_val_acc,
+                        'head_only': True
+                    },
+                    args.output_dir,
+                    'best_model.pth'
+                )
+                tracker.log_artifact(checkpoint_path)
+        
+        # Training loop
+        for epoch in range(1, num_epochs + 1):
+            # Train; loss and accuracy accumulate on the model's own forward
+            # pass instead of a second pass over the training set
             model.train()
-            epoch_loss = 0.0
+            if train_sampler is not None:
+                train_sampler.set_epoch(epoch)
+            # Summed loss, correct predictions and samples seen on this rank
+            epoch_totals = torch.zeros(3, dtype=torch.float64, device=device)
             t0 = time.time()
             
             for xb, yb in train_loader:
                 xb = xb.to(device)
                 yb = yb.to(device)
                 
-                optimizer.zero_grad()
-                preds = model(xb)
-                loss = criterion(preds, yb)
-                loss.backward()
-                optimizer.step()
+                loss, preds = train_step(
+                    train_model, xb, yb, criterion, optimizer, autocast, channels_last=fast_settings['channels_last']
+                )
                 
-                epoch_loss += loss.item() * xb.size(0)
+                epoch_totals[0] += loss * xb.size(0)
+                epoch_totals[1] += (preds.argmax(dim=1) == yb).sum()
+                epoch_totals[2] += xb.size(0)
             
-            epoch_loss /= len(train_loader.dataset)
-            train_metrics = evaluate(model, train_loader, device=device)
+            loss_sum, correct, num_train = all_reduce_sum(epoch_totals, ctx).tolist()
+            epoch_loss = loss_sum / num_train
+            train_acc = correct / num_train
+            train_time = time.time() - t0
             
-            # Validate
-            val_metrics = evaluate(model, val_loader, device=device)
+            # Validate rank 0's replica everywhere, as that is what gets saved
+            broadcast_buffers(model, ctx)
+            t_val = time.time()
+            val_metrics = gather_evaluation(evaluate(model, val_loader, device=device, keep_probabilities=False), ctx)
+            val_time = time.time() - t_val
             
             # Update LR scheduler
             scheduler.step(val_metrics['accuracy'])
             
-            # Log metrics
-            mlflow.log_metrics({
+            epoch_metrics = {
                 "train_loss": epoch_loss,
-                "train_accuracy": train_metrics['accuracy'],
+                "train_accuracy": train_acc,
                 "val_accuracy": val_metrics['accuracy'],
-                "epoch_time": time.time() - t0
-            }, step=epoch)
+                "train_time": train_time,
+                "val_time": val_time,
+            }
+            
+            if train_eval_loader is not None and (epoch % args.train_eval_every == 0 or epoch == num_epochs):
+                t_eval = time.time()
+                train_eval_metrics = gather_evaluation(
+                    evaluate(model, train_eval_loader, device=device, keep_probabilities=False), ctx
+                )
+                epoch_metrics["train_eval_accuracy"] = train_eval_metrics['accuracy']
+                epoch_metrics["train_eval_time"] = time.time() - t_eval
+            else:
+                # What the skipped full pass would have cost, at the
+                # validation pass's throughput
+                epoch_metrics["train_eval_time_saved"] = (
+                    val_time * (num_train / ctx.world_size) / max(len(val_loader.dataset), 1)
+                )
+            
+            epoch_metrics["epoch_time"] = time.time() - t0
+            tracker.log_metrics(epoch_metrics, step=epoch)
             
-            logger.info(f"Epoch {epoch}/{args.epochs} | "
+            train_eval_acc = epoch_metrics.get("train_eval_accuracy")
+            logger.info(f"Epoch {epoch}/{num_epochs} | "
                       f"Train Loss: {epoch_loss:.4f} | "
-                      f"Train Acc: {train_metrics['accuracy']:.4f} | "
+                      f"Train Acc: {train_acc:.4f}"
+                      f"{f' (full eval {train_eval_acc:.4f})' if train_eval_acc is not None else ''} | "
                       f"Val Acc: {val_metrics['accuracy']:.4f} | "
-                      f"Time: {(time.time()-t0):.1f}s")
+                      f"Time: {epoch_metrics['epoch_time']:.1f}s")
             
-            # Save best model
+            # Save best model; every rank tracks the same gathered accuracy
+            # but only rank 0 writes the checkpoint
             if val_metrics['accuracy'] > best_val_acc:
                 best_val_acc = val_metrics['accuracy']
-                checkpoint_path = save_checkpoint(
-                    {
-                        'model_state': model.state_dict(),
-                        'optimizer_state': optimizer.state_dict(),
-                        'epoch': epoch,
-                        'val_acc': best_val_acc
-                    }, 
-                    args.output_dir, 
-                    f'best_model.pth'
-                )
-                mlflow.log_artifact(checkpoint_path)
-                logger.info(f"Saved best model with val_acc={best_val_acc:.4f}")
+                if ctx.is_main:
+                    checkpoint_path = save_checkpoint(
+                        {
+                            'model_state': model.state_dict(),
+                            'optimizer_state': optimizer.state_dict(),
+                            'epoch': epoch,
+                            'val_acc': best_val_acc
+                        }, 
+                        args.output_dir, 
+                        f'best_model.pth'
+                    )
+                    tracker.log_artifact(checkpoint_path)
+                    logger.info(f"Saved best model with val_acc={best_val_acc:.4f}")
+        
+        # Calibration, export and the summary happen once, on rank 0, over
+        # the whole validation split
+        barrier(ctx)
+        if not ctx.is_main:
+            return model, None
         
         # Final evaluation
         model.load_state_dict(torch.load(os.path.join(args.output_dir, 'best_model.pth'))['model_state'])
-        final_val_metrics = evaluate(model, val_loader, device=device)
+        final_val_loader = DataLoader(
+            val_dataset,
+            batch_size=args.batch_size,
+            shuffle=False,
+            num_workers=args.num_workers,
+            pin_memory=True
+        )
+        final_val_metrics = evaluate(model, final_val_loader, device=device, keep_logits=True)
         
         logger.info(f"Final validation accuracy: {final_val_metrics['accuracy']:.4f}")
-        mlflow.log_metrics({
+        tracker.log_metrics({
             "final_val_accuracy": final_val_metrics['accuracy'],
         })
         
+        # Fit temperature scaling on validation logits
+        temperature = None
+        if not args.skip_temperature_scaling:
+            temperature = fit_temperature(final_val_metrics['logits'], final_val_metrics['labels'])
+            calibration = fit_calibration_report(final_val_metrics, temperature)
+            logger.info(f"Fitted temperature {temperature:.4f} | "
+                        f"NLL {calibration['val_nll']:.4f} -> {calibration['val_nll_calibrated']:.4f} | "
+                        f"ECE {calibration['val_ece']:.4f} -> {calibration['val_ece_calibrated']:.4f}")
+            tracker.log_metrics(calibration)
+        
+        summary = {
+            "model": args.model,
+            "num_classes": args.num_classes,
+            "img_size": args.img_size,
+            "train_samples": len(train_dataset),
+            "val_samples": len(val_dataset),
+            "best_val_accuracy": best_val_acc,
+            "final_val_accuracy": final_val_metrics['accuracy'],
+            "final_val_f1": final_val_metrics['f1'],
+            "temperature": temperature,
+            "mlflow_run_id": run.info.run_id,
+            "world_size": ctx.world_size,
+        }
+        
         # Export model
         if args.export_model:
             export_dir = os.path.join(args.output_dir, "exported")
+            class_mapping = None
+            if args.class_mapping:
+                class_mapping = load_class_mapping(args.class_mapping, args.num_classes)
             onnx_path, script_path = export_model(
-                model, export_dir, f"{args.model}_v{int(time.time())}", args.img_size
+                model, export_dir, f"{args.model}_v{int(time.time())}", args.img_size,
+                temperature=temperature, external_data=not args.onnx_inline_weights,
+                class_mapping=class_mapping, bundle=not args.no_bundle
             )
-            mlflow.log_artifact(onnx_path)
-            mlflow.log_artifact(script_path)
+            tracker.log_artifact(onnx_path)
+            if not args.onnx_inline_weights:
+                tracker.log_artifact(onnx_path + ".data")
+            if not args.no_bundle:
+                tracker.log_artifact(os.path.splitext(onnx_path)[0] + ".bundle")
+            tracker.log_artifact(script_path)
+            summary["exported"] = {"onnx": onnx_path, "torchscript": script_path}
+            if not args.no_bundle:
+                summary["exported"]["bundle"] = os.path.splitext(onnx_path)[0] + ".bundle"
+        
+        # Machine-readable outcome for train_all.py and other wrappers
+        summary["train_seconds"] = time.time() - run_start
+        with open(os.path.join(args.output_dir, TRAINING_SUMMARY_FILE), 'w') as f:
+            json.dump(summary, f, indent=2)
         
         # Log model to MLflow
-        mlflow.pytorch.log_model(model, "model")
+        tracker.pytorch.log_model(model, "model")
         
         return model, final_val_metrics
 
 
+def load_split_groups(groups_csv: str, dataset) -> np.ndarray:
+    """Per-sample split groups from a ``data_validation.py --dedup-output`` CSV
+
+    Rows missing from the CSV get a group of their own.
+    """
+    if dataset.source_rows is None:
+        raise ValueError("Dataset has no manifest row numbers; repack the shards to use --dedup-groups")
+    
+    groups_df = pd.read_csv(groups_csv, usecols=['row', 'dup_group'])
+    group_of_row = dict(zip(groups_df['row'], groups_df['dup_group']))
+    next_group = groups_df['dup_group'].max() + 1 if len(groups_df) else 0
+    groups = np.array([group_of_row.get(row, -1) for row in dataset.source_rows.tolist()], dtype=np.int64)
+    unassigned = groups < 0
+    groups[unassigned] = next_group + np.arange(unassigned.sum())
+    logger.info(f"Grouped {len(groups)} samples into {len(np.unique(groups))} split groups")
+    return groups
+
+
 def parse_args():
     p = argparse.ArgumentParser()
-    p.add_argument('--manifest', required=True, help='CSV manifest with image_path,label')
+    p.add_argument('--manifest', default=None, help='CSV manifest with image_path,label')
+    p.add_argument('--shards', default=None,
+                   help='Directory of pre-decoded image shards from pack_shards.py (used instead of --manifest)')
     p.add_argument('--output-dir', default='./artifacts')
     p.add_argument('--experiment-name', default='crop_diagnostics')
     p.add_argument('--run-name', default=None)
@@ -270,6 +649,10 @@ def parse_args():
     p.add_argument('--lr', type=float, default=1e-4)
     p.add_argument('--weight-decay', type=float, default=1e-5)
     p.add_argument('--val-size', type=float, default=0.2)
+    p.add_argument('--train-eval-every', type=int, default=0,
+                   help='Also evaluate the full training split every N epochs and on the last epoch (0: running metrics only)')
+    p.add_argument('--dedup-groups', default=None,
+                   help='Duplicate groups CSV from data_validation.py --dedup-output; duplicates stay in one split')
     p.add_argument('--model', default='tf_efficientnet_b0')
     p.add_argument('--img-size', type=int, default=224)
     p.add_argument('--num-classes', type=int, default=2)
@@ -277,12 +660,55 @@ def parse_args():
     p.add_argument('--seed', type=int, default=42)
     p.add_argument('--use-class-weights', action='store_true')
     p.add_argument('--export-model', action='store_true')
+    p.add_argument('--onnx-inline-weights', action='store_true',
+                   help='Embed ONNX weights in the graph instead of a memory-mappable .onnx.data file')
+    p.add_argument('--no-bundle', action='store_true',
+                   help='Do not write the single-file .bundle alongside the ONNX export')
+    p.add_argument('--class-mapping', default=None,
+                   help='JSON file mapping class index to disease id, stored in the bundle (required unless --no-bundle)')
     p.add_argument('--no-pretrained', action='store_true')
+    p.add_argument('--init-checkpoint', default=None,
+                   help='best_model.pth of a previous run to start from; a classifier of a different shape is re-initialized')
+    p.add_argument('--head-only', action='store_true',
+                   help='Freeze the backbone and train only the classifier on cached backbone features')
+    p.add_argument('--feature-cache', default=None,
+                   help='Feature cache directory, shared across runs (default: <output-dir>/feature_cache)')
+    p.add_argument('--head-epochs', type=int, default=30)
+    p.add_argument('--head-lr', type=float, default=1e-3)
+    p.add_argument('--head-only-min-accuracy', type=float, default=None,
+                   help='Fall back to full fine-tuning when head-only validation accuracy is below this')
+    p.add_argument('--dist-backend', default='gloo',
+                   help='torch.distributed backend when launched with torchrun (gloo for CPU nodes)')
+    p.add_argument('--skip-temperature-scaling', action='store_true',
+                   help='Do not fit a calibration temperature on the validation set')
     p.add_argument('--force-cpu', dest='force_cpu', action='store_true')
-    return p.parse_args()
+    p.add_argument('--precision', choices=PRECISIONS, default='fp32',
+                   help='bf16 trains under bfloat16 autocast where the CPU supports it (weights stay fp32)')
+    p.add_argument('--channels-last', action='store_true',
+                   help='Use the channels_last memory format for the model and input batches')
+    p.add_argument('--compile', dest='compile_model', action='store_true',
+                   help='Compile the training forward pass with torch.compile')
+    args = p.parse_args()
+    if not args.manifest and not args.shards:
+        p.error('one of --manifest or --shards is required')
+    if args.export_model and not args.no_bundle and not args.class_mapping:
+        p.error('--export-model writes a model bundle, which needs --class-mapping (or pass --no-bundle)')
+    if args.class_mapping:
+        # Checked up front rather than after training
+        try:
+            load_class_mapping(args.class_mapping, args.num_classes)
+        except (OSError, ValueError) as e:
+            p.error(str(e))
+    if args.head_only and launched_distributed():
+        p.error('--head-only runs on a single process; launch it without torchrun')
+    return args
 
 
 if __name__ == '__main__':
     args = parse_args()
     os.makedirs(args.output_dir, exist_ok=True)
-    train(args)
+    ctx = init_distributed(args.dist_backend)
+    try:
+        train(args, ctx)
+    finally:
+        cleanup_distributed(ctx)
@@ -0,0 +1,403 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional
+
+import pandas as pd
+
+from crop_router import ROUTER_DIR
+from disease_database import SUPPORTED_CROPS
+from model_bundle import BUNDLE_FILENAME, BundleError, ModelBundle
+from model_registry import ModelRegistry
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+TRAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "train.py")
+# Must match train.TRAINING_SUMMARY_FILE; train.py is not imported here so
+# the orchestrator does not load torch next to its training jobs
+TRAINING_SUMMARY_FILE = "training_summary.json"
+SUMMARY_COLUMNS = [
+    "crop", "status", "num_classes", "train_samples", "val_samples",
+    "final_val_accuracy", "final_val_f1", "train_seconds", "version", "activated", "error"
+]
+
+
+def discover_manifests(manifests_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Find per-crop manifests and optional class mappings
+
+    Accepts ``<crop>.csv`` or ``<crop>/manifest.csv``, with the class mapping
+    (class index -> disease id) in ``<crop>.classes.json`` or
+    ``<crop>/class_mapping.json``. Names that are not supported crops (or the
+    crop router) are skipped.
+
+    Returns:
+        Mapping of crop type to {"manifest", "class_mapping"} paths
+    """
+    jobs = {}
+    for entry in sorted(os.listdir(manifests_dir)):
+        path = os.path.join(manifests_dir, entry)
+        if os.path.isdir(path):
+            crop, manifest = entry, os.path.join(path, "manifest.csv")
+            class_mapping = os.path.join(path, "class_mapping.json")
+        elif entry.endswith(".csv"):
+            crop, manifest = entry[:-len(".csv")], path
+            class_mapping = os.path.join(manifests_dir, f"{crop}.classes.json")
+        else:
+            continue
+
+        crop = crop.lower()
+        if not os.path.exists(manifest):
+            continue
+        if crop not in SUPPORTED_CROPS and crop != ROUTER_DIR:
+            logger.warning(f"Skipping {manifest}: {crop} is not a supported crop type")
+            continue
+
+        jobs[crop] = {
+            "manifest": manifest,
+            "class_mapping": class_mapping if os.path.exists(class_mapping) else None
+        }
+    return jobs
+
+
+def count_classes(manifest: str, class_mapping: Optional[str] = None) -> int:
+    """Number of output classes: the class mapping size, else the largest label + 1"""
+    if class_mapping:
+        with open(class_mapping, 'r') as f:
+            return len(json.load(f))
+    labels = pd.read_csv(manifest, usecols=['label'])['label']
+    return int(labels.max()) + 1
+
+
+def plan_concurrency(num_jobs: int, threads_per_job: int, cpu_budget: int,
+                     memory_per_job_gb: float, memory_budget_gb: Optional[float],
+                     loader_workers_per_job: int = 0, memory_per_loader_worker_gb: float = 0.0) -> int:
+    """Parallel training jobs that fit both the CPU and the memory budget
+
+    Each job costs its intra-op threads plus one core per DataLoader worker
+    process, and ``memory_per_loader_worker_gb`` on top of its own memory
+    for each of those workers.
+    """
+    cpus_per_job = max(threads_per_job, 1) + loader_workers_per_job
+    slots = max(cpu_budget // cpus_per_job, 1)
+    if memory_budget_gb:
+        memory_per_job_gb += loader_workers_per_job * memory_per_loader_worker_gb
+        slots = min(slots, max(int(memory_budget_gb // memory_per_job_gb), 1))
+    return max(min(slots, num_jobs), 1)
+
+
+def cache_environment(cache_dir: str) -> Dict[str, str]:
+    """Environment variables pointing timm / torch hub downloads at a shared cache"""
+    cache_dir = os.path.abspath(cache_dir)
+    return {
+        "HF_HOME": os.path.join(cache_dir, "huggingface"),
+        "TORCH_HOME": os.path.join(cache_dir, "torch"),
+    }
+
+
+def prefetch_backbone(model_name: str, cache_dir: str) -> bool:
+    """Download the pretrained backbone into the shared cache once
+
+    Runs in a subprocess with the cache environment, so parallel jobs find
+    the weights on disk instead of racing to download them.
+    """
+    code = f"import timm; timm.create_model({model_name!r}, pretrained=True)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], env={**os.environ, **cache_environment(cache_dir)},
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        logger.warning(f"Could not prefetch pretrained {model_name}; each job will try on its own: "
+                       f"{result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'unknown error'}")
+        return False
+    logger.info(f"Pretrained {model_name} cached in {cache_dir}")
+    return True
+
+
+def run_training_job(crop: str, job: Dict[str, Any], output_dir: str, model_name: str,
+                     threads: int, loader_workers: int, cache_dir: str, train_args: List[str]) -> Dict[str, Any]:
+    """Run train.py for one crop in a subprocess and read its summary
+
+    Each job gets ``threads`` intra-op threads and ``loader_workers``
+    DataLoader processes so concurrent jobs do not oversubscribe the CPU
+    budget. Output goes to ``<output_dir>/train.log``.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cmd = [
+        sys.executable, TRAIN_SCRIPT,
+        "--manifest", job["manifest"],
+        "--output-dir", output_dir,
+        "--model", model_name,
+        "--num-classes", str(job["num_classes"]),
+        "--num-workers", str(loader_workers),
+        "--run-name", f"{crop}_{time.strftime('%Y%m%d_%H%M%S')}",
+        "--export-model",
+        *train_args
+    ]
+    if job["class_mapping"]:
+        cmd += ["--class-mapping", job["class_mapping"]]
+
+    env = {
+        **os.environ,
+        **cache_environment(cache_dir),
+        "OMP_NUM_THREADS": str(threads),
+        "MKL_NUM_THREADS": str(threads),
+    }
+
+    start = time.time()
+    log_path = os.path.join(output_dir, "train.log")
+    with open(log_path, 'w') as log:
+        returncode = subprocess.run(cmd, env=env, stdout=log, stderr=subprocess.STDOUT).returncode
+
+    summary_path = os.path.join(output_dir, TRAINING_SUMMARY_FILE)
+    if returncode != 0 or not os.path.exists(summary_path):
+        return {"crop": crop, "status": "failed", "error": f"train.py exited with {returncode}, see {log_path}",
+                "train_seconds": time.time() - start}
+
+    with open(summary_path, 'r') as f:
+        summary = json.load(f)
+    return {"crop": crop, "status": "trained", **summary}
+
+
+def deploy_bundle(crop: str, bundle_path: str, models_dir: str, version: str,
+                  class_mapping: Optional[str] = None, activate: bool = False) -> bool:
+    """Install a trained bundle as ``<models_dir>/<crop>/<version>/model.bundle``
+
+    The bundle is fully verified first and the version directory is moved
+    into place in one rename, so ModelManager never sees a partial copy.
+    The version is activated in ``registry.json`` when ``activate`` is set
+    or the crop has no active version yet.
+
+    Returns:
+        Whether the version was activated
+    """
+    with ModelBundle(bundle_path, verify="full"):
+        pass
+
+    registry = ModelRegistry(models_dir)
+    version_dir = registry.version_dir(crop, version)
+    if version_dir.exists():
+        raise FileExistsError(f"Model version already exists: {version_dir}")
+
+    tmp_dir = version_dir.parent / f".{version}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    shutil.copyfile(bundle_path, tmp_dir / BUNDLE_FILENAME)
+    if class_mapping:
+        shutil.copyfile(class_mapping, tmp_dir / "class_mapping.json")
+    os.replace(tmp_dir, version_dir)
+
+    if activate or registry.active_version(crop) is None:
+        registry.activate(crop, version)
+        return True
+    return False
+
+
+def format_summary_table(rows: List[Dict[str, Any]]) -> str:
+    """Fixed-width text table of per-crop results"""
+    lines = [f"{'crop':<14} {'status':<10} {'val_acc':>8} {'val_f1':>8} {'train_s':>9} {'version':<18} active"]
+    for row in rows:
+        acc = row.get("final_val_accuracy")
+        f1 = row.get("final_val_f1")
+        lines.append(
+            f"{row['crop']:<14} {row['status']:<10} "
+            f"{(f'{acc:.4f}' if acc is not None else '-'):>8} "
+            f"{(f'{f1:.4f}' if f1 is not None else '-'):>8} "
+            f"{row.get('train_seconds', 0):>9.1f} "
+            f"{row.get('version') or '-':<18} {'yes' if row.get('activated') else ''}"
+        )
+    return "\n".join(lines)
+
+
+def train_all(
+    manifests_dir: str,
+    models_dir: str,
+    work_dir: str,
+    model_name: str = 'tf_efficientnet_b0',
+    crops: Optional[List[str]] = None,
+    threads_per_job: int = 2,
+    loader_workers_per_job: int = 1,
+    cpu_budget: Optional[int] = None,
+    memory_per_job_gb: float = 4.0,
+    memory_per_loader_worker_gb: float = 0.5,
+    memory_budget_gb: Optional[float] = None,
+    cache_dir: Optional[str] = None,
+    activate: bool = False,
+    train_args: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """Train every crop model found in manifests_dir on a bounded worker pool
+
+    Args:
+        manifests_dir: Directory of per-crop manifests (see discover_manifests)
+        models_dir: MODELS_DIR the inference service loads; each trained
+            crop gets a new version directory there
+        work_dir: Per-crop training outputs, logs and the run summary
+        model_name: timm backbone shared by all jobs
+        crops: Only train these crops (default: all discovered)
+        threads_per_job: Intra-op threads per training job
+        loader_workers_per_job: DataLoader worker processes per training
+            job (train.py ``--num-workers``)
+        cpu_budget: Total threads and loader workers across jobs
+            (default: CPU count)
+        memory_per_job_gb: Expected peak memory of one job, without its
+            loader workers
+        memory_per_loader_worker_gb: Expected peak memory of one loader worker
+        memory_budget_gb: Total memory for jobs (default: 80% of RAM when
+            psutil is available, otherwise unbounded)
+        cache_dir: Shared pretrained-weights cache (default: <work_dir>/cache)
+        activate: Activate new versions even for crops already serving one
+        train_args: Extra train.py arguments passed to every job; the
+            loader workers are set by loader_workers_per_job instead
+
+    Returns:
+        One summary row per crop, also written to ``<work_dir>/summary.csv``
+    """
+    jobs = discover_manifests(manifests_dir)
+    if crops:
+        jobs = {crop: job for crop, job in jobs.items() if crop in crops}
+    if not jobs:
+        raise ValueError(f"No crop manifests found in {manifests_dir}")
+
+    # Bundles must carry the training label order, so crops without a class
+    # mapping are reported instead of trained
+    rows = [
+        {"crop": crop, "status": "failed",
+         "error": f"No class mapping ({crop}.classes.json or {crop}/class_mapping.json)"}
+        for crop, job in jobs.items() if not job["class_mapping"]
+    ]
+    jobs = {crop: job for crop, job in jobs.items() if job["class_mapping"]}
+
+    for job in jobs.values():
+        job["num_classes"] = count_classes(job["manifest"], job["class_mapping"])
+        job["size"] = os.path.getsize(job["manifest"])
+
+    train_args = list(train_args or [])
+    if any(arg.split("=")[0] == "--num-workers" for arg in train_args):
+        raise ValueError("Set DataLoader workers with loader_workers_per_job, not --num-workers")
+    cache_dir = cache_dir or os.path.join(work_dir, "cache")
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    if memory_budget_gb is None and PSUTIL_AVAILABLE:
+        memory_budget_gb = 0.8 * psutil.virtual_memory().total / 1024 ** 3
+
+    workers = plan_concurrency(len(jobs), threads_per_job, cpu_budget, memory_per_job_gb, memory_budget_gb,
+                               loader_workers_per_job, memory_per_loader_worker_gb)
+    threads = max(min(threads_per_job, cpu_budget // workers - loader_workers_per_job), 1)
+    logger.info(f"Training {len(jobs)} crop models, {workers} at a time with {threads} threads "
+                f"and {loader_workers_per_job} loader workers each")
+
+    if jobs and "--no-pretrained" not in train_args:
+        prefetch_backbone(model_name, cache_dir)
+
+    version = time.strftime("v%Y%m%d_%H%M%S")
+    # Largest manifests first so the longest jobs do not start last
+    ordered = sorted(jobs.items(), key=lambda item: item[1]["size"], reverse=True)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(run_training_job, crop, job, os.path.join(work_dir, crop),
+                        model_name, threads, loader_workers_per_job, cache_dir, train_args): crop
+            for crop, job in ordered
+        }
+        for future in as_completed(futures):
+            crop = futures[future]
+            row = future.result()
+            row["num_classes"] = jobs[crop]["num_classes"]
+
+            bundle_path = row.get("exported", {}).get("bundle")
+            if row["status"] == "trained" and bundle_path:
+                try:
+                    row["activated"] = deploy_bundle(
+                        crop, bundle_path, models_dir, version, jobs[crop]["class_mapping"], activate
+                    )
+                    row["version"] = version
+                    row["status"] = "deployed"
+                except (BundleError, OSError, ValueError) as e:
+                    row.update(status="failed", error=f"Deploy failed: {str(e)}")
+            elif row["status"] == "trained":
+                row.update(status="failed", error="train.py did not export a model bundle")
+
+            rows.append(row)
+            logger.info(f"{crop}: {row['status']}" + (f" ({row['error']})" if row.get("error") else ""))
+
+    rows.sort(key=lambda row: row["crop"])
+    os.makedirs(work_dir, exist_ok=True)
+    pd.DataFrame(rows).reindex(columns=SUMMARY_COLUMNS).to_csv(os.path.join(work_dir, "summary.csv"), index=False)
+    return rows
+
+
+def parse_args():
+    """Parse command line arguments; unrecognized arguments are passed to train.py"""
+    parser = argparse.ArgumentParser(description='Train all crop models in parallel and install them into MODELS_DIR')
+    parser.add_argument('--manifests-dir', type=str, required=True,
+                        help='Directory with <crop>.csv or <crop>/manifest.csv per crop')
+    parser.add_argument('--models-dir', type=str, default=os.environ.get("MODELS_DIR", "./models"),
+                        help='Inference MODELS_DIR to install new model versions into')
+    parser.add_argument('--work-dir', type=str, default='./artifacts/train_all',
+                        help='Per-crop training outputs, logs and summary.csv')
+    parser.add_argument('--model', type=str, default='tf_efficientnet_b0',
+                        help='timm backbone for every crop')
+    parser.add_argument('--crops', type=str, nargs='+', default=None,
+                        help='Only train these crops')
+    parser.add_argument('--threads-per-job', type=int, default=2,
+                        help='Intra-op threads per training job')
+    parser.add_argument('--loader-workers-per-job', type=int, default=1,
+                        help='DataLoader worker processes per training job (train.py --num-workers)')
+    parser.add_argument('--cpu-budget', type=int, default=None,
+                        help='Total threads and loader workers across concurrent jobs (default: CPU count)')
+    parser.add_argument('--memory-per-job-gb', type=float, default=4.0,
+                        help='Expected peak memory of one training job without its loader workers')
+    parser.add_argument('--memory-per-loader-worker-gb', type=float, default=0.5,
+                        help='Expected peak memory of one DataLoader worker')
+    parser.add_argument('--memory-budget-gb', type=float, default=None,
+                        help='Total memory for concurrent jobs (default: 80%% of RAM)')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help='Shared pretrained weights cache (default: <work-dir>/cache)')
+    parser.add_argument('--activate', action='store_true',
+                        help='Activate new versions for crops already serving one (new crops are always activated)')
+    return parser.parse_known_args()
+
+
+def main():
+    """Main function"""
+    args, train_args = parse_args()
+
+    rows = train_all(
+        args.manifests_dir,
+        args.models_dir,
+        args.work_dir,
+        model_name=args.model,
+        crops=args.crops,
+        threads_per_job=args.threads_per_job,
+        loader_workers_per_job=args.loader_workers_per_job,
+        cpu_budget=args.cpu_budget,
+        memory_per_job_gb=args.memory_per_job_gb,
+        memory_per_loader_worker_gb=args.memory_per_loader_worker_gb,
+        memory_budget_gb=args.memory_budget_gb,
+        cache_dir=args.cache_dir,
+        activate=args.activate,
+        train_args=train_args
+    )
+    print(format_summary_table(rows))
+
+    return 0 if all(row["status"] == "deployed" for row in rows) else 1
+
+
+if __name__ == '__main__':
+    exit(main())
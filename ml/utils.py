@@ -6,10 +6,7 @@ from typing import Dict, Any, List, Optional, Union
 import torch
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.metrics import (
-    accuracy_score, confusion_matrix, precision_recall_fscore_support,
-    roc_curve, auc, classification_report
-)
+from sklearn.metrics import roc_curve, auc, classification_report
 
 logger = logging.getLogger(__name__)
 
@@ -50,59 +47,205 @@ def load_checkpoint(path: str, model: torch.nn.Module, device: str = 'cpu') -> D
     return checkpoint
 
 
-def evaluate(model: torch.nn.Module, dataloader, device='cpu') -> Dict[str, Any]:
+def _num_samples(dataloader) -> Optional[int]:
+    # Samples the loader will yield; the sampler length also covers
+    # Subset and DistributedSampler loaders
+    try:
+        return len(dataloader.sampler)
+    except (AttributeError, TypeError):
+        try:
+            return len(dataloader.dataset)
+        except (AttributeError, TypeError):
+            return None
+
+
+def weighted_scores(cm: np.ndarray) -> Dict[str, float]:
+    """Accuracy and support-weighted precision, recall and F1 from a confusion matrix
+    
+    Matches ``sklearn.metrics.precision_recall_fscore_support(average='weighted')``
+    with undefined ratios counted as 0.
+    
+    Args:
+        cm: Confusion matrix with true classes as rows and predictions as columns
+        
+    Returns:
+        Dictionary with accuracy, precision, recall and f1
+    """
+    cm = np.asarray(cm, dtype=np.float64)
+    total = cm.sum()
+    tp = np.diag(cm)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, tp / predicted, 0.0)
+        recall = np.where(support > 0, tp / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    
+    weights = support / total if total > 0 else support
+    return {
+        'accuracy': float(tp.sum() / total) if total > 0 else 0.0,
+        'precision': float((precision * weights).sum()),
+        'recall': float((recall * weights).sum()),
+        'f1': float((f1 * weights).sum()),
+    }
+
+
+def evaluate(model: torch.nn.Module, dataloader, device='cpu',
+             keep_probabilities: bool = True, keep_logits: bool = False) -> Dict[str, Any]:
     """Evaluate model on dataloader
     
+    Outputs are written into arrays preallocated from the loader length and
+    the confusion matrix is accumulated per batch, so memory beyond the
+    returned arrays stays constant.
+    
     Args:
         model: PyTorch model to evaluate
         dataloader: DataLoader with evaluation data
         device: Device to run evaluation on
+        keep_probabilities: Also return the softmax probabilities; pass False
+            when only metrics are needed
+        keep_logits: Also return the raw logits, e.g. for temperature fitting
         
     Returns:
         Dictionary with evaluation metrics
     """
     model.eval()
-    all_preds = []
-    all_labels = []
-    all_probs = []
+    capacity = _num_samples(dataloader) or 0
+    preds = np.empty(capacity, dtype=np.int64)
+    labels = np.empty(capacity, dtype=np.int64)
+    logits = None
+    probs = None
+    cm = None
+    num_classes = 0
+    count = 0
     
     with torch.no_grad():
         for x, y in dataloader:
             x = x.to(device)
             out = model(x)
-            probs = torch.softmax(out, dim=1)
-            preds = torch.argmax(out, dim=1).cpu().numpy()
+            batch_preds = torch.argmax(out, dim=1).cpu().numpy()
+            batch_labels = y.numpy()
+            batch_size, num_classes = out.shape
+            end = count + batch_size
             
-            all_preds.extend(preds.tolist())
-            all_labels.extend(y.numpy().tolist())
-            all_probs.extend(probs.cpu().numpy().tolist())
-    
-    # Calculate metrics
-    acc = accuracy_score(all_labels, all_preds)
-    cm = confusion_matrix(all_labels, all_preds)
-    precision, recall, f1, _ = precision_recall_fscore_support(
-        all_labels, all_preds, average='weighted'
-    )
-    
-    # Convert to numpy arrays for further processing
-    all_labels_np = np.array(all_labels)
-    all_preds_np = np.array(all_preds)
-    all_probs_np = np.array(all_probs)
+            if cm is None:
+                logits = np.empty((capacity, num_classes), dtype=np.float32) if keep_logits else None
+                probs = np.empty((capacity, num_classes), dtype=np.float32) if keep_probabilities else None
+                cm = np.zeros(num_classes * num_classes, dtype=np.int64)
+            
+            if end > capacity:
+                # Loader without a usable length: grow geometrically
+                capacity = max(end, 2 * capacity)
+                preds = np.resize(preds, capacity)
+                labels = np.resize(labels, capacity)
+                if logits is not None:
+                    logits = np.resize(logits, (capacity, num_classes))
+                if probs is not None:
+                    probs = np.resize(probs, (capacity, num_classes))
+            
+            preds[count:end] = batch_preds
+            labels[count:end] = batch_labels
+            if logits is not None:
+                logits[count:end] = out.float().cpu().numpy()
+            if probs is not None:
+                probs[count:end] = torch.softmax(out.float(), dim=1).cpu().numpy()
+            cm += np.bincount(batch_labels * num_classes + batch_preds, minlength=num_classes * num_classes)
+            count = end
+    
+    cm = cm.reshape(num_classes, num_classes) if cm is not None else np.zeros((0, 0), dtype=np.int64)
     
     metrics = {
-        'accuracy': acc,
-        'precision': precision,
-        'recall': recall,
-        'f1': f1,
+        **weighted_scores(cm),
         'confusion_matrix': cm,
-        'predictions': all_preds_np,
-        'labels': all_labels_np,
-        'probabilities': all_probs_np
+        'predictions': preds[:count],
+        'labels': labels[:count],
+        'probabilities': probs[:count] if probs is not None else None,
+        'logits': logits[:count] if logits is not None else None
     }
     
     return metrics
 
 
+def negative_log_likelihood(logits: np.ndarray, labels: np.ndarray, temperature: float = 1.0) -> float:
+    """Mean negative log-likelihood of labels under temperature-scaled softmax
+    
+    Args:
+        logits: Raw model outputs of shape (N, num_classes)
+        labels: Integer class labels of shape (N,)
+        temperature: Softmax temperature
+        
+    Returns:
+        Mean NLL
+    """
+    scaled = logits / temperature
+    scaled = scaled - scaled.max(axis=1, keepdims=True)
+    log_probs = scaled - np.log(np.exp(scaled).sum(axis=1, keepdims=True))
+    return float(-log_probs[np.arange(len(labels)), labels].mean())
+
+
+def fit_temperature(logits: np.ndarray, labels: np.ndarray, min_temperature: float = 0.05,
+                    max_temperature: float = 10.0, tolerance: float = 1e-4) -> float:
+    """Fit the softmax temperature that minimizes validation NLL
+    
+    NLL is convex in the inverse temperature, so a golden-section search
+    over 1/T finds the global optimum without gradient steps.
+    
+    Args:
+        logits: Validation logits of shape (N, num_classes)
+        labels: Integer class labels of shape (N,)
+        min_temperature: Lower bound for the fitted temperature
+        max_temperature: Upper bound for the fitted temperature
+        tolerance: Search tolerance on the inverse temperature
+        
+    Returns:
+        Optimal temperature
+    """
+    logits = np.asarray(logits, dtype=np.float64)
+    labels = np.asarray(labels, dtype=np.int64)
+    
+    inv_phi = (np.sqrt(5) - 1) / 2
+    lo, hi = 1.0 / max_temperature, 1.0 / min_temperature
+    a = hi - inv_phi * (hi - lo)
+    b = lo + inv_phi * (hi - lo)
+    fa = negative_log_likelihood(logits, labels, 1.0 / a)
+    fb = negative_log_likelihood(logits, labels, 1.0 / b)
+    
+    while hi - lo > tolerance:
+        if fa < fb:
+            hi, b, fb = b, a, fa
+            a = hi - inv_phi * (hi - lo)
+            fa = negative_log_likelihood(logits, labels, 1.0 / a)
+        else:
+            lo, a, fa = a, b, fb
+            b = lo + inv_phi * (hi - lo)
+            fb = negative_log_likelihood(logits, labels, 1.0 / b)
+    
+    return float(2.0 / (lo + hi))
+
+
+def expected_calibration_error(probs: np.ndarray, labels: np.ndarray, n_bins: int = 15) -> float:
+    """Expected calibration error of top-1 confidences
+    
+    Args:
+        probs: Predicted probabilities of shape (N, num_classes)
+        labels: Integer class labels of shape (N,)
+        n_bins: Number of equal-width confidence bins
+        
+    Returns:
+        ECE in [0, 1]
+    """
+    confidences = probs.max(axis=1)
+    correct = (probs.argmax(axis=1) == labels).astype(np.float64)
+    bins = np.minimum((confidences * n_bins).astype(np.int64), n_bins - 1)
+    
+    conf_sums = np.bincount(bins, weights=confidences, minlength=n_bins)
+    acc_sums = np.bincount(bins, weights=correct, minlength=n_bins)
+    
+    # sum_b (n_b / N) * |mean conf_b - mean acc_b| == sum_b |conf_b - acc_b| / N
+    return float(np.abs(conf_sums - acc_sums).sum() / max(len(labels), 1))
+
+
 def plot_confusion_matrix(cm: np.ndarray, class_names: List[str], output_path: Optional[str] = None):
     """Plot confusion matrix
     
@@ -0,0 +1,318 @@
+import os
+import mmap
+import time
+import queue
+import logging
+import itertools
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+
+logger = logging.getLogger(__name__)
+
+
+INFERENCE_WORKERS = int(os.environ.get("ML_INFERENCE_WORKERS", 0))
+WORKER_REQUEST_TIMEOUT = float(os.environ.get("ML_WORKER_REQUEST_TIMEOUT", 30.0))
+
+# Weight files worth pulling into the page cache before workers start,
+# including ONNX external-data files and model bundles
+MODEL_FILE_SUFFIXES = (".onnx", ".data", ".pt", ".bin", ".bundle")
+
+WORKER_METHODS = ("predict", "batch_predict")
+
+
+def preload_model_files(models_dir: str) -> int:
+    # Fault every model file into the page cache once, in the supervisor.
+    # Workers map external-data weights (ModelManager(mmap_weights=True))
+    # and so fault in these physical pages instead of each reading a private
+    # copy.
+    total = 0
+    for path in sorted(Path(models_dir).rglob("*")):
+        if not path.is_file() or path.suffix not in MODEL_FILE_SUFFIXES or path.stat().st_size == 0:
+            continue
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+                mapped.madvise(mmap.MADV_WILLNEED)
+            total += len(mapped)
+    return total
+
+
+def _portable_result(result: Dict[str, Any], include_all_predictions: bool) -> Dict[str, Any]:
+    all_predictions = result.pop("all_predictions", None)
+    if include_all_predictions and all_predictions is not None:
+        result["all_predictions"] = dict(all_predictions)
+    return result
+
+
+def _worker_main(
+    worker_id: int,
+    models_dir: str,
+    requests: "mp.Queue",
+    results: "mp.Queue",
+    stop_event: "mp.Event",
+    warmup: bool
+):
+    from model_manager import ModelManager
+
+    # Map external-data weights so every worker serves them from the same
+    # page-cache pages instead of a private heap copy per worker
+    manager = ModelManager(models_dir, mmap_weights=True)
+    if warmup:
+        manager.warmup_models()
+    results.put((None, "ready", worker_id, os.getpid()))
+
+    while not stop_event.is_set():
+        try:
+            item = requests.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        if item is None:
+            break
+
+        request_id, method, kwargs, include_all_predictions = item
+        try:
+            if method == "predict":
+                payload = _portable_result(manager.predict(**kwargs), include_all_predictions)
+            else:
+                payload = [
+                    _portable_result(result, include_all_predictions)
+                    for result in manager.batch_predict(**kwargs)
+                ]
+            results.put((request_id, "ok", worker_id, payload))
+        except Exception as e:
+            results.put((request_id, "error", worker_id, str(e)))
+
+
+class InferenceWorkerPool:
+    # A supervisor that runs ModelManager in worker processes fed from one
+    # shared request queue. Workers fork from a forkserver that has already
+    # imported the inference stack, so import-time pages are shared and no
+    # worker inherits ONNX Runtime threads from the serving process.
+
+    def __init__(
+        self,
+        models_dir: str,
+        num_workers: int = INFERENCE_WORKERS,
+        start_method: Optional[str] = None,
+        warmup: bool = True,
+        request_timeout: float = WORKER_REQUEST_TIMEOUT
+    ):
+        if num_workers < 1:
+            raise ValueError(f"num_workers must be at least 1, got {num_workers}")
+
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+
+        self.models_dir = models_dir
+        self.num_workers = num_workers
+        self.start_method = start_method
+        self.warmup = warmup
+        self.request_timeout = request_timeout
+
+        self._ctx = mp.get_context(start_method)
+        self._requests = None
+        self._results = None
+        self._workers: Dict[int, Dict[str, Any]] = {}
+        self._worker_ids = itertools.count()
+        self._request_ids = itertools.count()
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.restarts = 0
+        self.preloaded_bytes = 0
+
+    def start(self):
+        if self.start_method == "forkserver":
+            self._ctx.set_forkserver_preload(["model_manager"])
+
+        self.preloaded_bytes = preload_model_files(self.models_dir) if os.path.isdir(self.models_dir) else 0
+        self._requests = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+
+        for _ in range(self.num_workers):
+            self._spawn_worker()
+
+        self._threads = [
+            threading.Thread(target=self._collect_results, name="worker-pool-results", daemon=True),
+            threading.Thread(target=self._monitor_workers, name="worker-pool-monitor", daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+        logger.info(
+            f"Started {self.num_workers} inference workers ({self.start_method}), "
+            f"preloaded {self.preloaded_bytes / 1e6:.1f} MB of model files"
+        )
+
+    def _spawn_worker(self) -> int:
+        worker_id = next(self._worker_ids)
+        stop_event = self._ctx.Event()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.models_dir, self._requests, self._results, stop_event, self.warmup),
+            name=f"inference-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+
+        with self._lock:
+            self._workers[worker_id] = {
+                "process": process,
+                "stop_event": stop_event,
+                "ready": False,
+                "started_at": time.time()
+            }
+        return worker_id
+
+    def _collect_results(self):
+        while not self._stopping.is_set():
+            try:
+                request_id, status, worker_id, payload = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            if status == "ready":
+                with self._lock:
+                    if worker_id in self._workers:
+                        self._workers[worker_id]["ready"] = True
+                        self._workers[worker_id]["ready_seconds"] = round(
+                            time.time() - self._workers[worker_id]["started_at"], 3
+                        )
+                continue
+
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+            if future is None or future.done():
+                continue
+
+            if status == "ok":
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    def _monitor_workers(self):
+        while not self._stopping.wait(1.0):
+            with self._lock:
+                dead = [
+                    worker_id for worker_id, worker in self._workers.items()
+                    if not worker["process"].is_alive() and not worker["stop_event"].is_set()
+                ]
+                for worker_id in dead:
+                    exitcode = self._workers.pop(worker_id)["process"].exitcode
+                    logger.error(f"Inference worker {worker_id} exited with code {exitcode}; restarting")
+
+            # Requests the dead worker had taken are failed by their timeout
+            for _ in dead:
+                self.restarts += 1
+                self._spawn_worker()
+
+    def submit(self, method: str, include_all_predictions: bool = False, **kwargs) -> Future:
+        if method not in WORKER_METHODS:
+            raise ValueError(f"Unsupported worker method: {method}")
+        if self._requests is None:
+            raise RuntimeError("Worker pool is not started")
+
+        future: Future = Future()
+        request_id = next(self._request_ids)
+        with self._lock:
+            self._pending[request_id] = future
+
+        self._requests.put((request_id, method, kwargs, include_all_predictions))
+        future.add_done_callback(lambda _: self._forget(request_id))
+        return future
+
+    def _forget(self, request_id: int):
+        with self._lock:
+            self._pending.pop(request_id, None)
+
+    def predict(self, include_all_predictions: bool = False, timeout: Optional[float] = None, **kwargs) -> Dict[str, Any]:
+        future = self.submit("predict", include_all_predictions=include_all_predictions, **kwargs)
+        return future.result(timeout or self.request_timeout)
+
+    @property
+    def is_ready(self) -> bool:
+        with self._lock:
+            return sum(1 for worker in self._workers.values() if worker["ready"]) >= self.num_workers
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.time() + timeout
+        while not self.is_ready:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def rolling_restart(self, timeout: float = 120.0) -> int:
+        # Replace workers one at a time so capacity never drops below
+        # num_workers - 1; new workers pick up the registry's active versions.
+        with self._lock:
+            old_ids = list(self._workers)
+
+        for old_id in old_ids:
+            new_id = self._spawn_worker()
+            deadline = time.time() + timeout
+            while time.time() < deadline:
+                with self._lock:
+                    if self._workers[new_id]["ready"]:
+                        break
+                time.sleep(0.05)
+
+            with self._lock:
+                old = self._workers.pop(old_id, None)
+            if old is not None:
+                old["stop_event"].set()
+                old["process"].join(timeout)
+                if old["process"].is_alive():
+                    old["process"].terminate()
+
+        return len(old_ids)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "num_workers": self.num_workers,
+                "start_method": self.start_method,
+                "ready": sum(1 for worker in self._workers.values() if worker["ready"]) >= self.num_workers,
+                "pending_requests": len(self._pending),
+                "restarts": self.restarts,
+                "preloaded_bytes": self.preloaded_bytes,
+                "workers": [
+                    {
+                        "worker_id": worker_id,
+                        "pid": worker["process"].pid,
+                        "alive": worker["process"].is_alive(),
+                        "ready": worker["ready"],
+                        "ready_seconds": worker.get("ready_seconds")
+                    }
+                    for worker_id, worker in self._workers.items()
+                ]
+            }
+
+    def shutdown(self, timeout: float = 5.0):
+        self._stopping.set()
+
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+            pending = list(self._pending.values())
+            self._pending.clear()
+
+        for worker in workers:
+            worker["stop_event"].set()
+        for worker in workers:
+            worker["process"].join(timeout)
+            if worker["process"].is_alive():
+                worker["process"].terminate()
+
+        for future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Worker pool shut down"))
+
+        for thread in self._threads:
+            thread.join(timeout)